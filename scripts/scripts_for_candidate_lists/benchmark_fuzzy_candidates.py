@@ -0,0 +1,86 @@
+# benchmark of the fuzzy tier of the candidate index (see build_fuzzy_index in scripts_to_create_zelda/candidate_index.py)
+# for each test split we count the mentions that are in none of the tables of the index, how many of them get
+# candidates from the fuzzy tier and how many of them have the gold entity among these candidates, i.e. the recall that
+# the fuzzy tier adds. We also measure the time of the fuzzy lookups (each distinct missing mention once)
+
+import os
+import sys
+import time
+
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.candidate_index import FUZZY_TABLE, decode, get_candidate_index
+from scripts_to_create_zelda.candidate_evaluation import get_split_name, read_split_mentions
+
+PATH_TO_REPOSITORY = ''
+
+# number of (best) fuzzy matches whose candidates are merged, the index itself uses the best match only
+number_of_matches = 1
+min_similarity = 0.6
+max_postings = 20000
+
+candidate_index = get_candidate_index(PATH_TO_REPOSITORY, fuzzy=True)
+
+
+def get_fuzzy_candidates(mention):
+    # the candidates of the matched keys with the changes of the delta segments, like the lookups of the index
+    candidates = set()
+    candidate_table = candidate_index.tables[FUZZY_TABLE]
+    for position, _ in candidate_index.fuzzy.find(mention, number_of_matches=number_of_matches,
+                                                  min_similarity=min_similarity, max_postings=max_postings):
+        start, end = candidate_table.get_candidate_range(position)
+        key_candidates = {candidate_index.get_entity_title(code): count for code, count in
+                          zip(candidate_table.candidate_entities[start:end], candidate_table.candidate_counts[start:end])}
+        key_deltas = candidate_index.deltas[FUZZY_TABLE].get(decode(candidate_table.get_key(position)), {})
+        candidates.update(candidate_index.add_deltas(key_candidates, key_deltas))
+    return candidates
+
+
+def evaluate_split(path_to_split):
+    # returns the counts of the split and the lookup times (in seconds) of its distinct missing mentions
+    counts = {'mentions': 0, 'missing': 0, 'matched': 0, 'recall gained': 0}
+    lookup_times = []
+    fuzzy_candidates = {}
+    for mention, gold_title in read_split_mentions(path_to_split):
+        counts['mentions'] += 1
+        # a mention is missing if it is in none of the tables, also with the keys of the delta segments (see find_key)
+        if candidate_index.find_key(mention)[0] is not None:
+            continue
+        counts['missing'] += 1
+        if mention not in fuzzy_candidates:
+            start = time.perf_counter()
+            fuzzy_candidates[mention] = get_fuzzy_candidates(mention)
+            lookup_times.append(time.perf_counter() - start)
+        if fuzzy_candidates[mention]:
+            counts['matched'] += 1
+            if gold_title in fuzzy_candidates[mention]:
+                counts['recall gained'] += 1
+    return counts, lookup_times
+
+
+def print_row(name, counts, lookup_times):
+    lookup_times = sorted(lookup_times)
+    mean = sum(lookup_times) / max(len(lookup_times), 1) * 1000
+    p99 = lookup_times[int(0.99 * (len(lookup_times) - 1))] * 1000 if lookup_times else 0.
+    print(f'{name:<22}{counts["mentions"]:>10}{counts["missing"]:>10}{counts["matched"]:>10}'
+          f'{counts["recall gained"] / max(counts["mentions"], 1):>16.4f}{mean:>12.3f}{p99:>12.3f}')
+
+
+if __name__ == '__main__':
+    test_folder = os.path.join(PATH_TO_REPOSITORY, 'test_data', 'jsonl')
+
+    header = f'{"split":<22}{"mentions":>10}{"missing":>10}{"matched":>10}{"recall gained":>16}{"mean (ms)":>12}{"p99 (ms)":>12}'
+    print(header)
+    print('-' * len(header))
+
+    all_counts = {'mentions': 0, 'missing': 0, 'matched': 0, 'recall gained': 0}
+    all_lookup_times = []
+    for filename in sorted(os.listdir(test_folder)):
+        counts, lookup_times = evaluate_split(os.path.join(test_folder, filename))
+        print_row(get_split_name(filename), counts, lookup_times)
+        for key, count in counts.items():
+            all_counts[key] += count
+        all_lookup_times.extend(lookup_times)
+
+    print('-' * len(header))
+    print_row('all mentions', all_counts, all_lookup_times)
@@ -0,0 +1,68 @@
+# report of how the candidate recall on the test splits changes if only the top k candidates of each mention are kept
+# (see top_k in scripts_to_create_zelda/candidate_index.py), together with the number of candidates the index keeps
+# the candidates of the full index are sorted by count, so the gold entity is among the top k candidates iff its
+# position in the full list is smaller than k, i.e. one lookup per mention gives the recall for all k
+
+import os
+import sys
+
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.candidate_index import get_candidate_index
+from scripts_to_create_zelda.candidate_evaluation import get_split_name, read_split_mentions
+
+PATH_TO_REPOSITORY = ''
+
+# the values of k in the report, None means all candidates
+values_of_k = [1, 2, 3, 5, 10, 20, 50, 100, None]
+
+candidate_index = get_candidate_index(PATH_TO_REPOSITORY)
+
+
+def get_gold_positions(path_to_split):
+    # position of the gold entity in the candidate list of each mention of the split, None if it is not a candidate
+    gold_positions = []
+    for mention, gold_title in read_split_mentions(path_to_split):
+        candidates, _ = candidate_index.get_candidates_and_mfs(mention)
+        try:
+            gold_positions.append(candidates.index(gold_title))
+        except ValueError:
+            gold_positions.append(None)
+    return gold_positions
+
+
+def get_number_of_candidates(k):
+    # number of candidates stored in the index (all tables) if only the top k of each mention are kept
+    number_of_candidates = 0
+    for candidate_table in candidate_index.tables.values():
+        candidate_starts = candidate_table.candidate_starts
+        if k is None:
+            number_of_candidates += candidate_starts[len(candidate_starts) - 1]
+        else:
+            number_of_candidates += sum(min(k, candidate_starts[i + 1] - candidate_starts[i])
+                                        for i in range(len(candidate_starts) - 1))
+    return number_of_candidates
+
+
+if __name__ == '__main__':
+    test_folder = os.path.join(PATH_TO_REPOSITORY, 'test_data', 'jsonl')
+
+    header = f'{"split":<32}' + ''.join(f'{"k=" + str(k if k else "all"):>9}' for k in values_of_k)
+    print(header)
+    print('-' * len(header))
+
+    all_gold_positions = []
+    for filename in sorted(os.listdir(test_folder)):
+        gold_positions = get_gold_positions(os.path.join(test_folder, filename))
+        all_gold_positions.extend(gold_positions)
+        recalls = [sum(1 for position in gold_positions if position is not None and (k is None or position < k))
+                   / max(len(gold_positions), 1) for k in values_of_k]
+        print(f'{get_split_name(filename):<32}' + ''.join(f'{recall:>9.3f}' for recall in recalls))
+
+    print('-' * len(header))
+    recalls = [sum(1 for position in all_gold_positions if position is not None and (k is None or position < k))
+               / max(len(all_gold_positions), 1) for k in values_of_k]
+    print(f'{"all mentions":<32}' + ''.join(f'{recall:>9.3f}' for recall in recalls))
+    all_candidates = get_number_of_candidates(None)
+    print(f'{"share of candidates kept":<32}' + ''.join(f'{get_number_of_candidates(k) / max(all_candidates, 1):>9.3f}'
+                                                      for k in values_of_k))
@@ -0,0 +1,15 @@
+# folds the delta segments of the candidate index (see update_candidate_index.py) into a new version of the index
+# the index can be used while this runs (e.g. in the background), processes that opened the index before keep the old
+# version until they open it again
+
+import os
+import sys
+
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.candidate_deltas import compact_candidate_index
+
+PATH_TO_REPOSITORY = ''
+
+if __name__ == '__main__':
+    compact_candidate_index(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_candidate_index'))
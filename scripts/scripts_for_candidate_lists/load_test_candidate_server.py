@@ -0,0 +1,70 @@
+# load test of a running candidate server (see run_candidate_server.py): several client processes send batches of
+# mentions from the test splits and we report the latency of the requests (p50, p99) and the throughput (requests and
+# mentions per second). The results of the first batches are compared with the candidate index itself
+
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.candidate_evaluation import read_split_mentions
+from scripts_to_create_zelda.candidate_index import get_candidate_index
+from scripts_to_create_zelda.candidate_server import CandidateClient
+
+PATH_TO_REPOSITORY = ''
+
+# address of the server, see run_candidate_server.py
+SERVER_ADDRESS = '/tmp/zelda_candidates.sock'
+FUZZY = False
+
+number_of_clients = 8
+requests_per_client = 2000
+batch_size = 32
+
+
+def run_client(client_number, mentions):
+    # sends the requests of one client, returns the latencies of the requests (in seconds)
+    rng = random.Random(client_number)
+    latencies = []
+    with CandidateClient(SERVER_ADDRESS) as client:
+        for _ in range(requests_per_client):
+            batch = rng.choices(mentions, k=batch_size)
+            start = time.perf_counter()
+            client.get_candidates_and_mfs_batch(batch)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def get_percentile(sorted_values, percentile):
+    return sorted_values[min(int(percentile / 100 * len(sorted_values)), len(sorted_values) - 1)]
+
+
+if __name__ == '__main__':
+    test_folder = os.path.join(PATH_TO_REPOSITORY, 'test_data', 'jsonl')
+    mentions = [mention for filename in sorted(os.listdir(test_folder))
+                for mention, _ in read_split_mentions(os.path.join(test_folder, filename))]
+    print(f'{len(mentions)} mentions')
+
+    # the server gives the same results as the index
+    candidate_index = get_candidate_index(PATH_TO_REPOSITORY, fuzzy=FUZZY)
+    with CandidateClient(SERVER_ADDRESS) as client:
+        sample = mentions[:1000]
+        if client.get_candidates_and_mfs_batch(sample) != [candidate_index.get_candidates_and_mfs(mention, fuzzy=FUZZY)
+                                                           for mention in sample]:
+            print('The results of the server differ from the candidate index!')
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(number_of_clients) as pool:
+        client_latencies = pool.starmap(run_client, [(client_number, mentions) for client_number in range(number_of_clients)])
+    duration = time.perf_counter() - start
+
+    latencies = sorted(latency for latencies in client_latencies for latency in latencies)
+    print(f'clients: {number_of_clients}, batch size: {batch_size}, requests: {len(latencies)}')
+    print(f'latency per request p50: {get_percentile(latencies, 50) * 1000:.3f} ms, p99: {get_percentile(latencies, 99) * 1000:.3f} ms')
+    print(f'throughput: {len(latencies) / duration:.1f} requests/s, {len(latencies) * batch_size / duration:.1f} mentions/s')
+
+    with CandidateClient(SERVER_ADDRESS) as client:
+        print('cache:', client.get_info()['cache'])
@@ -1,56 +1,71 @@
 # script to create the candidate lists
 # from three sources (kensho wikimedia, wikilinks and wikidata "also known as") we count, for each apperaing mention, how often it refers to specific entities in wikipedia
 
-import json
-from collections import defaultdict
+import sys
+from collections import Counter
 import pickle
 import os
 
-mention_and_entities_counter = defaultdict(dict)
+# the shared kensho reader lives in scripts/scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.candidate_counters import save_mention_entities_counter
+from scripts_to_create_zelda.kensho_reader import map_kensho_shards, streaming_pairwise_merge
 
 PATH_TO_REPOSITORY = ''
 folder_of_kensho_link_annotated_jsonl = ''
+# optionally, the folder of a kensho cache (see scripts_to_create_zelda/kensho_cache.py) that is read instead of the jsonl file
+path_to_kensho_cache = ''
+# number of processes that count the mentions, None means one process per cpu
+number_of_processes = None
 
-lines_counter = 0
-total_lines_kensho = 5354091
 
-# get entity vocabulary from ZELDA
-with open(os.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_ids_to_titles.pickle'), 'rb') as handle:
-    ids_to_titles_zelda = pickle.load(handle)
+def count_mentions(kensho_pages, ids_in_zelda):
+    # worker for (a shard of) kensho, counts how often each mention links to each entity (by its wikipedia id)
+    # the keys are (mention, id) pairs, which is much smaller than a dictionary of entities for each mention
+    mention_entity_pairs = Counter()
 
-with open(os.path.join(folder_of_kensho_link_annotated_jsonl, 'link_annotated_text.jsonl'), mode = 'r', encoding='utf-8') as kensho_lines:
-
-    for line in kensho_lines:
-        jline = json.loads(line)
+    for _, jline in kensho_pages:
 
         for section in jline['sections']:
 
             text = section['text']
 
-            link_offsets = section['link_offsets']
-            link_lengths = section['link_lengths']
-            target_page_ids = section['target_page_ids']
+            # only consider entities that are contained in ZELDA
+            mention_entity_pairs.update((text[offset:offset+length], idx) for offset, length, idx
+                                        in zip(section['link_offsets'], section['link_lengths'], section['target_page_ids'])
+                                        if idx in ids_in_zelda)
+
+    return mention_entity_pairs
+
+
+def add_counters(first_counter, second_counter):
+    # the smaller counter is added to the larger one
+    if len(first_counter) < len(second_counter):
+        first_counter, second_counter = second_counter, first_counter
+    first_counter.update(second_counter)
+    return first_counter
+
 
-            for offset, length, idx in zip(link_offsets, link_lengths, target_page_ids):
+if __name__ == '__main__':
 
-                # only consider entities that are contained in ZELDA
-                try:
-                    title = ids_to_titles_zelda[idx]
-                except KeyError:
-                    continue
+    # get entity vocabulary from ZELDA
+    with open(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_ids_to_titles.pickle'), 'rb') as handle:
+        ids_to_titles_zelda = pickle.load(handle)
 
-                mention = text[offset:offset+length]
+    kensho_source = path_to_kensho_cache or os.path.join(folder_of_kensho_link_annotated_jsonl, 'link_annotated_text.jsonl')
 
-                if title in mention_and_entities_counter[mention]:
-                    mention_and_entities_counter[mention][title] +=1
-                else:
-                    mention_and_entities_counter[mention][title] = 1
+    # the shards are counted in parallel (progress is printed by the bytes of kensho processed) and the partial counters
+    # are added up pairwise while they come in, so that only a few of them are kept in memory at the same time
+    mention_entity_pairs = streaming_pairwise_merge(map_kensho_shards(kensho_source, count_mentions,
+                                                                      shared_objects=set(ids_to_titles_zelda),
+                                                                      number_of_processes=number_of_processes),
+                                                    add_counters) or Counter()
 
-        lines_counter += 1
-        if lines_counter % 1000 == 0:
-            print('processed {:10.4f} %\n'.format((lines_counter / total_lines_kensho) * 100))
+    mention_and_entities_counter = {}
+    for (mention, idx), count in mention_entity_pairs.items():
+        mention_and_entities_counter.setdefault(mention, {})[idx] = count
+    del mention_entity_pairs
 
-with open(
-        os.path.join(folder_of_kensho_link_annotated_jsonl, 'mention_entities_counter_kensho.pickle'),
-        'wb') as handle:
-    pickle.dump(mention_and_entities_counter, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    # the entities are wikipedia ids, they are replaced by their titles when the lists are merged (see candidate_counters.py)
+    save_mention_entities_counter(mention_and_entities_counter,
+                                  os.path.join(folder_of_kensho_link_annotated_jsonl, 'mention_entities_counter_kensho.pickle'))
@@ -1,125 +1,61 @@
 # script to utilize wikidata aliases as candidatate lists
 # the idea is as follows: given a wikipedia title, we check whether a corresponding wikidata entry exists
 # if so, we go to the "also known as" field, we take every entry as a mention referring to the title that we started with
+# the aliases are fetched for 50 titles per request by the shared WikidataResolver (see wikidata_resolver.py), all answers
+# are kept in its cache, so if the run is interrupted just run the script again
 
 
-import json
-import shutil
 import pickle
-import pywikibot
-from collections import defaultdict
 import os
-import multiprocessing
+import sys
 
-PATH_TO_REPOSITORY = ''
-
-# first we need to get all titles of our vocabulary
-
-# get all titles from train and test
-# load the set of titles from ZELDA, we will only consider these titles
-with open(os.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_ids_to_titles.pickle'), 'rb') as handle:
-    ids_to_titles_zelda = pickle.load(handle)
-
-set_of_titles_in_train_and_test = set(ids_to_titles_zelda.values())
-number_titles = len(set_of_titles_in_train_and_test)
-list_of_titles = list(set_of_titles_in_train_and_test)
-print(number_titles)
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.candidate_counters import save_mention_entities_counter
+from scripts_to_create_zelda.wikidata_resolver import WikidataResolver
 
-# create temporary folder for the results of the processes
+PATH_TO_REPOSITORY = ''
 folder_to_save_output_dict = ''
-tmp_folder_path = os.path.join(folder_to_save_output_dict, 'tmp')
-if not os.path.exists(tmp_folder_path):
-    os.mkdir(tmp_folder_path)
-
-class Consumer(multiprocessing.Process):
-
-    def __init__(self, task_queue):
-        multiprocessing.Process.__init__(self)
-        self.task_queue = task_queue
-        self.site =  pywikibot.Site("en", "wikipedia")
-
-    def run(self):
-        proc_name = self.name
-        f = open(os.path.join(tmp_folder_path, proc_name), mode ='w', encoding='utf-8')
-        while True:
-            titles_list = self.task_queue.get()
-            if titles_list is None:
-                # Poison pill means shutdown
-                print('%s: Exiting' % proc_name)
-                self.task_queue.task_done()
-                f.close()
-                break
-
-            for title in titles_list:
-                # add title itself as a mention
-                f.write(title + '\t' + title + '\n')
-                # then Wikidata
-                page = pywikibot.Page(self.site, title)
-                try:
-                    item = pywikibot.ItemPage.fromPage(page)
-                    try:
-                        aliases = item.aliases['en']
-                        for alias in aliases:
-                            f.write(alias + '\t' + title +'\n')
-                    except KeyError:
-                        print(f'No english aliases for: {title}')
-                except:
-                    print(f'Page does not exist in wikidata: {title}')
-            self.task_queue.task_done()
-        return
 
+# the cache of the answers of the wikidata api
+path_to_wikidata_cache = os.path.join(folder_to_save_output_dict, 'wikidata_api_cache.sqlite')
 
 
 if __name__ == '__main__':
-    # Establish communication queues
-    tasks = multiprocessing.JoinableQueue()
+    # first we need to get all titles of our vocabulary
 
-    # Start consumers
-    num_consumers = min(multiprocessing.cpu_count(), 15) # should not be too much, since there are some problems with the api otherwise
-    print('Creating %d consumers' % num_consumers)
-    consumers = [Consumer(tasks)
-                 for i in range(num_consumers)]
-    for w in consumers:
-        w.start()
+    # get all titles from train and test
+    # load the set of titles from ZELDA, we will only consider these titles
+    with open(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_ids_to_titles.pickle'), 'rb') as handle:
+        ids_to_titles_zelda = pickle.load(handle)
 
-    # Enqueue jobs
-    for i in range(number_titles//100):
-        tasks.put(list_of_titles[i*100:(i+1)*100])
+    # the lists count the entities by their wikipedia ids, for each title we keep one id
+    titles_to_ids = {}
+    for idx, title in ids_to_titles_zelda.items():
+        titles_to_ids.setdefault(title, idx)
+    print(len(titles_to_ids))
 
-    # Add a poison pill for each consumer
-    for i in range(num_consumers):
-        tasks.put(None)
+    with WikidataResolver(path_to_wikidata_cache) as resolver:
+        aliases_of_titles = resolver.resolve_aliases(titles_to_ids)
 
-    # Wait for all of the tasks to finish
-    tasks.join()
-
-    # unify the results
     mention_entities_counter = {}
-
-    for file_name in os.listdir(tmp_folder_path):
-        with open(os.path.join(tmp_folder_path, file_name), mode='r', encoding='utf-8') as input_file:
-            print(file_name)
-            for line in input_file:
-                line_list = line.strip().split('\t')
-                mention = line_list[0]
-                entity = line_list[1]
-
-                if mention in mention_entities_counter:
-                    if entity in mention_entities_counter[mention]:
-                        mention_entities_counter[mention][entity] += 1
-                    else:
-                        mention_entities_counter[mention][entity] = 1
-                else:
-                    mention_entities_counter[mention] = {entity: 1}
-
-    # save mention entities counter
-    with open(
-            os.path.join(folder_to_save_output_dict,  'mention_entities_counter_wikidata.pickle'),
-            'wb') as handle:
-        pickle.dump(mention_entities_counter, handle, protocol=pickle.HIGHEST_PROTOCOL)
-
-    # remove the temporary folder
-    shutil.rmtree(tmp_folder_path)
-    # remove additional created files
-    # current_dir = os.getcwd()
-    # os.remove(os.path.join(current_dir, ))
\ No newline at end of file
+    titles_without_item = 0
+    titles_without_aliases = 0
+    for title, idx in titles_to_ids.items():
+        # add title itself as a mention, then the aliases of wikidata
+        aliases = aliases_of_titles[title]
+        if aliases is None:
+            titles_without_item += 1
+            aliases = []
+        elif not aliases:
+            titles_without_aliases += 1
+
+        for mention in [title] + aliases:
+            entities_counter = mention_entities_counter.setdefault(mention, {})
+            entities_counter[idx] = entities_counter.get(idx, 0) + 1
+
+    print(f'{titles_without_item} titles do not exist in wikidata, {titles_without_aliases} have no english aliases')
+
+    # save mention entities counter, the entities are wikipedia ids (see candidate_counters.py)
+    save_mention_entities_counter(mention_entities_counter,
+                                  os.path.join(folder_to_save_output_dict,  'mention_entities_counter_wikidata.pickle'))
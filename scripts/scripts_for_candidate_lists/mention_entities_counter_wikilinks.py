@@ -4,6 +4,7 @@
 # for (( i=0; i<10; i++ )) do echo "Downloading file $i of 10"; wget https://storage.googleapis.com/google-code-archive-downloads/v2/code.google.com/wiki-links/data-0000$i-of-00010.gz ; done
 # after downloading unpack the ten files: for (( i=0; i<10; i++ )) do gzip -d data-0000$i-of-00010.gz ; done
 import os
+import sys
 import multiprocessing
 import wikipediaapi
 import pickle
@@ -11,6 +12,10 @@ import urllib.parse
 import requests
 import time
 
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.candidate_counters import save_mention_entities_counter
+
 folder_of_wikilinks_files = ''
 PATH_TO_REPOSITORY = ''
 
@@ -193,7 +198,7 @@ key = list(return_dict.keys())[0]
 print(return_dict[key])
 
 # to filter entities we do not need, first get the entity vocabulary from ZELDA
-with open(os.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_ids_to_titles.pickle'),
+with open(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_ids_to_titles.pickle'),
         'rb') as handle:
     ids_to_titles_zelda= pickle.load(handle)
 
@@ -206,6 +211,7 @@ for key in return_dict:
             original_titles_to_ids_dict[orig_title] = idx
 
 # now that we have the mapping from original titles to updated wikipedia ids, we create the lists
+# the lists count the entities by their ids, the titles are looked up when the lists are merged (see candidate_counters.py)
 mention_entities_counter = {}
 
 
@@ -229,18 +235,15 @@ for filename in os.listdir(folder_of_wikilinks_files):
 
                 if original_wikipedia_title in original_titles_to_ids_dict:
                     idx = original_titles_to_ids_dict[original_wikipedia_title]
-                    updated_title = ids_to_titles_zelda[idx]
 
                     if mention in mention_entities_counter:
-                        if updated_title in mention_entities_counter[mention]:
-                            mention_entities_counter[mention][updated_title] +=1
+                        if idx in mention_entities_counter[mention]:
+                            mention_entities_counter[mention][idx] +=1
                         else:
-                            mention_entities_counter[mention][updated_title] = 1
+                            mention_entities_counter[mention][idx] = 1
                     else:
-                        mention_entities_counter[mention] = {updated_title : 1}
+                        mention_entities_counter[mention] = {idx : 1}
 
 # save the dictionaries
-with open(
-        os.path.join(folder_of_wikilinks_files, 'mention_entities_counter_wikilinks.pickle'),
-        'wb') as handle:
-    pickle.dump(mention_entities_counter, handle, protocol=pickle.HIGHEST_PROTOCOL)
+save_mention_entities_counter(mention_entities_counter,
+                              os.path.join(folder_of_wikilinks_files, 'mention_entities_counter_wikilinks.pickle'))
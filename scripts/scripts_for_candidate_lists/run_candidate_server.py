@@ -0,0 +1,28 @@
+# serves the candidate lists to the workers of this host (see scripts_to_create_zelda/candidate_server.py), the workers
+# use a CandidateClient instead of loading the lists themselves:
+#
+#   client = CandidateClient(SERVER_ADDRESS)
+#   candidates, mfs = client.get_candidates_and_mfs('Ronaldo')
+#   candidates_and_mfs = client.get_candidates_and_mfs_batch(['Ronaldo', 'Berlin'])
+
+import os
+import sys
+
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.candidate_server import serve_candidates
+
+PATH_TO_REPOSITORY = ''
+
+# the path of a unix socket, or (host, port) to serve over tcp, e.g. ('127.0.0.1', 8470)
+SERVER_ADDRESS = '/tmp/zelda_candidates.sock'
+
+# same options as in demo_of_candidate_lists.py
+TOP_K = None
+FUZZY = False
+
+# number of mentions whose results are cached
+CACHE_SIZE = 100000
+
+if __name__ == '__main__':
+    serve_candidates(PATH_TO_REPOSITORY, SERVER_ADDRESS, top_k=TOP_K, fuzzy=FUZZY, cache_size=CACHE_SIZE)
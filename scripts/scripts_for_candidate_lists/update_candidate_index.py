@@ -0,0 +1,36 @@
+# adds the changes of a new or refreshed source of candidate lists to the candidate index, without rebuilding it (see
+# scripts_to_create_zelda/candidate_deltas.py). The changes are stored as a delta segment of the index and are used by
+# all lookups from then on, compact_candidate_index.py folds the segments into the index
+# e.g. to refresh the wikidata aliases, run mention_entities_counter_wikidata.py again and set path_to_new_counter to the
+# new and path_to_old_counter to the old counter, for a new source leave path_to_old_counter empty
+
+import os
+import pickle
+import sys
+
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.candidate_counters import load_mention_entities_counter
+from scripts_to_create_zelda.candidate_deltas import add_candidate_delta, get_counter_changes
+from scripts_to_create_zelda.candidate_index import get_candidate_index
+
+PATH_TO_REPOSITORY = ''
+
+# pickled mention entities counters (e.g. mention_entities_counter_wikidata.pickle)
+path_to_new_counter = ''
+path_to_old_counter = ''
+
+if __name__ == '__main__':
+    # counters with wikipedia ids get the titles of the ids
+    with open(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_ids_to_titles.pickle'), 'rb') as handle:
+        ids_to_titles = pickle.load(handle)
+
+    with open(path_to_new_counter, 'rb') as handle:
+        new_mention_entities_counter = load_mention_entities_counter(handle, ids_to_titles)
+    old_mention_entities_counter = None
+    if path_to_old_counter:
+        with open(path_to_old_counter, 'rb') as handle:
+            old_mention_entities_counter = load_mention_entities_counter(handle, ids_to_titles)
+
+    candidate_index = get_candidate_index(PATH_TO_REPOSITORY)
+    add_candidate_delta(candidate_index.path, get_counter_changes(new_mention_entities_counter, old_mention_entities_counter))
@@ -3,12 +3,15 @@
 # follow instructions to create the conll file: AIDA_CoNLL-YAGO2-dataset.tsv
 from pathlib import Path
 
-import wikipediaapi
-import requests
 import pickle
 import os
+import sys
 import json
 
+# the ids and titles are resolved by the shared resolvers in scripts/scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.wikipedia_dump_resolver import get_wikipedia_resolver
+
 # input_data_folder should contain AIDA-YAGO2-dataset.tsv
 input_data_folder = '../../local_data'
 output_data_folder = '../../zelda_data'
@@ -18,6 +21,14 @@ input_data_folder.mkdir(exist_ok=True, parents=True)
 output_data_folder = Path(output_data_folder)
 output_data_folder.mkdir(exist_ok=True, parents=True)
 
+# the results of the wikipedia api are cached here, the other scripts use the same cache
+path_to_wikipedia_cache = input_data_folder / 'wikipedia_api_cache.sqlite'
+
+# to resolve the ids and titles offline instead, set the page and redirect tables of a wikipedia dump
+# (see wikipedia_dump_resolver.py in scripts/scripts_to_create_zelda)
+path_to_page_table = ''
+path_to_redirect_table = ''
+
 wiki_ids_to_titles = {}  # save upt-to-date wikipedia ids and corresponding page titles
 
 # there are 14 ids (and 36 mentions) in the aida dataset (Oct, 2022) that do not exist anymore, we manually replaced them
@@ -38,13 +49,11 @@ bad_ids_in_aida_and_good_counterpart = {3313915: 35608495,  # FC_Barcelona_Bàsq
                                         183525: 47836950,  # Guangxi
                                         }
 
-wiki_wiki = wikipediaapi.Wikipedia(language="en")
-
 # step 1: ids and titles
 # go through all lines of the column dataset
 # skip to the test part
 # for all non-Nil annotations, take the id and get the up-to-date-title
-counter = 0
+ids_in_aida_and_wikinames = {}
 
 with open(os.path.join(input_data_folder, 'AIDA-YAGO2-dataset.tsv'), mode='r', encoding='utf-8') as aida:
     line = aida.readline()
@@ -70,33 +79,28 @@ with open(os.path.join(input_data_folder, 'AIDA-YAGO2-dataset.tsv'), mode='r', e
                 # replace by good id
                 idx = bad_ids_in_aida_and_good_counterpart[idx]
 
-            if not idx in wiki_ids_to_titles:
-                # make a call to the wikipedia api with the given index
-                resp = requests.get(
-                    f"https://en.wikipedia.org/w/api.php?action=query&prop=info|redirects&pageids={idx}&format=json&redirects").json()
-
-                # either the id exists, then get the title
-                # otherwise set the title to 'O'
-                for wikiid in resp["query"]["pages"]:
-                    try:
-                        wikiname_using_id = resp["query"]["pages"][wikiid]["title"]
-                        if 'redirects' in resp["query"]["pages"][wikiid]:
-                            redirected_ids = [x['pageid'] for x in resp["query"]["pages"][wikiid]['redirects']]
-                            if idx in redirected_ids:
-                                print(f'Id {idx} redirects to {wikiid}')
-                                bad_ids_in_aida_and_good_counterpart[idx] = int(wikiid)
-                                idx = int(wikiid)
-                    except KeyError:  # bad wikiid
-                        print(idx)
-                        print(wikiname_in_original_data)
-                        wikiname_using_id = "O"
-                        assert 0
-
-                # save id and name
-                wiki_ids_to_titles[idx] = wikiname_using_id
+            ids_in_aida_and_wikinames.setdefault(idx, wikiname_in_original_data)
 
         line = aida.readline()
 
+# get the up-to-date titles of all ids at once, ids of redirects lead to the page they redirect to
+with get_wikipedia_resolver(path_to_wikipedia_cache, path_to_page_table, path_to_redirect_table) as resolver:
+    pages_of_ids = resolver.resolve_ids(ids_in_aida_and_wikinames)
+
+for idx, page in pages_of_ids.items():
+    if page is None:  # bad wikiid
+        print(idx)
+        print(ids_in_aida_and_wikinames[idx])
+        assert 0
+
+    wikiid, wikiname_using_id = page
+    if wikiid != idx:
+        print(f'Id {idx} redirects to {wikiid}')
+        bad_ids_in_aida_and_good_counterpart[idx] = wikiid
+
+    # save id and name
+    wiki_ids_to_titles[wikiid] = wikiname_using_id
+
 # save ids and titles
 with open(
         os.path.join(output_data_folder, 'wikiids_to_titles_aida-b.pickle'),
@@ -8,12 +8,16 @@ from pathlib import Path
 # then, given the page, we save the up-to-date title and the page id to our data
 # if the title does not yield a proper wikipedia page, we discard it
 
-import wikipediaapi
 import pickle
 import xml.etree.ElementTree as ET
 import os
+import sys
 import json
 
+# the ids and titles are resolved by the shared resolvers in scripts/scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.wikipedia_dump_resolver import get_wikipedia_resolver
+
 # path to the folder that contains clueweb.xml, clueweb.conll, RawText, clueweb-name2bracket.tsv ...
 input_data_folder = '../../local_data'
 output_data_folder = '../../zelda_data'
@@ -23,8 +27,13 @@ input_data_folder.mkdir(exist_ok=True, parents=True)
 output_data_folder = Path(output_data_folder)
 output_data_folder.mkdir(exist_ok=True, parents=True)
 
-# to get up-to-date annotations we use the wikipedia-api
-wiki_wiki = wikipediaapi.Wikipedia(language="en")
+# the results of the wikipedia api are cached here, the other scripts use the same cache
+path_to_wikipedia_cache = input_data_folder / 'wikipedia_api_cache.sqlite'
+
+# to resolve the ids and titles offline instead, set the page and redirect tables of a wikipedia dump
+# (see wikipedia_dump_resolver.py in scripts/scripts_to_create_zelda)
+path_to_page_table = ''
+path_to_redirect_table = ''
 
 original_names_to_ids = {}
 wikiids_to_up_to_date_names = {}
@@ -43,13 +52,15 @@ for doc in root:
             if node.tag == 'wikiName':
                 set_of_all_wikipedia_titles_in_cweb.add(node.text)
 
-# get the up-to-date names
+# get the up-to-date names, the wikipedia-api follows redirects
+with get_wikipedia_resolver(path_to_wikipedia_cache, path_to_page_table, path_to_redirect_table) as resolver:
+    pages_of_titles = resolver.resolve_titles(set_of_all_wikipedia_titles_in_cweb)
+
 for original_wikiname in set_of_all_wikipedia_titles_in_cweb:
-    page = wiki_wiki.page(original_wikiname)
+    page = pages_of_titles[original_wikiname]
 
-    if page.exists():  # page exists
-        wikiid = page.pageid
-        title = page.title
+    if page is not None:  # page exists
+        wikiid, title = page
 
         if '(disambiguation)' in title or 'List of' in title:
             print(f'--->Wikipedia page name {original_wikiname} is now a disambiguation page. Ignore.')
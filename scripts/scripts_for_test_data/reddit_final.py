@@ -3,6 +3,7 @@
 
 # we have a posts and a comments file, the text is not tokenized, annotations are (in a separate file) in the form (start, end) and wikipedia titles
 import json
+import sys
 from pathlib import Path
 
 from flair.tokenization import SpacyTokenizer
@@ -12,9 +13,10 @@ tokenizer = SpacyTokenizer('en_core_web_sm')
 import pickle
 import os
 
-import wikipediaapi
-
-wiki_wiki = wikipediaapi.Wikipedia(language="en")
+# the token alignment is shared with the conll writer in scripts/scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.token_alignment import get_token_range
+from scripts_to_create_zelda.wikipedia_dump_resolver import get_wikipedia_resolver
 
 # path to the folder that contains posts.tsv, comments.tsv, gold_post_annotations.tsv, ...
 input_data_folder = '../../local_data'
@@ -25,28 +27,39 @@ input_data_folder.mkdir(exist_ok=True, parents=True)
 output_data_folder = Path(output_data_folder)
 output_data_folder.mkdir(exist_ok=True, parents=True)
 
+# the results of the wikipedia api are cached here, the other scripts use the same cache
+path_to_wikipedia_cache = input_data_folder / 'wikipedia_api_cache.sqlite'
+
+# to resolve the ids and titles offline instead, set the page and redirect tables of a wikipedia dump
+# (see wikipedia_dump_resolver.py in scripts/scripts_to_create_zelda)
+path_to_page_table = ''
+path_to_redirect_table = ''
+
 # first, as always, get the up-to-date wikipedia titles and ids
 original_names_to_ids = {}
 wikiids_to_up_to_date_names = {}
 
-already_processed_names = set()
+# the names in the order in which they appear, with the title that is looked up for them
+names_and_titles = {}
 for filename in ['gold_comment_annotations.tsv', 'gold_post_annotations.tsv']:
     with open(os.path.join(input_data_folder, filename), mode='r', encoding='utf-8') as f_in:
         for line in f_in:
             wikipedia_name_from_dataset = line.split('\t')[3]
+            if wikipedia_name_from_dataset == '9':
+                names_and_titles[wikipedia_name_from_dataset] = 'Fahrenheit 11/9'
+            else:
+                names_and_titles[wikipedia_name_from_dataset] = wikipedia_name_from_dataset
 
-            if not wikipedia_name_from_dataset in already_processed_names:
-                # print(f'Number of titles processed: {len(already_processed_names)}')
-                if wikipedia_name_from_dataset == '9':
-                    page = wiki_wiki.page('Fahrenheit 11/9')
-                else:
-                    page = wiki_wiki.page(wikipedia_name_from_dataset)
-                if page.exists():  # page exists
-                    original_names_to_ids[wikipedia_name_from_dataset] = page.pageid
-                    wikiids_to_up_to_date_names[page.pageid] = page.title
-                else:
-                    print(f'Bad wikipedia title: {wikipedia_name_from_dataset}. Ignore.')
-                already_processed_names.add(wikipedia_name_from_dataset)
+with get_wikipedia_resolver(path_to_wikipedia_cache, path_to_page_table, path_to_redirect_table) as resolver:
+    pages_of_titles = resolver.resolve_titles(names_and_titles.values())
+
+for wikipedia_name_from_dataset, title in names_and_titles.items():
+    page = pages_of_titles[title]
+    if page is not None:  # page exists
+        original_names_to_ids[wikipedia_name_from_dataset] = page[0]
+        wikiids_to_up_to_date_names[page[0]] = page[1]
+    else:
+        print(f'Bad wikipedia title: {wikipedia_name_from_dataset}. Ignore.')
 
 # save the dictionaries
 with open(
@@ -145,6 +158,7 @@ for filename in ['test_reddit-comments', 'test_reddit-posts']:
         for line in input_jsonl:
             line_dict = json.loads(line)
             tokenized_text = Sentence(line_dict['text'], use_tokenizer=tokenizer)
+            token_starts = [token.start_pos for token in tokenized_text]
 
             for index, wikipedia_title, wikipedia_id in zip(line_dict['index'], line_dict['wikipedia_titles'],
                                                             line_dict['wikipedia_ids']):
@@ -153,20 +167,20 @@ for filename in ['test_reddit-comments', 'test_reddit-posts']:
 
                 original_mention = line_dict['text'][mention_start:mention_end]
 
+                # the tokens that start inside the mention
                 first = True
-                for token in tokenized_text:
-                    if (token.start_pos >= mention_start and token.end_pos <= mention_end) \
-                            or (token.start_pos >= mention_start and token.start_pos < mention_end):
-
-                        if first:
-                            token.set_label(typename='nel',
-                                            value='B-' + str(wikipedia_id) + '\t' + 'B-' + wikipedia_title.replace(' ',
-                                                                                                                   '_'))
-                            first = False
-                        else:
-                            token.set_label(typename='nel',
-                                            value='I-' + str(wikipedia_id) + '\t' + 'I-' + wikipedia_title.replace(' ',
-                                                                                                                   '_'))
+                for token_index in get_token_range(token_starts, mention_start, mention_end):
+                    token = tokenized_text.tokens[token_index]
+
+                    if first:
+                        token.set_label(typename='nel',
+                                        value='B-' + str(wikipedia_id) + '\t' + 'B-' + wikipedia_title.replace(' ',
+                                                                                                               '_'))
+                        first = False
+                    else:
+                        token.set_label(typename='nel',
+                                        value='I-' + str(wikipedia_id) + '\t' + 'I-' + wikipedia_title.replace(' ',
+                                                                                                               '_'))
 
                 # the above annotation of tokenized sentences works pretty well!!! Actually, there is only one erronous case
                 if original_mention == 'human' and wikipedia_title == 'Human':
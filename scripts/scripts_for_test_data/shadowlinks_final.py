@@ -5,17 +5,17 @@
 import json
 import os
 import pickle
-import time
+import sys
 from pathlib import Path
 
-import requests
-import wikipediaapi
-
-wiki_wiki = wikipediaapi.Wikipedia(language="en")
-
 from flair.data import Sentence  # TODO: Do not use flair, but some tokenizer directly
 from flair.tokenization import SpacyTokenizer
 
+# the token alignment is shared with the conll writer in scripts/scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.token_alignment import get_token_range
+from scripts_to_create_zelda.wikipedia_dump_resolver import get_wikipedia_resolver
+
 tokenizer = SpacyTokenizer('en_core_web_sm')
 
 write_to_column_file = True
@@ -34,42 +34,51 @@ input_data_folder.mkdir(exist_ok=True, parents=True)
 output_data_folder = Path(output_data_folder)
 output_data_folder.mkdir(exist_ok=True, parents=True)
 
+# the results of the wikipedia api are cached here, the other scripts use the same cache
+path_to_wikipedia_cache = input_data_folder / 'wikipedia_api_cache.sqlite'
+
+# to resolve the ids and titles offline instead, set the page and redirect tables of a wikipedia dump
+# (see wikipedia_dump_resolver.py in scripts/scripts_to_create_zelda)
+path_to_page_table = ''
+path_to_redirect_table = ''
+
 # first get the wikipedia ids and titles
 # each example links to one unique entity
+snippets_of_files = {}
 for filename in ['Shadow', 'Tail', 'Top']:
     with open(os.path.join(input_data_folder, filename + '.json'), mode='r', encoding='utf-8') as f_in:
-        snippets = json.load(f_in)
-
-        for snippet in snippets:
-
-            # first we try to get a title with the provided id
-            entity_id = snippet['wiki_id']
-
-            resp = requests.get(
-                f"https://en.wikipedia.org/w/api.php?action=query&prop=info|redirects&pageids={entity_id}&format=json&redirects").json()
-
-            # either the id exists, then get the title
-            # otherwise we try to get a valid answer using the provided title
-            for wikiid in resp["query"]["pages"]:
-                try:
-                    wikiname_using_id = resp["query"]["pages"][wikiid]["title"]
-                    # check if the original id from the data redirects to the found id
-                    if 'redirects' in resp["query"]["pages"][wikiid]:
-                        redirected_ids = [x['pageid'] for x in resp["query"]["pages"][wikiid]['redirects']]
-                        if entity_id in redirected_ids:
-                            print(f'Id {entity_id} redirects to {wikiid}')
-                            bad_to_good_ids[entity_id] = int(wikiid)
-                    wiki_ids_to_titles[int(wikiid)] = wikiname_using_id
-                except KeyError:  # bad wikiid
-                    print(
-                        f'Bad wikipedia id: {entity_id}. Try to get the id using the wikipedia title in the data.')
-                    page = wiki_wiki.page(snippet['entity_name'])
-                    if page.exists():
-                        print('Wikipedia title exists.')
-                        bad_to_good_ids[entity_id] = page.pageid
-                        wiki_ids_to_titles[page.pageid] = snippet['entity_name']
-                    else:
-                        print(f"Wikipedia title {snippet['entity_name']} also not good. Ignore annotation.")
+        snippets_of_files[filename] = json.load(f_in)
+
+# first we try to get a title with the provided id, for the ids that do not have a page we try to get a valid answer
+# using the provided title
+with get_wikipedia_resolver(path_to_wikipedia_cache, path_to_page_table, path_to_redirect_table) as resolver:
+    pages_of_ids = resolver.resolve_ids(snippet['wiki_id'] for snippets in snippets_of_files.values() for snippet in snippets)
+    pages_of_titles = resolver.resolve_titles(snippet['entity_name'] for snippets in snippets_of_files.values()
+                                              for snippet in snippets if pages_of_ids[snippet['wiki_id']] is None)
+
+for snippets in snippets_of_files.values():
+    for snippet in snippets:
+
+        entity_id = snippet['wiki_id']
+
+        # either the id exists, then get the title
+        if pages_of_ids[entity_id] is not None:
+            wikiid, wikiname_using_id = pages_of_ids[entity_id]
+            # check if the original id from the data redirects to the found id
+            if wikiid != entity_id:
+                print(f'Id {entity_id} redirects to {wikiid}')
+                bad_to_good_ids[entity_id] = wikiid
+            wiki_ids_to_titles[wikiid] = wikiname_using_id
+        else:  # bad wikiid
+            print(
+                f'Bad wikipedia id: {entity_id}. Try to get the id using the wikipedia title in the data.')
+            page = pages_of_titles[snippet['entity_name']]
+            if page is not None:
+                print('Wikipedia title exists.')
+                bad_to_good_ids[entity_id] = page[0]
+                wiki_ids_to_titles[page[0]] = snippet['entity_name']
+            else:
+                print(f"Wikipedia title {snippet['entity_name']} also not good. Ignore annotation.")
 
 # save the wikipedia-ids-to-titles-dictionary
 with open(
@@ -273,15 +282,12 @@ for filename in ['Shadow', 'Tail', 'Top']:
             first = True
             annotated_tokens_string = ''
 
-            for token in sentence:
+            # the tokens that start inside the mention, a token that reaches beyond the mention is only annotated if it is a word
+            token_starts = [token.start_pos for token in sentence]
+            for token_index in get_token_range(token_starts, start_of_mention, end_of_mention):
+                token = sentence.tokens[token_index]
 
-                if ((token.start_pos >= start_of_mention and token.end_pos <= end_of_mention)
-                        or (
-                                token.start_pos >= start_of_mention and token.start_pos < end_of_mention and token.text.isalpha())
-                        or (
-                                token.start_pos >= start_of_mention and token.start_pos < end_of_mention and token.text[
-                                                                                                             :-1].isalpha())
-                ):
+                if token.end_pos <= end_of_mention or token.text.isalpha() or token.text[:-1].isalpha():
                     if first:
                         token.set_label(typename='nel', value='B-' + str(entity_id) + '\t' + 'B-' + wikiname.replace(' ', '_'))
                         first = False
@@ -3,13 +3,15 @@
 # and can be downloaded here: https://ucinlp.github.io/tweeki/
 from pathlib import Path
 
-import wikipediaapi
-from qwikidata.linked_data_interface import get_entity_dict_from_api
 import pickle
 import json
 import os
+import sys
 
-wiki_wiki = wikipediaapi.Wikipedia(language="en")
+# the ids and titles are resolved by the shared resolvers in scripts/scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.wikidata_resolver import WikidataResolver
+from scripts_to_create_zelda.wikipedia_dump_resolver import get_wikipedia_resolver
 
 wiki_ids_to_titles = {}  # save upt-to-date wikipedia ids and corresponding page titles
 annotations_to_wikipedia_ids = {}  # keep track of the annotations we already saw
@@ -25,46 +27,47 @@ input_data_folder.mkdir(exist_ok=True, parents=True)
 output_data_folder = Path(output_data_folder)
 output_data_folder.mkdir(exist_ok=True, parents=True)
 
+# the results of the wikipedia api are cached here, the other scripts use the same cache
+path_to_wikipedia_cache = input_data_folder / 'wikipedia_api_cache.sqlite'
+
+# to resolve the ids and titles offline instead, set the page and redirect tables of a wikipedia dump
+# (see wikipedia_dump_resolver.py in scripts/scripts_to_create_zelda)
+path_to_page_table = ''
+path_to_redirect_table = ''
+
+# the results of the wikidata api are cached here
+path_to_wikidata_cache = input_data_folder / 'wikidata_api_cache.sqlite'
+
 
 # First thing we do is to process the annotations, annotations come in the form 'wikipedia_page_title|wikidata_q_id'
 # What we want is wikipedia title and wikipedia id (both up-to-date)
 
 # this fucntion takes an annotation in the form 'wikipedia_page_title|wikidata_q_id' and hands back wikipedia title and wikipedia id, if they exist
-def get_up_to_date_wiki_title_and_id_from_tweeki_annotation(annotation: str):
+# pages_of_titles contains the pages of the wikipedia names (see WikipediaResolver.resolve_titles) and
+# enwiki_titles_of_q_ids the wikipedia names saved in wikidata (see WikidataResolver.resolve_enwiki_titles)
+def get_up_to_date_wiki_title_and_id_from_tweeki_annotation(annotation: str, pages_of_titles, enwiki_titles_of_q_ids):
     wikiname, q_id = annotation.split('|')
     # first, try with the given wikipedia name
-    try:
-        page = wiki_wiki.page(wikiname)
-
-        if page.exists():  # page exists
-            return page.pageid, page.title
-        else:
-            print(f"Wikipedia page name '{wikiname}' does not exist")
-            print('Try with q-id')
-            try:
-                q_dict = get_entity_dict_from_api(q_id)
+    page = pages_of_titles[wikiname]
 
-                print('q-id is okay!')
+    if page is not None:  # page exists
+        return page
 
-                try:
-                    # try to acces the wikipedia page name saved in wikidata
-                    wikiname = q_dict['sitelinks']['enwiki']['title']
+    print(f"Wikipedia page name '{wikiname}' does not exist")
+    print('Try with q-id')
 
-                    page = wiki_wiki.page(wikiname)
+    # try the wikipedia page name saved in wikidata
+    wikiname = enwiki_titles_of_q_ids[q_id]
+    if wikiname is None:
+        print(f"No english wikipedia link to q-id {q_id} in wikidata (or the q-id does not exist), do not use annotation '{annotation}'")
+        return None, None
 
-                    if page.exists():
-                        return page.pageid, page.title
-                    else:
-                        assert 0, 'wikiname saved in wikidata does not exist?????'
+    page = pages_of_titles[wikiname]
+    if page is None:
+        print(f"q-id also not okay!!! do not use '{annotation}' ")
+        return None, None
 
-                except KeyError:
-                    print(f"No english wikipedia link to q-id {q_id} in wikidata, do not use annotation '{annotation}'")
-                    return None, None
-            except:
-                print(f"q-id also not okay!!! do not use '{annotation}' ")
-                return None, None
-    except:
-        assert 0, 'Unexpected exception with wikipedia page name ???'
+    return page
 
 
 # open the tweeki conll file and get all the annotations
@@ -78,13 +81,23 @@ with open(input_data_folder / 'Tweeki_gold' / 'Tweeki_gold', mode='r', encoding=
             if annotation != '-':
                 set_of_annotations.add(annotation)
 
-    for annotation in set_of_annotations:
-        wikipedia_id, wikipedia_title = get_up_to_date_wiki_title_and_id_from_tweeki_annotation(annotation)
-        if wikipedia_id:
-            wiki_ids_to_titles[wikipedia_id] = wikipedia_title
-            annotations_to_wikipedia_ids[annotation] = wikipedia_id
-        else:
-            annotations_to_wikipedia_ids[annotation] = -1
+# get the pages of all wikipedia names at once, then the wikipedia names in wikidata of the q-ids of the annotations whose
+# wikipedia name does not exist
+with get_wikipedia_resolver(path_to_wikipedia_cache, path_to_page_table, path_to_redirect_table) as resolver, \
+        WikidataResolver(path_to_wikidata_cache) as wikidata_resolver:
+    pages_of_titles = resolver.resolve_titles(annotation.split('|')[0] for annotation in set_of_annotations)
+    enwiki_titles_of_q_ids = wikidata_resolver.resolve_enwiki_titles(
+        annotation.split('|')[1] for annotation in set_of_annotations if pages_of_titles[annotation.split('|')[0]] is None)
+    pages_of_titles.update(resolver.resolve_titles(title for title in enwiki_titles_of_q_ids.values() if title is not None))
+
+for annotation in set_of_annotations:
+    wikipedia_id, wikipedia_title = get_up_to_date_wiki_title_and_id_from_tweeki_annotation(annotation, pages_of_titles,
+                                                                                             enwiki_titles_of_q_ids)
+    if wikipedia_id:
+        wiki_ids_to_titles[wikipedia_id] = wikipedia_title
+        annotations_to_wikipedia_ids[annotation] = wikipedia_id
+    else:
+        annotations_to_wikipedia_ids[annotation] = -1
 
 # save the wikipedia-ids-to-titles-dictionary
 with open(
@@ -0,0 +1,92 @@
+# micro-benchmark of the token/mention alignment of the conll writer (see token_alignment.py)
+# on synthetic sections with many links we compare the previous alignment (set of offsets, sort, links.pop(0) for each
+# link) with the binary search alignment used in section_to_conll and check that both give the same column file
+# run from the scripts folder: python -m scripts_to_create_zelda.benchmark_token_alignment
+
+import random
+import timeit
+
+from scripts_to_create_zelda.write_sections_to_column_file import regex_tokenize, section_to_conll
+
+number_of_repetitions = 20
+
+
+def previous_section_to_conll(text, token_starts, sentence_starts, line_dict):
+    # the alignment as it was done before, for comparison
+    conll_lines = ['-DOCSTART-\n']
+
+    offsets = set(token_starts)
+    offsets.add(len(text))
+
+    links = []
+    for (mention_start, mention_end), wikiname, wikiid in zip(line_dict['index'], line_dict['wikipedia_titles'], line_dict['wikipedia_ids']):
+        if mention_start == mention_end: continue
+        offsets.add(mention_start)
+        links.append((mention_start, mention_end, wikiname.replace(' ', '_'), str(wikiid)))
+
+    offsets_ordered = list(offsets)
+    offsets_ordered.sort()
+
+    next_link = links.pop(0)
+    entity_started = False
+
+    for start, end in zip(offsets_ordered, offsets_ordered[1:]):
+
+        if start in sentence_starts:
+            conll_lines.append('\n')
+
+        span_token = text[start:end].rstrip()
+
+        if next_link and start > next_link[1] - 1:
+            next_link = links.pop(0) if len(links) > 0 else None
+            entity_started = False
+
+        tag = 'O\tO'
+
+        if next_link and entity_started and start > next_link[0]:
+            tag = 'I-' + next_link[3] + '\t' + 'I-' + next_link[2]
+
+        if next_link and start == next_link[0]:
+            tag = 'B-' + next_link[3] + '\t' + 'B-' + next_link[2]
+            entity_started = True
+
+        if span_token.strip() != '':
+            conll_lines.append(span_token + '\t' + tag + '\n')
+
+    conll_lines.append('\n')
+
+    return conll_lines
+
+
+def create_section(number_of_words, number_of_links, seed=11):
+    # a section of random words where number_of_links non-overlapping word sequences are links
+    rng = random.Random(seed)
+    words = ['Berlin', 'is', 'the', 'capital', 'of', 'Germany', '.', 'It', "'s", 'largest', 'city', ',', 'and', 'state']
+    starts = []
+    text = ''
+    for _ in range(number_of_words):
+        starts.append(len(text))
+        text += rng.choice(words) + ' '
+    index = []
+    for word_index in sorted(rng.sample(range(0, number_of_words - 1, 2), number_of_links)):
+        index.append((starts[word_index], starts[word_index + 1] + 1))
+    line_dict = {'text': text, 'index': index, 'wikipedia_ids': list(range(number_of_links)),
+                 'wikipedia_titles': ['Title ' + str(i) for i in range(number_of_links)]}
+    return text, line_dict
+
+
+if __name__ == '__main__':
+    print(f'{"words":>8}{"links":>8}{"previous (ms)":>16}{"bisect (ms)":>14}{"speedup":>10}')
+    for number_of_words, number_of_links in [(200, 20), (2000, 200), (10000, 1000), (50000, 5000)]:
+        text, line_dict = create_section(number_of_words, number_of_links)
+        token_starts, sentence_starts = regex_tokenize(text)
+
+        assert previous_section_to_conll(text, token_starts, sentence_starts, line_dict) == \
+               section_to_conll(text, token_starts, sentence_starts, line_dict)
+
+        previous = timeit.timeit(lambda: previous_section_to_conll(text, token_starts, sentence_starts, line_dict),
+                                 number=number_of_repetitions) / number_of_repetitions
+        current = timeit.timeit(lambda: section_to_conll(text, token_starts, sentence_starts, line_dict),
+                                number=number_of_repetitions) / number_of_repetitions
+
+        print(f'{number_of_words:>8}{number_of_links:>8}{previous * 1000:>16.3f}{current * 1000:>14.3f}{previous / current:>10.1f}')
@@ -0,0 +1,63 @@
+# benchmark of the tokenizer backends of the conll writer (see write_sections_to_column_file.py)
+# on the first sections of zelda_train.jsonl we measure the throughput of each backend (single process, model loading
+# included) and how well its token and sentence boundaries agree with the 'spacy' backend that was used to create ZELDA
+# run from the scripts folder: python -m scripts_to_create_zelda.benchmark_tokenizer_backends
+
+import itertools
+import os
+import time
+
+from scripts_to_create_zelda.write_sections_to_column_file import TOKENIZER_BACKENDS, read_sections, section_to_conll, \
+    tokenize_sections
+
+PATH_TO_REPOSITORY = ''
+
+number_of_sections = 10000
+
+
+def boundary_f1(reference_boundaries, predicted_boundaries):
+    # f1 score of the predicted boundaries (offsets) with respect to the reference boundaries
+    correct = len(reference_boundaries & predicted_boundaries)
+    if correct == 0:
+        return 0.
+    precision = correct / len(predicted_boundaries)
+    recall = correct / len(reference_boundaries)
+    return 2 * precision * recall / (precision + recall)
+
+
+if __name__ == '__main__':
+
+    sections = list(itertools.islice(read_sections(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_train.jsonl')),
+                                     number_of_sections))
+    number_of_characters = sum(len(text) for text, _ in sections)
+
+    outputs = {}
+    seconds = {}
+    for backend in TOKENIZER_BACKENDS:
+        start_time = time.time()
+        outputs[backend] = list(tokenize_sections(sections, tokenizer_backend=backend, number_of_processes=1))
+        seconds[backend] = time.time() - start_time
+
+    reference = outputs['spacy']
+
+    print(f'Benchmark on {len(sections)} sections ({number_of_characters} characters)')
+    print(f'{"backend":<12}{"sections/s":>12}{"chars/s":>12}{"speedup":>10}{"token F1":>10}{"sent. F1":>10}{"same conll":>12}')
+    for backend in TOKENIZER_BACKENDS:
+        token_f1 = 0.
+        sentence_f1 = 0.
+        same_conll = 0
+        for (text, token_starts, sentence_starts, (line_dict, _)), (_, reference_token_starts, reference_sentence_starts, _) \
+                in zip(outputs[backend], reference):
+            token_f1 += boundary_f1(set(reference_token_starts), set(token_starts))
+            sentence_f1 += boundary_f1(reference_sentence_starts, sentence_starts)
+            if section_to_conll(text, token_starts, sentence_starts, line_dict) == \
+                    section_to_conll(text, reference_token_starts, reference_sentence_starts, line_dict):
+                same_conll += 1
+
+        print(f'{backend:<12}'
+              f'{len(sections) / seconds[backend]:>12.1f}'
+              f'{number_of_characters / seconds[backend]:>12.0f}'
+              f'{seconds["spacy"] / seconds[backend]:>10.1f}'
+              f'{token_f1 / len(sections):>10.4f}'
+              f'{sentence_f1 / len(sections):>10.4f}'
+              f'{same_conll / len(sections):>12.4f}')
@@ -0,0 +1,39 @@
+# mention entities counters (dictionary mention -> dictionary entity -> count), the candidate lists of one source
+# the scripts in scripts_for_candidate_lists count the entities by their wikipedia ids (ints) instead of their titles,
+# the same long title strings would otherwise be repeated for millions of mentions. The titles are only looked up
+# (in zelda_ids_to_titles) when the lists are merged, older counters with titles are still read as they are
+
+import pickle
+
+
+def has_entity_ids(mention_entities_counter):
+    # whether the entities of a counter are wikipedia ids (and not titles)
+    for candidates in mention_entities_counter.values():
+        for entity in candidates:
+            return isinstance(entity, int)
+    return False
+
+
+def entity_ids_to_titles(mention_entities_counter, ids_to_titles):
+    # returns the counter with titles instead of ids, the counts of ids with the same title are added
+    counter_with_titles = {}
+    for mention, candidates in mention_entities_counter.items():
+        candidates_with_titles = counter_with_titles[mention] = {}
+        for idx, count in candidates.items():
+            title = ids_to_titles[idx]
+            candidates_with_titles[title] = candidates_with_titles.get(title, 0) + count
+    return counter_with_titles
+
+
+def save_mention_entities_counter(mention_entities_counter, path):
+    with open(path, 'wb') as handle:
+        pickle.dump(mention_entities_counter, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_mention_entities_counter(handle, ids_to_titles=None):
+    # loads a pickled counter from an open (binary) file, a counter with ids is returned with titles if ids_to_titles is
+    # given, so callers that expect titles work with both kinds of counters
+    mention_entities_counter = pickle.load(handle)
+    if ids_to_titles is not None and has_entity_ids(mention_entities_counter):
+        return entity_ids_to_titles(mention_entities_counter, ids_to_titles)
+    return mention_entities_counter
@@ -0,0 +1,100 @@
+# incremental updates of the candidate index: instead of rerunning all counter scripts and merge_candidate_lists, the
+# changes of the lists, i.e. (mention, entity title, count change) triples, are added to the index as a delta segment
+# (e.g. the counts of a new source, or the differences between the new and the old counts of a refreshed source, see
+# get_counter_changes). The lookups of CandidateIndex merge the candidates of the index with all segments of its version
+# (see candidate_index.py), the counts of the changes are added like the 'sum' aggregation of merge_candidate_lists
+# compact_candidate_index folds the segments into a new version of the index, it can run while the index is used:
+# the new version is written next to the index and only the final swap of the folders holds the lock of the index
+# Note: indices with top_k do not contain the counts of all candidates and can not be compacted
+
+import json
+import os
+import shutil
+import tempfile
+
+from scripts_to_create_zelda.candidate_index import DELTA_FOLDER, CandidateIndex, _open_indices, build_fuzzy_index, \
+    get_delta_paths, get_index_version, index_lock, is_fuzzy_index, write_index_files
+
+
+def get_counter_changes(new_mention_entities_counter, old_mention_entities_counter=None):
+    # yields the (mention, entity title, count change) triples that turn the old counter into the new one, without an
+    # old counter (a new source) all counts of the new counter
+    old_mention_entities_counter = old_mention_entities_counter or {}
+    for mention, candidates in new_mention_entities_counter.items():
+        old_candidates = old_mention_entities_counter.get(mention, {})
+        for entity, count in candidates.items():
+            if count != old_candidates.get(entity, 0):
+                yield mention, entity, count - old_candidates.get(entity, 0)
+    for mention, old_candidates in old_mention_entities_counter.items():
+        candidates = new_mention_entities_counter.get(mention, {})
+        for entity, count in old_candidates.items():
+            if entity not in candidates:
+                yield mention, entity, -count
+
+
+def add_candidate_delta(path_to_index, changes):
+    # writes the (mention, entity title, count change) triples as a new delta segment of the index, returns its path
+    # (None if there are no changes), the segment is written under a temporary name and renamed when it is complete
+    delta_folder = os.path.join(path_to_index, DELTA_FOLDER)
+    file_descriptor, temporary_path = tempfile.mkstemp(suffix='.delta', dir=os.path.dirname(path_to_index))
+    number_of_changes = 0
+    with open(file_descriptor, mode='w', encoding='utf-8') as segment:
+        for mention, entity, count in changes:
+            segment.write(json.dumps([mention, entity, count]) + '\n')
+            number_of_changes += 1
+    if number_of_changes == 0:
+        os.remove(temporary_path)
+        return None
+
+    # the segment gets the next number of the current version of the index
+    with index_lock(path_to_index):
+        version = get_index_version(path_to_index)
+        delta_paths = get_delta_paths(path_to_index, version)
+        number = int(os.path.basename(delta_paths[-1]).split('.')[0].split('_')[1]) + 1 if delta_paths else 0
+        os.makedirs(delta_folder, exist_ok=True)
+        path_to_segment = os.path.join(delta_folder, f'{version}_{number}.jsonl')
+        os.replace(temporary_path, path_to_segment)
+    _open_indices.pop(path_to_index, None)
+
+    print(f'Added {number_of_changes} changes to the candidate index as {path_to_segment}')
+    return path_to_segment
+
+
+def compact_candidate_index(path_to_index):
+    # writes a new version of the index that contains the changes of all its delta segments
+    with index_lock(path_to_index, shared=True):
+        version = get_index_version(path_to_index)
+        delta_paths = get_delta_paths(path_to_index, version)
+        candidate_index = CandidateIndex(path_to_index, delta_paths=delta_paths)
+    if not delta_paths:
+        print('The candidate index has no delta segments.')
+        return
+    if candidate_index.info.get('top_k') is not None:
+        raise ValueError(f'The candidate index {path_to_index} only keeps the top {candidate_index.info["top_k"]} '
+                         f'candidates of each mention, compact the full index instead')
+
+    print(f'Compact {len(delta_paths)} delta segments into version {version + 1} of the candidate index...')
+    path_to_new_index = path_to_index + '.v' + str(version + 1)
+    if os.path.exists(path_to_new_index):
+        shutil.rmtree(path_to_new_index)
+    write_index_files(path_to_new_index,
+                      lambda table: ((key, candidates.items()) for key, candidates in candidate_index.items(table)),
+                      version=version + 1)
+    if is_fuzzy_index(path_to_index):
+        build_fuzzy_index(path_to_new_index)
+
+    # segments that were added in the meantime are moved to the new version, then the new version replaces the index
+    # (processes that have the old version open keep it until they open the index again)
+    path_to_old_index = path_to_index + '.v' + str(version)
+    with index_lock(path_to_index):
+        new_delta_paths = get_delta_paths(path_to_index, version)[len(delta_paths):]
+        if new_delta_paths:
+            os.makedirs(os.path.join(path_to_new_index, DELTA_FOLDER))
+        for number, path_to_segment in enumerate(new_delta_paths):
+            os.replace(path_to_segment, os.path.join(path_to_new_index, DELTA_FOLDER, f'{version + 1}_{number}.jsonl'))
+        os.rename(path_to_index, path_to_old_index)
+        os.rename(path_to_new_index, path_to_index)
+    _open_indices.pop(path_to_index, None)
+    shutil.rmtree(path_to_old_index)
+
+    print('Done.')
@@ -0,0 +1,110 @@
+# evaluation of the candidate lists (the candidate index, see candidate_index.py) on all test splits in test_data/jsonl
+# for each split we measure how many mentions are contained in the lists, the accuracy of the most frequent sense (mfs)
+# and the recall of the candidates. The mentions of a split are read in one pass, each distinct mention is looked up
+# only once and the splits are evaluated in parallel (the processes share the memory-mapped index)
+# the results are printed as one table with a row per split and the macro average (over splits) and micro average (over
+# all mentions)
+
+import json
+import multiprocessing
+import os
+from collections import defaultdict
+from functools import partial
+
+from scripts_to_create_zelda.candidate_index import get_candidate_index, open_candidate_index
+from scripts_to_create_zelda.compressed_files import open_input
+
+
+def read_split_mentions(path_to_split):
+    # returns the list of (mention, gold title) pairs of a split
+    mentions_and_gold_titles = []
+    with open_input(path_to_split) as jsnol_input:
+        for jline in jsnol_input:
+            input_dictionary = json.loads(jline)
+            input_text = input_dictionary['text']
+            for index, gold_title in zip(input_dictionary['index'], input_dictionary['wikipedia_titles']):
+                mentions_and_gold_titles.append((input_text[index[0]: index[1]], gold_title))
+    return mentions_and_gold_titles
+
+
+def get_split_name(filename):
+    # test_aida-b.jsonl -> aida-b
+    name = filename.split('.')[0]
+    return name[len('test_'):] if name.startswith('test_') else name
+
+
+def evaluate_split(path_to_index, path_to_split, fuzzy=False):
+    # returns the counts of one split: mentions, mentions contained in the lists, correct mfs, gold among the candidates
+    # with fuzzy, mentions that are not in the lists get the candidates of the most similar key (see build_fuzzy_index)
+    candidate_index = open_candidate_index(path_to_index)
+    mentions_and_gold_titles = read_split_mentions(path_to_split)
+
+    # one lookup per distinct mention, the candidates are kept as sets for the recall
+    lookups = {}
+    for mention, _ in mentions_and_gold_titles:
+        if mention not in lookups:
+            candidates, mfs = candidate_index.get_candidates_and_mfs(mention, fuzzy=fuzzy)
+            lookups[mention] = (set(candidates), mfs)
+
+    counts = defaultdict(int)
+    for mention, gold_title in mentions_and_gold_titles:
+        candidates, mfs = lookups[mention]
+        counts['mentions'] += 1
+        if candidates:
+            counts['contained'] += 1
+            if gold_title == mfs:
+                counts['mfs'] += 1
+            if gold_title in candidates:
+                counts['recall'] += 1
+    return counts
+
+
+def evaluate_candidate_lists(PATH_TO_REPOSITORY, top_k=None, number_of_processes=None, fuzzy=False):
+    # returns a dictionary split name -> counts (see evaluate_split) for all splits in test_data/jsonl, ordered by name
+    test_folder = os.path.join(PATH_TO_REPOSITORY, 'test_data', 'jsonl')
+    filenames = sorted(os.listdir(test_folder))
+
+    # the index is opened (or built) once here, the worker processes only map it
+    candidate_index = get_candidate_index(PATH_TO_REPOSITORY, top_k=top_k, fuzzy=fuzzy)
+    path_to_index = candidate_index.path
+
+    if not number_of_processes:
+        number_of_processes = min(len(filenames), multiprocessing.cpu_count())
+
+    paths = [os.path.join(test_folder, filename) for filename in filenames]
+    process = partial(evaluate_split, path_to_index, fuzzy=fuzzy)
+    if number_of_processes == 1:
+        results = list(map(process, paths))
+    else:
+        with multiprocessing.Pool(number_of_processes) as pool:
+            results = pool.map(process, paths)
+
+    return {get_split_name(filename): counts for filename, counts in zip(filenames, results)}
+
+
+def print_evaluation_table(results):
+    # per split, the macro average over the splits and the micro average over all mentions
+    columns = ['mentions', 'missing', 'mfs acc.', 'mfs acc. (cont.)', 'recall', 'recall (cont.)']
+    header = f'{"split":<22}' + ''.join(f'{column:>18}' for column in columns)
+    print(header)
+    print('-' * len(header))
+
+    def rates(counts):
+        mentions = max(counts['mentions'], 1)
+        contained = max(counts['contained'], 1)
+        return [counts['mfs'] / mentions, counts['mfs'] / contained, counts['recall'] / mentions, counts['recall'] / contained]
+
+    def print_row(name, mentions, missing, row_rates):
+        print(f'{name:<22}{mentions:>18}{missing:>18}' + ''.join(f'{rate:>18.3f}' for rate in row_rates))
+
+    all_counts = defaultdict(int)
+    split_rates = []
+    for split_name, counts in results.items():
+        split_rates.append(rates(counts))
+        print_row(split_name, counts['mentions'], counts['mentions'] - counts['contained'], split_rates[-1])
+        for key, count in counts.items():
+            all_counts[key] += count
+
+    print('-' * len(header))
+    print_row('macro average', '', '', [sum(column) / max(len(split_rates), 1) for column in zip(*split_rates)])
+    print_row('micro average', all_counts['mentions'], all_counts['mentions'] - all_counts['contained'], rates(all_counts))
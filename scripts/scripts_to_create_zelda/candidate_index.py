@@ -0,0 +1,672 @@
+# on-disk index of the candidate lists (the mention entities counter), to replace loading the pickled dictionary
+# the pickle 'zelda_mention_entities_counter.pickle' maps each mention to a dictionary entity title -> count, loading it
+# takes many GB and tens of seconds in every process. The index stores the same lists in flat binary arrays that are
+# memory-mapped, so opening it costs nothing and all processes share it through the page cache:
+# - the mentions (utf-8) sorted and concatenated in one byte array, key_starts delimits them, lookups are binary searches
+# - the candidates of all mentions in three arrays (entity codes, counts and prior probabilities p(e|m), i.e. the count
+#   divided by the sum of the counts of the mention), candidate_starts delimits the candidates of each mention
+#   The candidates of a mention are sorted by count (ties in the order of the counter), so the most frequent sense is the
+#   first candidate. With top_k only the k most frequent candidates of each mention are kept, the priors (and the total
+#   counts, the sum of the counts of each mention) still refer to all candidates. An index with top_k is built from the
+#   full index and records the state of the full index it was built from, so it is built again when the full index changes
+# - the entity titles, referred to by the codes, again concatenated in one byte array with entity_title_starts
+# to improve the recall, a mention that is not in the lists is looked up in simplified forms (see KEY_TIERS), for each
+# form there is a table of the simplified mentions with the merged candidates of all mentions with the same simplified
+# form, so a lookup is one binary search per tier
+# optionally, a mention that is in none of the tables can be matched approximately (see build_fuzzy_index)
+# the index is a folder, index.json is written last and marks it as complete. Each index has a version, changes of the
+# lists can be added as delta segments of this version without rebuilding the index (see candidate_deltas.py), the
+# lookups merge the candidates of the tables with the changes of the segments
+# Note: the arrays are stored in the byte order of the machine, so the index should be built on the machine that uses it
+
+import fcntl
+import json
+import math
+import os
+import pickle
+import re
+import shutil
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+
+from scripts_to_create_zelda.kensho_reader import map_array
+
+# the version of the files of an index, indices of an older format are built again by get_candidate_index
+INDEX_FORMAT = 2
+
+# the files of a table of mentions and their candidates, name -> typecode ('B' for raw bytes)
+CANDIDATE_TABLE_FILES = {'key_starts': 'q',
+                         'keys': 'B',
+                         'key_total_counts': 'q',
+                         'candidate_starts': 'q',
+                         'candidate_entities': 'i',
+                         'candidate_counts': 'i',
+                         'candidate_priors': 'f'}
+
+ENTITY_FILES = {'entity_title_starts': 'q',
+                'entity_titles': 'B'}
+
+punc_remover = re.compile(r"[\W]+")
+
+
+def lower_case_without_blanks(mention):
+    return mention.replace(' ', '').lower()
+
+
+def remove_punctuation(mention):
+    return punc_remover.sub("", mention.lower())
+
+
+# the tables of the index in the order in which they are tried, with the function that creates their keys from a mention
+KEY_TIERS = {'exact': None,
+             'lower_case_without_blanks': lower_case_without_blanks,
+             'punctuation_removed': remove_punctuation}
+
+# the optional fuzzy tier: mentions that are in none of the tables are matched against the keys of FUZZY_TABLE by the
+# character trigrams they share. The trigrams of all keys are stored as an inverted index (the sorted trigrams and for
+# each trigram the positions of the keys that contain it), the postings of each trigram are sorted by the number of
+# trigrams of the keys, so a lookup only counts keys of a similar size. fuzzy.json is written last
+FUZZY_TABLE = 'punctuation_removed'
+
+FUZZY_FILES = {'fuzzy_trigram_starts': 'q',
+               'fuzzy_trigrams': 'B',
+               'fuzzy_posting_starts': 'q',
+               'fuzzy_postings': 'i',
+               'fuzzy_key_sizes': 'i'}
+
+# the folder of the delta segments in an index, a segment is a jsonl file of [mention, entity title, count change] lines
+# named <version of the index>_<number of the segment>.jsonl
+DELTA_FOLDER = 'deltas'
+
+# each process opens an index only once
+_open_indices = {}
+
+
+def is_candidate_index(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, 'index.json'))
+
+
+def is_fuzzy_index(path_to_index):
+    return os.path.exists(os.path.join(path_to_index, 'fuzzy.json'))
+
+
+@contextmanager
+def index_lock(path_to_index, shared=False):
+    # lock of an index (a file next to its folder), a new version of the index replaces the folder under the exclusive
+    # lock, readers open the index under the shared lock
+    with open(path_to_index + '.lock', mode='w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def get_index_version(path_to_index):
+    # indices that were built before the versions have version 0
+    with open(os.path.join(path_to_index, 'index.json'), mode='r', encoding='utf-8') as index_info:
+        return json.load(index_info).get('version', 0)
+
+
+def get_delta_paths(path_to_index, version):
+    # the paths of the delta segments of a version of the index, in the order in which they were added
+    delta_folder = os.path.join(path_to_index, DELTA_FOLDER)
+    if not os.path.isdir(delta_folder):
+        return []
+    prefix = str(version) + '_'
+    numbers = sorted(int(name[len(prefix):-len('.jsonl')]) for name in os.listdir(delta_folder)
+                     if name.startswith(prefix) and name.endswith('.jsonl'))
+    return [os.path.join(delta_folder, prefix + str(number) + '.jsonl') for number in numbers]
+
+
+def read_delta_segment(path_to_segment):
+    # yields the (mention, entity title, count change) triples of a segment
+    with open(path_to_segment, mode='r', encoding='utf-8') as segment:
+        for line in segment:
+            mention, entity, count = json.loads(line)
+            yield mention, entity, count
+
+
+def get_index_state(path_to_index):
+    # the state of a (complete) index: its version, the number of its delta segments and the time it was written
+    version = get_index_version(path_to_index)
+    return {'version': version, 'number_of_deltas': len(get_delta_paths(path_to_index, version)),
+            'written': os.stat(os.path.join(path_to_index, 'index.json')).st_mtime_ns}
+
+
+def is_up_to_date(path_to_index, top_k=None, source=None):
+    # whether a (complete) index has the format and the tables of this script, was built with top_k and, if it was built
+    # from another index, from the given state of that index (see get_index_state)
+    with open(os.path.join(path_to_index, 'index.json'), mode='r', encoding='utf-8') as index_info:
+        info = json.load(index_info)
+    return info.get('format') == INDEX_FORMAT and list(info['tables']) == list(KEY_TIERS) and \
+        info.get('top_k') == top_k and info.get('source') == source
+
+
+def encode(text):
+    # mentions from the wikipedia dumps may contain lone surrogates, which plain utf-8 can not encode
+    # the utf-8 bytes are sorted like the strings (by code points)
+    return text.encode('utf-8', 'surrogatepass')
+
+
+def decode(data):
+    return str(data, 'utf-8', 'surrogatepass')
+
+
+def search_sorted(keys, key_starts, key):
+    # binary search for key (bytes) in the sorted keys concatenated in keys and delimited by key_starts,
+    # returns its position or -1
+    low = 0
+    high = len(key_starts) - 1
+    while low < high:
+        middle = (low + high) // 2
+        if keys[key_starts[middle]:key_starts[middle + 1]].tobytes() < key:
+            low = middle + 1
+        else:
+            high = middle
+    if low < len(key_starts) - 1 and keys[key_starts[low]:key_starts[low + 1]].tobytes() == key:
+        return low
+    return -1
+
+
+class ArrayFileWriter:
+    # appends values to a file of a flat array, values are collected in a buffer and written in large blocks
+
+    def __init__(self, path, typecode, buffer_length=1024 * 1024):
+        self.file = open(path, mode='wb')
+        self.typecode = typecode
+        self.buffer = array(typecode)
+        self.buffer_length = buffer_length
+        self.length = 0
+
+    def append(self, value):
+        self.buffer.append(value)
+        self.length += 1
+        if len(self.buffer) >= self.buffer_length:
+            self.flush()
+
+    def extend(self, values):
+        if isinstance(values, bytes):
+            self.buffer.frombytes(values)
+            self.length += len(values)
+        else:
+            length = len(self.buffer)
+            self.buffer.extend(values)
+            self.length += len(self.buffer) - length
+        if len(self.buffer) >= self.buffer_length:
+            self.flush()
+
+    def flush(self):
+        self.buffer.tofile(self.file)
+        self.buffer = array(self.typecode)
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def write_candidate_table(path_to_index, table, mentions_and_candidates, entity_codes, top_k=None):
+    # writes the files of a table, mentions_and_candidates yields (mention, [(entity title, count), ...]) ordered by the
+    # mentions, entity_codes maps entity titles to codes and is extended by new titles
+    # the candidates are sorted by count (stable, so ties keep their order) and cut after top_k
+    writers = {name: ArrayFileWriter(os.path.join(path_to_index, table + '_' + name + '.bin'), typecode)
+               for name, typecode in CANDIDATE_TABLE_FILES.items()}
+    writers['key_starts'].append(0)
+    writers['candidate_starts'].append(0)
+
+    previous_key = None
+    number_of_mentions = 0
+    for mention, candidates in mentions_and_candidates:
+        key = encode(mention)
+        if previous_key is not None and key <= previous_key:
+            raise ValueError(f'The mentions of a candidate table have to be sorted and unique, {mention} comes after {decode(previous_key)}')
+        previous_key = key
+
+        writers['keys'].extend(key)
+        writers['key_starts'].append(writers['keys'].length)
+        candidates = sorted(candidates, key=lambda candidate: candidate[1], reverse=True)
+        total_count = sum(count for _, count in candidates)
+        writers['key_total_counts'].append(total_count)
+        for entity, count in candidates[:top_k]:
+            code = entity_codes.get(entity)
+            if code is None:
+                code = entity_codes[entity] = len(entity_codes)
+            writers['candidate_entities'].append(code)
+            writers['candidate_counts'].append(count)
+            writers['candidate_priors'].append(count / total_count if total_count else 0.)
+        writers['candidate_starts'].append(writers['candidate_entities'].length)
+        number_of_mentions += 1
+
+    for writer in writers.values():
+        writer.close()
+
+    return number_of_mentions
+
+
+def write_entity_titles(path_to_index, entity_codes):
+    # entity_codes has to map the titles to the codes 0, 1, ... in insertion order
+    title_starts = ArrayFileWriter(os.path.join(path_to_index, 'entity_title_starts.bin'), 'q')
+    titles = ArrayFileWriter(os.path.join(path_to_index, 'entity_titles.bin'), 'B')
+    title_starts.append(0)
+    for title in entity_codes:
+        titles.extend(encode(title))
+        title_starts.append(titles.length)
+    title_starts.close()
+    titles.close()
+
+
+def merge_simplified_mentions(mention_entities_counter, simplify):
+    # returns a dictionary simplified mention -> dictionary entity title -> summed count over all mentions that have the
+    # same simplified form, the dictionaries of the counter are not changed
+    simplified_candidates = {}
+    for mention, candidates in mention_entities_counter.items():
+        merged_candidates = simplified_candidates.setdefault(simplify(mention), {})
+        for entity, count in candidates.items():
+            merged_candidates[entity] = merged_candidates.get(entity, 0) + count
+    return simplified_candidates
+
+
+def get_sorted_candidates(mention_entities_counter, simplify=None):
+    # yields (key, [(entity title, count), ...]) sorted by key, the keys are the mentions or their simplified forms
+    candidates_of_keys = mention_entities_counter if simplify is None else \
+        merge_simplified_mentions(mention_entities_counter, simplify)
+    for key in sorted(candidates_of_keys):
+        yield key, candidates_of_keys[key].items()
+
+
+def write_index_files(path_to_index, get_table_candidates, top_k=None, version=None, source=None):
+    # writes the files of an index into a new folder (see write_candidate_index)
+    os.makedirs(path_to_index)
+    entity_codes = {}
+    number_of_mentions = {}
+    for table in KEY_TIERS:
+        number_of_mentions[table] = write_candidate_table(path_to_index, table, get_table_candidates(table),
+                                                          entity_codes, top_k=top_k)
+    write_entity_titles(path_to_index, entity_codes)
+
+    with open(os.path.join(path_to_index, 'index.json'), mode='w', encoding='utf-8') as index_info:
+        json.dump({'format': INDEX_FORMAT, 'tables': number_of_mentions, 'number_of_entities': len(entity_codes),
+                   'top_k': top_k, 'version': version or 0, 'source': source}, index_info)
+
+
+def replace_candidate_index(path_to_index, path_to_new_index):
+    # replaces the folder of an index by the folder of a new (complete) index under the exclusive lock of the index
+    # the old folder is removed afterwards, processes that have its files memory-mapped keep them until they close them
+    path_to_old_index = path_to_index + '.old'
+    if os.path.exists(path_to_old_index):
+        shutil.rmtree(path_to_old_index)
+    with index_lock(path_to_index):
+        if os.path.exists(path_to_index):
+            os.rename(path_to_index, path_to_old_index)
+        os.rename(path_to_new_index, path_to_index)
+    _open_indices.pop(path_to_index, None)
+    if os.path.exists(path_to_old_index):
+        shutil.rmtree(path_to_old_index)
+
+
+def write_candidate_index(path_to_index, get_table_candidates, top_k=None, version=None, source=None):
+    # writes an index with a table for each tier of KEY_TIERS, get_table_candidates(table) has to return the
+    # (key, [(entity title, count), ...]) pairs of the table sorted by key, the tables are written one after the other
+    # if top_k is given only the top_k most frequent candidates of each mention are kept
+    # source is the state of the index the candidates come from, if they come from one (see get_index_state)
+    # without a version, the version of an existing index is increased (so its delta segments do not apply any more)
+    # the files of an index are never overwritten (other processes may have them memory-mapped), the new index is written
+    # next to an existing one and replaces it when it is complete, the fuzzy tier of an existing index is created again
+    print('Create candidate index...')
+
+    with index_lock(path_to_index, shared=True):
+        has_index = is_candidate_index(path_to_index)
+        if has_index and version is None:
+            version = get_index_version(path_to_index) + 1
+        fuzzy = has_index and is_fuzzy_index(path_to_index)
+
+    path_to_new_index = path_to_index + '.new'
+    if os.path.exists(path_to_new_index):
+        shutil.rmtree(path_to_new_index)
+    write_index_files(path_to_new_index, get_table_candidates, top_k=top_k, version=version, source=source)
+    if fuzzy:
+        build_fuzzy_index(path_to_new_index)
+    replace_candidate_index(path_to_index, path_to_new_index)
+
+    print('Done.')
+
+
+def build_candidate_index(mention_entities_counter, path_to_index, top_k=None):
+    # builds the index from a mention entities counter (dictionary mention -> dictionary entity title -> count)
+    write_candidate_index(path_to_index,
+                          lambda table: get_sorted_candidates(mention_entities_counter, KEY_TIERS[table]),
+                          top_k=top_k)
+
+
+class CandidateTable:
+    # the mentions of one table and their candidates, memory-mapped
+
+    def __init__(self, path_to_index, table):
+        for name, typecode in CANDIDATE_TABLE_FILES.items():
+            setattr(self, name, map_array(os.path.join(path_to_index, table + '_' + name + '.bin'), typecode))
+
+    def __len__(self):
+        return len(self.key_starts) - 1
+
+    def get_key(self, i):
+        return self.keys[self.key_starts[i]:self.key_starts[i + 1]].tobytes()
+
+    def find(self, mention):
+        # binary search for the mention, returns its position or -1
+        return search_sorted(self.keys, self.key_starts, encode(mention))
+
+    def get_candidate_range(self, i):
+        return self.candidate_starts[i], self.candidate_starts[i + 1]
+
+
+def get_trigrams(key):
+    # the distinct character trigrams of a key padded with a blank at both ends (the keys of FUZZY_TABLE have no blanks)
+    padded_key = ' ' + key + ' '
+    return {padded_key[i:i + 3] for i in range(len(padded_key) - 2)}
+
+
+def build_fuzzy_index(path_to_index):
+    # writes the trigram index of the keys of FUZZY_TABLE into a (complete) candidate index
+    print('Create fuzzy index...')
+    if is_fuzzy_index(path_to_index):
+        os.remove(os.path.join(path_to_index, 'fuzzy.json'))
+    _open_indices.pop(path_to_index, None)
+
+    candidate_table = CandidateTable(path_to_index, FUZZY_TABLE)
+    key_sizes = array('i')
+    postings_of_trigrams = {}
+    for i in range(len(candidate_table)):
+        trigrams = get_trigrams(decode(candidate_table.get_key(i)))
+        key_sizes.append(len(trigrams))
+        for trigram in trigrams:
+            postings = postings_of_trigrams.get(trigram)
+            if postings is None:
+                postings = postings_of_trigrams[trigram] = array('i')
+            postings.append(i)
+
+    writers = {name: ArrayFileWriter(os.path.join(path_to_index, name + '.bin'), typecode)
+               for name, typecode in FUZZY_FILES.items()}
+    writers['fuzzy_trigram_starts'].append(0)
+    writers['fuzzy_posting_starts'].append(0)
+    for trigram in sorted(postings_of_trigrams):
+        writers['fuzzy_trigrams'].extend(encode(trigram))
+        writers['fuzzy_trigram_starts'].append(writers['fuzzy_trigrams'].length)
+        # the postings are in the order of the keys, the sort by size is stable
+        writers['fuzzy_postings'].extend(sorted(postings_of_trigrams[trigram], key=key_sizes.__getitem__))
+        writers['fuzzy_posting_starts'].append(writers['fuzzy_postings'].length)
+    writers['fuzzy_key_sizes'].extend(key_sizes)
+    for writer in writers.values():
+        writer.close()
+
+    with open(os.path.join(path_to_index, 'fuzzy.json'), mode='w', encoding='utf-8') as fuzzy_info:
+        json.dump({'table': FUZZY_TABLE, 'number_of_keys': len(key_sizes),
+                   'number_of_trigrams': len(postings_of_trigrams)}, fuzzy_info)
+
+    print('Done.')
+
+
+class FuzzyTable:
+    # the trigram index of the keys of FUZZY_TABLE, memory-mapped
+
+    def __init__(self, path_to_index):
+        for name, typecode in FUZZY_FILES.items():
+            setattr(self, name, map_array(os.path.join(path_to_index, name + '.bin'), typecode))
+
+    def get_postings(self, trigram, min_size, max_size):
+        # the postings of the trigram restricted to keys with min_size to max_size trigrams (binary searches on the sizes)
+        i = search_sorted(self.fuzzy_trigrams, self.fuzzy_trigram_starts, encode(trigram))
+        if i == -1:
+            return self.fuzzy_postings[0:0]
+        bounds = []
+        for size in (min_size, max_size + 1):
+            low = self.fuzzy_posting_starts[i]
+            high = self.fuzzy_posting_starts[i + 1]
+            while low < high:
+                middle = (low + high) // 2
+                if self.fuzzy_key_sizes[self.fuzzy_postings[middle]] < size:
+                    low = middle + 1
+                else:
+                    high = middle
+            bounds.append(low)
+        return self.fuzzy_postings[bounds[0]:bounds[1]]
+
+    def find(self, mention, number_of_matches=1, min_similarity=0.6, max_postings=20000):
+        # returns up to number_of_matches (position, similarity) pairs of the keys of FUZZY_TABLE that are most similar to
+        # the simplified mention, most similar first, the similarity is the dice coefficient of the trigram sets
+        # at most max_postings postings are counted, the postings of the rarest trigrams first, this bounds the time of a
+        # lookup (frequent trigrams say little about the similarity anyway)
+        trigrams = get_trigrams(KEY_TIERS[FUZZY_TABLE](mention))
+        size = len(trigrams)
+        if size == 0:
+            return []
+        # keys with a dice coefficient of at least min_similarity have between these numbers of trigrams
+        min_size = math.ceil(size * min_similarity / (2 - min_similarity))
+        max_size = math.floor(size * (2 - min_similarity) / min_similarity)
+
+        common_trigrams = Counter()
+        number_of_postings = 0
+        for postings in sorted((self.get_postings(trigram, min_size, max_size) for trigram in trigrams), key=len):
+            number_of_postings += len(postings)
+            if number_of_postings > max_postings:
+                break
+            common_trigrams.update(postings)
+
+        # a key needs at least this many common trigrams to reach min_similarity
+        min_common = math.ceil(min_similarity * (size + min_size) / 2)
+        matches = []
+        for position, common in common_trigrams.items():
+            if common >= min_common:
+                similarity = 2 * common / (size + self.fuzzy_key_sizes[position])
+                if similarity >= min_similarity:
+                    matches.append((position, similarity))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:number_of_matches]
+
+
+class CandidateIndex:
+    # read access to a candidate index, the index stays as it was opened (a process that has it open keeps the version
+    # and the delta segments it opened, even if a new version replaces it)
+
+    def __init__(self, path_to_index, delta_paths=None):
+        self.path = path_to_index
+        with index_lock(path_to_index, shared=True):
+            with open(os.path.join(path_to_index, 'index.json'), mode='r', encoding='utf-8') as index_info:
+                self.info = json.load(index_info)
+            if self.info.get('format') != INDEX_FORMAT:
+                raise ValueError(f'The candidate index {path_to_index} was written in an older format, build it again '
+                                 f'(get_candidate_index does this)')
+            self.tables = {table: CandidateTable(path_to_index, table) for table in self.info['tables']}
+            for name, typecode in ENTITY_FILES.items():
+                setattr(self, name, map_array(os.path.join(path_to_index, name + '.bin'), typecode))
+            self.fuzzy = FuzzyTable(path_to_index) if is_fuzzy_index(path_to_index) else None
+            self.load_deltas(delta_paths)
+            # the state the index was opened in (see get_index_state)
+            self.state = {'version': self.info['version'], 'number_of_deltas': len(self.delta_paths),
+                          'written': os.stat(os.path.join(path_to_index, 'index.json')).st_mtime_ns}
+
+    def load_deltas(self, delta_paths=None):
+        # reads the changes of the delta segments (by default all segments of the version of the index), for each table
+        # a dictionary key -> dictionary entity title -> count change, the keys of a mention are created like for the
+        # tables, i.e. the changes of all mentions with the same simplified form are added up
+        if delta_paths is None:
+            delta_paths = get_delta_paths(self.path, self.info.get('version', 0))
+        self.delta_paths = delta_paths
+        self.deltas = {table: {} for table in self.tables}
+        for path_to_segment in delta_paths:
+            for mention, entity, count in read_delta_segment(path_to_segment):
+                for table, table_deltas in self.deltas.items():
+                    simplify = KEY_TIERS[table]
+                    key_deltas = table_deltas.setdefault(mention if simplify is None else simplify(mention), {})
+                    key_deltas[entity] = key_deltas.get(entity, 0) + count
+        self.has_deltas = bool(delta_paths)
+
+    def get_entity_title(self, code):
+        return decode(self.entity_titles[self.entity_title_starts[code]:self.entity_title_starts[code + 1]])
+
+    def find(self, mention, table=None, fuzzy=False):
+        # returns (candidate table, position) of the mention in the given table, or, if no table is given, in the first
+        # table of KEY_TIERS that contains its key, (None, -1) if no table contains it
+        # with fuzzy, a mention that is in none of the tables is matched to the most similar key of FUZZY_TABLE
+        tables = self.tables if table is None else {table: self.tables[table]}
+        for table, candidate_table in tables.items():
+            simplify = KEY_TIERS[table]
+            i = candidate_table.find(mention if simplify is None else simplify(mention))
+            if i != -1:
+                return candidate_table, i
+        if fuzzy:
+            i = self.find_fuzzy(mention)
+            if i != -1:
+                return self.tables[FUZZY_TABLE], i
+        return None, -1
+
+    def find_fuzzy(self, mention):
+        # position of the most similar key of FUZZY_TABLE or -1
+        if self.fuzzy is None:
+            raise ValueError(f'The candidate index {self.path} has no fuzzy tier, create it with build_fuzzy_index')
+        matches = self.fuzzy.find(mention)
+        return matches[0][0] if matches else -1
+
+    def find_key(self, mention, table=None, fuzzy=False):
+        # like find, but the keys of the delta segments count as well, returns (table, key, position), the position is
+        # -1 for keys that are only in the delta segments, (None, None, -1) if the mention is not found
+        tables = self.tables if table is None else {table: self.tables[table]}
+        for table, candidate_table in tables.items():
+            simplify = KEY_TIERS[table]
+            key = mention if simplify is None else simplify(mention)
+            i = candidate_table.find(key)
+            if i != -1 or key in self.deltas[table]:
+                return table, key, i
+        if fuzzy:
+            i = self.find_fuzzy(mention)
+            if i != -1:
+                return FUZZY_TABLE, decode(self.tables[FUZZY_TABLE].get_key(i)), i
+        return None, None, -1
+
+    def get_ranked_candidates(self, mention, table=None, fuzzy=False):
+        # returns the (entity title, count, p(e|m)) triples of the mention with the changes of the delta segments added,
+        # sorted by count (ties in the order of the index, new entities last), None if the mention is not found
+        # candidates whose count drops to 0 are removed
+        table, key, i = self.find_key(mention, table, fuzzy)
+        if table is None:
+            return None
+        candidate_table = self.tables[table]
+        candidates = {}
+        total_count = 0
+        if i != -1:
+            start, end = candidate_table.get_candidate_range(i)
+            for code, count in zip(candidate_table.candidate_entities[start:end], candidate_table.candidate_counts[start:end]):
+                candidates[self.get_entity_title(code)] = count
+            # with top_k the total count also contains the counts of the candidates that were cut
+            total_count = candidate_table.key_total_counts[i]
+        for entity, count in self.deltas[table].get(key, {}).items():
+            candidates[entity] = candidates.get(entity, 0) + count
+            total_count += count
+        ranked_candidates = sorted(((entity, count) for entity, count in candidates.items() if count > 0),
+                                   key=lambda candidate: candidate[1], reverse=True)[:self.info.get('top_k')]
+        return [(entity, count, count / total_count if total_count > 0 else 0.) for entity, count in ranked_candidates]
+
+    def get_candidates(self, mention, table=None, fuzzy=False):
+        # returns the dictionary entity title -> count of the mention (like the mention entities counter) or None
+        if self.has_deltas:
+            ranked_candidates = self.get_ranked_candidates(mention, table, fuzzy)
+            return None if ranked_candidates is None else {entity: count for entity, count, _ in ranked_candidates}
+        candidate_table, i = self.find(mention, table, fuzzy)
+        if candidate_table is None:
+            return None
+        start, end = candidate_table.get_candidate_range(i)
+        return {self.get_entity_title(code): count for code, count in
+                zip(candidate_table.candidate_entities[start:end], candidate_table.candidate_counts[start:end])}
+
+    def get_candidates_and_mfs(self, mention, table=None, fuzzy=False):
+        # returns the list of candidate titles and the most frequent sense (like get_candidates_and_mfs in
+        # demo_of_candidate_lists.py), or ([], '') if the mention is not in the index
+        if self.has_deltas:
+            candidates = [entity for entity, _, _ in self.get_ranked_candidates(mention, table, fuzzy) or []]
+            return candidates, candidates[0] if candidates else ''
+        candidate_table, i = self.find(mention, table, fuzzy)
+        if candidate_table is None:
+            return [], ''
+        start, end = candidate_table.get_candidate_range(i)
+        if start == end:
+            return [], ''
+        # the candidates are sorted by count, the first one is the most frequent sense
+        candidates = [self.get_entity_title(code) for code in candidate_table.candidate_entities[start:end]]
+        return candidates, candidates[0]
+
+    def get_candidates_and_priors(self, mention, table=None, fuzzy=False):
+        # returns the list of (candidate title, p(e|m)) pairs of the mention, most probable first
+        if self.has_deltas:
+            return [(entity, prior) for entity, _, prior in self.get_ranked_candidates(mention, table, fuzzy) or []]
+        candidate_table, i = self.find(mention, table, fuzzy)
+        if candidate_table is None:
+            return []
+        start, end = candidate_table.get_candidate_range(i)
+        return [(self.get_entity_title(code), prior) for code, prior in
+                zip(candidate_table.candidate_entities[start:end], candidate_table.candidate_priors[start:end])]
+
+    def items(self, table='exact'):
+        # yields (mention, dictionary entity title -> count) for all mentions of a table, ordered by the mentions
+        # with the changes of the delta segments (the keys that are only in the segments are merged into the order)
+        candidate_table = self.tables[table]
+        table_deltas = self.deltas[table]
+        delta_keys = sorted(table_deltas)
+        next_delta_key = 0
+        for i in range(len(candidate_table)):
+            key = decode(candidate_table.get_key(i))
+            while next_delta_key < len(delta_keys) and delta_keys[next_delta_key] < key:
+                yield delta_keys[next_delta_key], self.add_deltas({}, table_deltas[delta_keys[next_delta_key]])
+                next_delta_key += 1
+            start, end = candidate_table.get_candidate_range(i)
+            candidates = {self.get_entity_title(code): count for code, count in
+                          zip(candidate_table.candidate_entities[start:end], candidate_table.candidate_counts[start:end])}
+            if next_delta_key < len(delta_keys) and delta_keys[next_delta_key] == key:
+                candidates = self.add_deltas(candidates, table_deltas[key])
+                next_delta_key += 1
+            yield key, candidates
+        for key in delta_keys[next_delta_key:]:
+            yield key, self.add_deltas({}, table_deltas[key])
+
+    @staticmethod
+    def add_deltas(candidates, key_deltas):
+        # adds the changes of a key to its candidates (the dictionary is changed), candidates with count 0 are removed
+        for entity, count in key_deltas.items():
+            candidates[entity] = candidates.get(entity, 0) + count
+        return {entity: count for entity, count in candidates.items() if count > 0}
+
+
+def open_candidate_index(path_to_index):
+    if path_to_index not in _open_indices:
+        _open_indices[path_to_index] = CandidateIndex(path_to_index)
+    return _open_indices[path_to_index]
+
+
+def get_candidate_index(PATH_TO_REPOSITORY, top_k=None, fuzzy=False):
+    # opens the candidate index in repo/train_data, it is built from the pickled mention entities counter if it does not exist yet
+    # with top_k, the index of the top_k most frequent candidates of each mention is used (it is stored separately), it is
+    # built from the full index (with its delta segments) and built again whenever the full index changed since
+    # with fuzzy, the fuzzy tier is created if the index does not have it yet
+    path_to_index = os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_candidate_index')
+    # a new version of the index may replace the folder at the moment (see compact_candidate_index)
+    with index_lock(path_to_index, shared=True):
+        needs_build = not is_candidate_index(path_to_index) or not is_up_to_date(path_to_index)
+    if needs_build:
+        with open(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_mention_entities_counter.pickle'), 'rb') as handle:
+            mention_entities_counter = pickle.load(handle)
+        build_candidate_index(mention_entities_counter, path_to_index)
+
+    if top_k is not None:
+        full_index = CandidateIndex(path_to_index)
+        path_to_index += '_top_' + str(top_k)
+        with index_lock(path_to_index, shared=True):
+            needs_build = not is_candidate_index(path_to_index) or \
+                          not is_up_to_date(path_to_index, top_k, source=full_index.state)
+        if needs_build:
+            print(f'The index of the top {top_k} candidates is missing or older than the candidate index.')
+            write_candidate_index(path_to_index,
+                                  lambda table: ((key, candidates.items()) for key, candidates in full_index.items(table)),
+                                  top_k=top_k, source=full_index.state)
+
+    if fuzzy and not is_fuzzy_index(path_to_index):
+        build_fuzzy_index(path_to_index)
+    return open_candidate_index(path_to_index)
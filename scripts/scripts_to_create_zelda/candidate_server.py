@@ -0,0 +1,170 @@
+# a local server for the candidate lists, so that the training and inference workers of a host share one candidate index
+# (and one cache) instead of each loading the lists. The server answers batches of mentions with the same results as
+# CandidateIndex.get_candidates_and_mfs (see candidate_index.py), the results of frequent mentions are kept in an LRU cache
+# the api is json over http, either on a tcp address (host, port) or on a unix socket (a path):
+# - POST /candidates with {"mentions": [...]} returns {"candidates": [[[candidate titles], mfs], ...]}
+# - GET /info returns the info of the index and the statistics of the cache
+# the connections are kept alive (http/1.1), each connection is served by its own thread
+
+import http.client
+import json
+import os
+import socket
+import socketserver
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts_to_create_zelda.candidate_index import get_candidate_index
+
+
+class CandidateRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # the headers and the body of a response are written separately, with nagle's algorithm the body would wait for the
+    # (delayed) acknowledgement of the headers
+    disable_nagle_algorithm = True
+
+    def send_json(self, status, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/info':
+            self.send_json(404, {'error': f'Unknown path {self.path}'})
+            return
+        self.send_json(200, {'index': self.server.candidate_index.info,
+                             'fuzzy': self.server.fuzzy,
+                             'cache': self.server.get_candidates_and_mfs.cache_info()._asdict()})
+
+    def do_POST(self):
+        # the body is read in any case, otherwise it would be taken for the next request of the connection
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path != '/candidates':
+            self.send_json(404, {'error': f'Unknown path {self.path}'})
+            return
+        try:
+            mentions = json.loads(body)['mentions']
+        except (TypeError, ValueError, KeyError) as error:
+            self.send_json(400, {'error': f'Bad request: {error!r}'})
+            return
+        # a string would be looked up character by character, lists or dictionaries can not be cached
+        if not isinstance(mentions, list) or not all(isinstance(mention, str) for mention in mentions):
+            self.send_json(400, {'error': 'Bad request: mentions has to be a list of strings'})
+            return
+        self.send_json(200, {'candidates': [self.server.get_candidates_and_mfs(mention) for mention in mentions]})
+
+    def address_string(self):
+        # clients of a unix socket have no address
+        return str(self.client_address[0]) if self.client_address else 'unix socket'
+
+    def log_message(self, format, *args):
+        # no log line for each request
+        pass
+
+
+class UnixCandidateRequestHandler(CandidateRequestHandler):
+    # nagle's algorithm only exists for tcp, setting TCP_NODELAY on a unix socket fails
+    disable_nagle_algorithm = False
+
+
+class CandidateServerMixin:
+    # the candidate index and the cached lookup of a server
+
+    daemon_threads = True
+
+    def set_candidate_index(self, candidate_index, cache_size, fuzzy):
+        self.candidate_index = candidate_index
+        self.fuzzy = fuzzy
+        self.get_candidates_and_mfs = lru_cache(maxsize=cache_size)(
+            lambda mention: candidate_index.get_candidates_and_mfs(mention, fuzzy=fuzzy))
+
+
+class CandidateServer(CandidateServerMixin, ThreadingHTTPServer):
+    pass
+
+
+class UnixCandidateServer(CandidateServerMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    def server_bind(self):
+        # a socket file that is left from an earlier server is replaced
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+
+
+def create_candidate_server(candidate_index, address, cache_size=100000, fuzzy=False):
+    # address is (host, port) for tcp or the path of a unix socket, cache_size is the number of cached mentions
+    if isinstance(address, str):
+        server = UnixCandidateServer(address, UnixCandidateRequestHandler)
+    else:
+        server = CandidateServer(tuple(address), CandidateRequestHandler)
+    server.set_candidate_index(candidate_index, cache_size, fuzzy)
+    return server
+
+
+def serve_candidates(PATH_TO_REPOSITORY, address, top_k=None, fuzzy=False, cache_size=100000):
+    # opens (or builds, see get_candidate_index) the candidate index and serves it until the process is stopped
+    candidate_index = get_candidate_index(PATH_TO_REPOSITORY, top_k=top_k, fuzzy=fuzzy)
+    with create_candidate_server(candidate_index, address, cache_size=cache_size, fuzzy=fuzzy) as server:
+        print(f'Serving the candidate lists on {address}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, path_to_socket, timeout=60):
+        super().__init__('localhost', timeout=timeout)
+        self.path_to_socket = path_to_socket
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path_to_socket)
+
+
+class CandidateClient:
+    # client of a candidate server, keeps one connection open (a client should not be shared by threads)
+
+    def __init__(self, address, timeout=60):
+        if isinstance(address, str):
+            self.connection = UnixHTTPConnection(address, timeout=timeout)
+        else:
+            self.connection = http.client.HTTPConnection(*address, timeout=timeout)
+
+    def request(self, method, path, content=None):
+        body = None if content is None else json.dumps(content).encode('utf-8')
+        headers = {} if body is None else {'Content-Type': 'application/json'}
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        result = json.loads(response.read())
+        if response.status != 200:
+            raise ValueError(f'The candidate server answered {response.status}: {result.get("error")}')
+        return result
+
+    def get_candidates_and_mfs_batch(self, mentions):
+        # returns a (list of candidate titles, most frequent sense) pair for each mention
+        return [(candidates, mfs) for candidates, mfs in
+                self.request('POST', '/candidates', {'mentions': list(mentions)})['candidates']]
+
+    def get_candidates_and_mfs(self, mention):
+        return self.get_candidates_and_mfs_batch([mention])[0]
+
+    def get_info(self):
+        return self.request('GET', '/info')
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
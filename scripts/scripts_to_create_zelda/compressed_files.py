@@ -0,0 +1,73 @@
+# reading and writing (possibly) compressed text files, used for the jsonl and conll files of ZELDA
+# the files can be written uncompressed, with gzip or with zstd (needs the 'zstandard' package), the compression is
+# marked by the suffix of the file name ('.gz', '.zst')
+# when reading, the compression is detected from the first bytes of the file, so readers do not need to know it
+
+import gzip
+import io
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# writes go through a large buffer, so that the (network) file system sees few large writes
+BUFFER_SIZE = 1024 * 1024
+
+
+def get_output_path(path, compression=None):
+    # returns the path with the suffix of the compression
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f'Unknown compression {compression}, choose one of {list(COMPRESSION_SUFFIXES)}')
+    return path + COMPRESSION_SUFFIXES[compression]
+
+
+def find_input_file(path):
+    # returns the path of the file, or of its compressed version if only that exists (the newest one if there are several)
+    candidates = [path + suffix for suffix in COMPRESSION_SUFFIXES.values() if os.path.exists(path + suffix)]
+    if not candidates:
+        raise FileNotFoundError(f'Neither {path} nor a compressed version of it exists')
+    return max(candidates, key=os.path.getmtime)
+
+
+def open_output(path, compression=None):
+    # opens a text file for writing, path should already have the suffix of the compression (see get_output_path)
+    if compression is None:
+        return open(path, mode='w', encoding='utf-8', buffering=BUFFER_SIZE)
+
+    if compression == 'gzip':
+        # a lower level than the default 9 is much faster and the files are only slightly larger
+        return gzip.open(path, mode='wt', encoding='utf-8', compresslevel=6)
+
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstd compression needs the 'zstandard' package (pip install zstandard)")
+        # the compression runs in background threads (threads=-1 uses all cores)
+        stream = zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(open(path, mode='wb', buffering=BUFFER_SIZE),
+                                                                             closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+
+    raise ValueError(f'Unknown compression {compression}, choose one of {list(COMPRESSION_SUFFIXES)}')
+
+
+def decompress(raw):
+    # wraps a binary file (opened at its beginning) such that reading returns the decompressed bytes
+    magic = raw.peek(4)[:4]
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if magic.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise ImportError("the file is zstd compressed, reading it needs the 'zstandard' package (pip install zstandard)")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+    return raw
+
+
+def open_input(path):
+    # opens a (possibly compressed) text file for reading, the compression is detected from its first bytes
+    return io.TextIOWrapper(decompress(open(find_input_file(path), mode='rb')), encoding='utf-8')
@@ -6,18 +6,32 @@
 # Note that since the data is not from the newest wikipedia dump it might happen that some new redirects were introduced since
 # but this should concern not too many ids, i.e. an acceptable amount of noise (there are more changes in titles with steady id)
 
-# Note: When running the script it might happen that you get an error "too many calls" to the wikimedia api
-# Just run the script again
+# the ids are sent to the api in batches of 50 (the limit of the api) with several requests in flight and all answers are
+# saved in a cache (see wikipedia_resolver.py), if the run is interrupted (or the api refuses too many calls) just run the
+# script again, it continues with the ids that are not in the cache yet
+# alternatively, the ids can be resolved offline with the tables of a wikipedia dump (see below)
 
 import json
-import requests
 import pickle
 import os
+import sys
+
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.wikipedia_dump_resolver import get_wikipedia_resolver
 
 path_to_kensho_jsnol = ''
 path_to_save_id_titles_dictionary = ''
 PATH_TO_REPOSITORY = ''
 
+# the cache of the api answers, it is the checkpoint of the script
+path_to_wikipedia_cache = path_to_save_id_titles_dictionary + '.api_cache.sqlite'
+
+# to resolve the ids offline instead of with the wikimedia api, set the page and redirect tables of a wikipedia dump
+# (see wikipedia_dump_resolver.py)
+path_to_page_table = ''
+path_to_redirect_table = ''
+
 # first we get all ids from kensho
 print('create set of all ids in the data')
 all_ids = set()
@@ -38,51 +52,26 @@ with open(path_to_kensho_jsnol, mode='r', encoding='utf-8') as kensho:
 
 print(f'Id set created, total of {len(all_ids)} wikipedia ids in the kensho dataset.')
 
-# next we try to get a title for each id, we do this by making a call to the wikimedia api for the ids
+# next we try to get a title for each id
+# the ids are sorted, so that a rerun asks the api for the same batches
+with get_wikipedia_resolver(path_to_wikipedia_cache, path_to_page_table, path_to_redirect_table) as resolver:
+    pages_of_ids = resolver.resolve_ids(sorted(all_ids))
+
 wikiid_wikiname_dict = {}
-wikiid_list = list(all_ids)
-ids = ""
-length = len(wikiid_list)
 bad_ids = 0
-lines_counter = 0
-
-for i in range(length):
-    lines_counter += 1
-    if (i + 1) % 50 == 0 or i == length - 1:  # there is a limit to the number of ids in one request in the wikimedia api
-
-        ids += str(wikiid_list[i])
-        # # request
-
-        id_list= [int(x) for x in ids.split('|')]
-        resp = requests.get(f"https://en.wikipedia.org/w/api.php?action=query&prop=info|redirects&pageids={ids}&format=json&redirects").json()
-
-        # either the id exists, then get the title
-        for wikiid in resp["query"]["pages"]:
-            try:
-                wikiname_using_id = resp["query"]["pages"][wikiid]["title"]
-                wikiid_wikiname_dict[int(wikiid)] = wikiname_using_id
-                # next, check for redirects
-                # if a given id redirects to another, we save the redirect in the dictionary,
-                # i.e. the id does not save a title but the id it redirects to
-                if 'redirects' in resp["query"]["pages"][wikiid]:
-                    redirected_ids = [x['pageid'] for x in resp["query"]["pages"][wikiid]['redirects']]
-                    for idx in id_list:
-                        if idx in redirected_ids:
-                            print(f'Id {idx} redirects to {wikiid}')
-                            wikiid_wikiname_dict[idx] = int(wikiid)
-
-            except KeyError:  # bad wikiid
-                print(f'Bad wikipedia id: {wikiid}')
-                bad_ids+=1
-
-        ids = ""
-
-    else:
-        ids += str(wikiid_list[i])
-        ids += "|"
-
-        if lines_counter % 1001 == 0:
-            print('processed {:10.4f} %\n'.format((lines_counter / length) * 100))
+for idx, page in pages_of_ids.items():
+    # either the id exists, then get the title
+    if page is None:  # bad wikiid
+        print(f'Bad wikipedia id: {idx}')
+        bad_ids += 1
+        continue
+    wikiid, wikiname_using_id = page
+    wikiid_wikiname_dict[wikiid] = wikiname_using_id
+    # if a given id redirects to another, we save the redirect in the dictionary,
+    # i.e. the id does not save a title but the id it redirects to
+    if wikiid != idx:
+        print(f'Id {idx} redirects to {wikiid}')
+        wikiid_wikiname_dict[idx] = wikiid
 
 print(f'Done. Out of ids {len(all_ids)} we have {len(all_ids) - bad_ids} ids that gave a good api response, {bad_ids} not (probably the pages do not exist anymore).')
 
@@ -7,11 +7,240 @@ import json
 import pickle
 from collections import defaultdict
 import zipfile
+from array import array
+
+from scripts_to_create_zelda.compressed_files import get_output_path, open_output
+from scripts_to_create_zelda.kensho_reader import map_kensho_pages, map_kensho_shards
+
+# useless/list-like sections that we ignore
+IGNORED_SECTION_NAMES = {'Bibliography', 'Discography', 'External Links', 'Filmography', 'Footnotes', 'Further Reading',
+                         'Notes', 'References', 'See Also'}
+
+class SectionTriples:
+    # the triples (page_id, section_name, target_page_ids) of the sections that link to a test entity
+    # there are millions of such sections, so instead of tuples and lists they are stored in flat arrays:
+    # - page ids and section name codes as int32 arrays, the section names are interned (each distinct name once)
+    # - the byte offsets of the lines of the pages in the kensho file, so that the selected pages can be read directly
+    # - the targets of all sections concatenated in one int32 array, the targets of section i are
+    #   targets[target_starts[i]:target_starts[i + 1]]. Only links to test entities are kept (the selection ignores all
+    #   other links), each as the code of the test entity, i.e. its position in the list of test ids
+
+    def __init__(self):
+        self.page_ids = array('i')
+        self.line_offsets = array('q')
+        self.section_name_codes = array('i')
+        self.section_names = []
+        self.section_name_to_code = {}
+        self.target_starts = array('q', [0])
+        self.targets = array('i')
+
+    def __len__(self):
+        return len(self.page_ids)
+
+    def get_section_name_code(self, section_name):
+        code = self.section_name_to_code.get(section_name)
+        if code is None:
+            code = self.section_name_to_code[section_name] = len(self.section_names)
+            self.section_names.append(section_name)
+        return code
+
+    def append(self, page_id, line_offset, section_name, target_codes):
+        self.page_ids.append(page_id)
+        self.line_offsets.append(line_offset)
+        self.section_name_codes.append(self.get_section_name_code(section_name))
+        self.targets.extend(target_codes)
+        self.target_starts.append(len(self.targets))
+
+    def extend(self, other):
+        # append the sections of another SectionTriples (of another shard), its section name codes are translated
+        new_codes = [self.get_section_name_code(section_name) for section_name in other.section_names]
+        self.page_ids.extend(other.page_ids)
+        self.line_offsets.extend(other.line_offsets)
+        self.section_name_codes.extend(array('i', (new_codes[code] for code in other.section_name_codes)))
+        number_of_targets = len(self.targets)
+        self.target_starts.extend(array('q', (number_of_targets + target_start for target_start in other.target_starts[1:])))
+        self.targets.extend(other.targets)
+
+    def get_targets(self, section_index):
+        return self.targets[self.target_starts[section_index]:self.target_starts[section_index + 1]]
+
+
+def collect_section_triples(kensho_pages, test_entity_codes):
+    # worker for the first pass over (a shard of) kensho, test_entity_codes maps each test id to its code
+    # returns the SectionTriples of all sections that link to a test entity
+    # and, for each test entity (code), how often it is linked in these sections
+    section_triples = SectionTriples()
+    test_entities_and_count = defaultdict(int)
+
+    for line_offset, jline in kensho_pages:
+
+        page_id = jline['page_id']
+
+        for section in jline['sections']:
+            # ignore useless/list-like sections
+            if section['name'] not in IGNORED_SECTION_NAMES:
+
+                # add section only if it links to one of the test ids
+                target_codes = [test_entity_codes[entity_id] for entity_id in section['target_page_ids']
+                                if entity_id in test_entity_codes]
+
+                if target_codes:
+                    for code in target_codes:
+                        test_entities_and_count[code] += 1
+                    section_triples.append(page_id, line_offset, section['name'], target_codes)
+
+    return section_triples, test_entities_and_count
+
+
+def convert_selected_sections(kensho_pages, shared_objects):
+    # worker for the second pass over (a shard of) the pages with selected sections
+    # returns the selected sections as jsonl lines and the id-title pairs of all links in these sections
+    selected_sections, kensho_dict_id_to_title = shared_objects
+
+    jsonl_lines = []
+    zelda_ids_to_titles = {}
+
+    for _, jline in kensho_pages:
+
+        page_id = jline['page_id']
+        if page_id in selected_sections:
+
+            sections_to_add = selected_sections[page_id]
+            for section in jline['sections']:
+
+                if section['name'] in sections_to_add:
+
+                    # write section to our dataset
+                    link_offsets = section['link_offsets']
+                    link_lengths = section['link_lengths']
+                    target_page_ids = section['target_page_ids']
+                    # we also want to have the titles of the links, not only the ids
+                    link_titles = []
+                    for idx in target_page_ids:
+                        try:
+                            title = kensho_dict_id_to_title[idx]
+                            if type(title) == int: # redirect
+                                title = kensho_dict_id_to_title[title]
+                            link_titles.append(title)
+                        except KeyError:
+                            link_titles.append('O')
+
+                    new_link_lengths = []
+                    new_link_offsets = []
+                    new_target_page_ids = []
+                    new_target_page_titles = []
+
+                    for i in range(len(link_titles)):
+
+                        # some wikipedia ids do not return a response when doing a call to the wikimedia api (probably outdated ids)
+                        # this concerns only a tiny subset of all the ids
+                        if link_titles[i] != 'O':
+                            new_link_lengths.append(link_lengths[i])
+                            new_link_offsets.append(link_offsets[i])
+                            new_target_page_ids.append(target_page_ids[i])
+                            new_target_page_titles.append(link_titles[i])
+                            zelda_ids_to_titles[target_page_ids[i]] = link_titles[i]
+
+                    # update
+                    new_section = {'page_id': page_id}
+                    new_section['section_name'] = section['name']
+                    new_section['text'] = section['text']
+                    indices = []
+                    for offset, length in zip(new_link_offsets, new_link_lengths):
+                        indices.append((offset, offset + length))
+                    new_section['index'] = indices
+                    new_section['wikipedia_ids'] = new_target_page_ids
+                    new_section['wikipedia_titles'] = new_target_page_titles
+
+                    jsonl_lines.append(json.dumps(new_section) + '\n')
+
+    return jsonl_lines, zelda_ids_to_titles
+
+
+def select_sections(section_triples, test_entities_and_count, threshold=10):
+    # greedy selection: go through the sections in random order and take a section if it links to at least one test entity
+    # that is not covered enough times yet, i.e. less than threshold times (or less than it occurs in kensho in total)
+    # section_triples is a SectionTriples, test_entities_and_count an array with the count of each test entity (code)
+    # returns a dictionary page_id -> list of selected section names
+    number_of_sections = len(section_triples)
+    number_of_test_ids = len(test_entities_and_count)
+    targets = section_triples.targets
+    target_starts = section_triples.target_starts
+
+    # inverted index from each test entity to the sections that link to it, in flat arrays like the triples: the sections
+    # of entity c are sections_of_entity[entity_starts[c]:entity_starts[c + 1]]
+    # together with a counter, for each section, of the linked test entities that are not covered enough times yet
+    # like this, accepting a section only touches the entities it links and checking a section is a single lookup
+    number_of_uncovered_entities_in_section = array('i', [0]) * number_of_sections
+    entity_starts = array('q', [0]) * (number_of_test_ids + 1)
+    for section_index in range(number_of_sections):
+        test_codes_in_section = set(targets[target_starts[section_index]:target_starts[section_index + 1]])
+        for code in test_codes_in_section:
+            entity_starts[code + 1] += 1
+        number_of_uncovered_entities_in_section[section_index] = len(test_codes_in_section)
+    for code in range(number_of_test_ids):
+        entity_starts[code + 1] += entity_starts[code]
+
+    sections_of_entity = array('i', [0]) * entity_starts[number_of_test_ids]
+    next_position = entity_starts[:-1]
+    for section_index in range(number_of_sections):
+        for code in set(targets[target_starts[section_index]:target_starts[section_index + 1]]):
+            sections_of_entity[next_position[code]] = section_index
+            next_position[code] += 1
+    del next_position
+
+    # save, for each entity, how often we have seen it so far
+    entities_and_how_often_already_covered = array('q', [0]) * number_of_test_ids
+    # start with all entities, and remove them as soon as we have seen them enough times
+    # entities that are never linked in kensho count as covered right away
+    entities_not_covered_enough_times_yet = {code for code, count in enumerate(test_entities_and_count) if count > 0}
+
+    selected_sections = defaultdict(list)
+
+    # randomly shuffle the sections, so that sections are not processed article by article, but in a total random fashion
+    random_order = random.sample(range(number_of_sections), number_of_sections) # randomly shuffle the sections
 
-def create_train_jsonl(PATH_TO_REPOSITORY, PATH_TO_KENSHO_JSONL):
+    for index in random_order:
+
+        # stop, if all entities have been seen enough times
+        if not entities_not_covered_enough_times_yet:
+            print('Done')
+            break
+
+        # the section does not link to any id that we did not see enough times yet
+        if number_of_uncovered_entities_in_section[index] == 0:
+            continue
+
+        # we save the section with a dictionary
+        selected_sections[section_triples.page_ids[index]].append(
+            section_triples.section_names[section_triples.section_name_codes[index]]) # key=page_id;value=section_name
+
+        target_codes = targets[target_starts[index]:target_starts[index + 1]]  # all links to test entities in that section
+
+        # update count
+        for code in target_codes:
+            entities_and_how_often_already_covered[code] += 1
+
+        # update covered set if necessary, only the counts of the linked entities changed
+        for code in set(target_codes):
+            if code in entities_not_covered_enough_times_yet:
+
+                count = entities_and_how_often_already_covered[code]
+                if count >= threshold or count >= test_entities_and_count[code]:
+                    entities_not_covered_enough_times_yet.remove(code)
+                    for section_index in sections_of_entity[entity_starts[code]:entity_starts[code + 1]]:
+                        number_of_uncovered_entities_in_section[section_index] -= 1
+                    print(
+                        f'{(1 - (len(entities_not_covered_enough_times_yet) / number_of_test_ids)) * 100:.2f}% of test ids covered')
+
+    return selected_sections
+
+
+def create_train_jsonl(PATH_TO_REPOSITORY, PATH_TO_KENSHO_JSONL, number_of_processes=None, compression=None):
     random.seed(11) # this has to be set to 11 to obtain the same dataset
 
-    path_to_save_sections_jsonl = os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_train.jsonl')
+    # with compression 'gzip' or 'zstd' the file is zelda_train.jsonl.gz or zelda_train.jsonl.zst (see compressed_files.py)
+    path_to_save_sections_jsonl = get_output_path(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_train.jsonl'), compression)
 
     if not os.path.exists(os.path.join(PATH_TO_REPOSITORY, 'train_data')):
         os.mkdir(os.path.join(PATH_TO_REPOSITORY, 'train_data'))
@@ -32,89 +261,30 @@ def create_train_jsonl(PATH_TO_REPOSITORY, PATH_TO_KENSHO_JSONL):
     # Moreover we create a list of triples (page-name, section-name, entity ids) for each appropriate section
     # from this list we will later
     print('Load lists and count entities...')
-    list_of_section_triples = []
-    test_entities_and_count = {idx: 0 for idx in set_of_all_ids_in_test}
-    with open(PATH_TO_KENSHO_JSONL, mode='r', encoding='utf-8') as read:
-        line = read.readline()
-
-        while line:
-
-            jline = json.loads(line)
+    # the test entities are numbered, the triples and counts refer to them by these codes
+    test_entity_codes = {idx: code for code, idx in enumerate(set_of_all_ids_in_test)}
+    section_triples = SectionTriples()
+    test_entities_and_count = array('q', [0]) * len(test_entity_codes)
+    # the kensho file is read in shards by several processes, the partial results come in the order of the file
+    for partial_triples, partial_counts in map_kensho_shards(PATH_TO_KENSHO_JSONL, collect_section_triples,
+                                                             shared_objects=test_entity_codes,
+                                                             number_of_processes=number_of_processes):
+        section_triples.extend(partial_triples)
+        for code, count in partial_counts.items():
+            test_entities_and_count[code] += count
 
-            page_id = jline['page_id']
-
-            for section in jline['sections']:
-                # ignore useless/list-like sections
-                if section['name'] not in ['Bibliography', 'Discography', 'External Links', 'Filmography', 'Footnotes',
-                                           'Further Reading', 'Notes', 'References', 'See Also']:
-
-                    add_section = False
-
-                    # add section only if it links to one of the test ids
-                    for entity_id in section['target_page_ids']:
-                        if entity_id in test_entities_and_count:
-                            test_entities_and_count[entity_id] += 1
-                            add_section=True
-
-                    if add_section:
-                        list_of_section_triples.append((page_id, section['name'], section['target_page_ids']))
-
-            line = read.readline()
-
-    print(f'Loaded {len(list_of_section_triples)} sections.')
+    print(f'Loaded {len(section_triples)} sections.')
 
 
     print('Select sections...')
 
     # now, depending on the threshold, we sample sections from the list until each test entity is covered at least threshold times (if possible)
-    threshold = 10
-
-    entities_and_how_often_already_covered = {idx: 0 for idx in
-                                              set_of_all_ids_in_test}  # save, for each entity, how often we have seen it so far
-    entities_not_covered_enough_times_yet = set_of_all_ids_in_test.copy()  # start with all entities, and remove them as soon as we have seen them enough times
-
-    selected_sections = defaultdict(list)
-
-    # randomly shuffle the sections, so that sections are not processed article by article, but in a total random fashion
-    random_order = random.sample(range(len(list_of_section_triples)), len(list_of_section_triples)) # randomly shuffle the sections
-
-    for index in random_order:
-
-        # stop, if all entities have been seen enough times
-        if not entities_not_covered_enough_times_yet:
-            print('Done')
-            break
-
-        section_triple = list_of_section_triples[index]
-
-        target_page_ids = section_triple[2]  # all links in that section
-
-        for idx in entities_not_covered_enough_times_yet:
-            # if there is an id that we did not see enough times yet, add page to final list
-            if idx in target_page_ids:
-
-                # we save the section with a dictionary
-                selected_sections[section_triple[0]].append(section_triple[1]) # key=page_id;value=section_name
-
-                # update count
-                for wiki_id in target_page_ids:
-                    if wiki_id in entities_and_how_often_already_covered:
-                        entities_and_how_often_already_covered[wiki_id] += 1
-
-                # update covered set if necessary
-                for wiki_id in entities_and_how_often_already_covered:
-                    if wiki_id in entities_not_covered_enough_times_yet:
-
-                        count = entities_and_how_often_already_covered[wiki_id]
-                        if count >= threshold or count >= test_entities_and_count[wiki_id]:
-                                entities_not_covered_enough_times_yet.remove(wiki_id)
-                                print(
-                                    f'{(1 - (len(entities_not_covered_enough_times_yet) / len(set_of_all_ids_in_test))) * 100:.2f}% of test ids covered')
-
-                # we added the section and updated the counts and sets
-                # thus we can continue with the next section
-                break
+    selected_sections = select_sections(section_triples, test_entities_and_count, threshold=10)
 
+    # the byte offsets of the pages with selected sections, only these pages are read again to write the sections
+    selected_line_offsets = {line_offset for page_id, line_offset in zip(section_triples.page_ids, section_triples.line_offsets)
+                             if page_id in selected_sections}
+    del section_triples
 
     # finally create the jsonl file
 
@@ -132,63 +302,14 @@ def create_train_jsonl(PATH_TO_REPOSITORY, PATH_TO_KENSHO_JSONL):
     zelda_ids_to_titles = {}
 
     print('Write sections to file...')
-    with open(path_to_save_sections_jsonl, mode='w', encoding='utf-8') as jsnol_output, open(PATH_TO_KENSHO_JSONL, mode='r', encoding='utf-8') as kensho_lines:
-
-        for line in kensho_lines:
-
-            jline = json.loads(line)
-            page_id = jline['page_id']
-            if page_id in selected_sections:
-
-                sections_to_add = selected_sections[page_id]
-                for section in jline['sections']:
-
-                    if section['name'] in sections_to_add:
-
-                        # write section to our dataset
-                        link_offsets = section['link_offsets']
-                        link_lengths = section['link_lengths']
-                        # we also want to have the titles of the links, not only the ids
-                        link_titles = []
-                        for idx in section['target_page_ids']:
-                            try:
-                                title = kensho_dict_id_to_title[idx]
-                                if type(title) == int: # redirect
-                                    title = kensho_dict_id_to_title[title]
-                                link_titles.append(title)
-                            except KeyError:
-                                link_titles.append('O')
-
-                        new_link_lengths = []
-                        new_link_offsets = []
-                        new_target_page_ids = []
-                        new_target_page_titles = []
-
-                        for i in range(len(link_titles)):
-
-                            # some wikipedia ids do not return a response when doing a call to the wikimedia api (probably outdated ids)
-                            # this concerns only a tiny subset of all the ids
-                            if link_titles[i] != 'O':
-                                new_link_lengths.append(link_lengths[i])
-                                new_link_offsets.append(link_offsets[i])
-                                new_target_page_ids.append(section['target_page_ids'][i])
-                                new_target_page_titles.append(link_titles[i])
-                                zelda_ids_to_titles[section['target_page_ids'][i]] = link_titles[i]
-
-                        # update
-                        new_section = {'page_id': page_id}
-                        new_section['section_name'] = section['name']
-                        new_section['text'] = section['text']
-                        indices = []
-                        for offset, length in zip(new_link_offsets, new_link_lengths):
-                            indices.append((offset, offset + length))
-                        new_section['index'] = indices
-                        new_section['wikipedia_ids'] = new_target_page_ids
-                        new_section['wikipedia_titles'] = new_target_page_titles
-
-                        # dump the section
-                        json.dump(new_section,jsnol_output)
-                        jsnol_output.write('\n')
+    with open_output(path_to_save_sections_jsonl, compression) as jsnol_output:
+        for jsonl_lines, partial_ids_to_titles in map_kensho_pages(PATH_TO_KENSHO_JSONL, selected_line_offsets,
+                                                                   convert_selected_sections,
+                                                                   shared_objects=(selected_sections, kensho_dict_id_to_title),
+                                                                   number_of_processes=number_of_processes):
+            # dump the sections
+            jsnol_output.writelines(jsonl_lines)
+            zelda_ids_to_titles.update(partial_ids_to_titles)
 
     # add id-title pairs of the test set to the final vocabulary
     # a small fraction might not be covered by the links in the data for various reasons
@@ -10,13 +10,59 @@ import json
 import os
 from flair.tokenization import SpacySentenceSplitter, SpacyTokenizer
 
+from scripts_to_create_zelda.kensho_reader import map_kensho_shards
+
+# each process loads its own sentence splitter (the first time it needs one)
+_sentence_splitter = None
+
+
+def get_sentence_splitter():
+    global _sentence_splitter
+    if _sentence_splitter is None:
+        tokenizer = SpacyTokenizer('en_core_web_sm')
+        _sentence_splitter = SpacySentenceSplitter('en_core_web_sm', tokenizer=tokenizer)
+    return _sentence_splitter
+
+
+def get_first_sentence(text, title):
+    text = text[:1200]
+    sentences = get_sentence_splitter().split(text)
+    if len(sentences) > 0:
+        return sentences[0].to_original_text()
+    else:
+        print(f'Empty entity descripction to title: {title}')
+        return ''
+
+
+def get_descriptions_from_introductions(kensho_pages, shared_objects):
+    # worker for (a shard of) kensho
+    # returns (page_id, description) for each page of an entity in zelda, in the order of the file
+    # the description is None if the page has no 'Introduction' section
+    kensho_dict_id_to_title, zelda_ids_to_titles = shared_objects
+
+    descriptions = []
+    for _, page_dict in kensho_pages:
+        page_id = page_dict['page_id']
+        if not page_id in kensho_dict_id_to_title:
+            continue
+        if type(kensho_dict_id_to_title[page_id]) == int:
+            page_id = kensho_dict_id_to_title[page_id]
+
+        if page_id in zelda_ids_to_titles:
+            section_names = [sec['name'] for sec in page_dict['sections']]
+            if 'Introduction' in section_names:
+                text = page_dict['sections'][0]['text']
+                descriptions.append((page_id, get_first_sentence(text, zelda_ids_to_titles[page_id])))
+            else:
+                descriptions.append((page_id, None))
+
+    return descriptions
+
+
 # get all relevant entity titles
-def generate_entity_descriptions(PATH_TO_REPOSITORY, PATH_TO_KENSHO_JSONL):
+def generate_entity_descriptions(PATH_TO_REPOSITORY, PATH_TO_KENSHO_JSONL, number_of_processes=None):
     print('Generate entity descriptions...')
 
-    tokenizer = SpacyTokenizer('en_core_web_sm')
-    sentence_splitter = SpacySentenceSplitter('en_core_web_sm', tokenizer=tokenizer)
-
     wiki_wiki = wikipediaapi.Wikipedia(language="en")
 
     # get the entities from zelda
@@ -27,27 +73,25 @@ def generate_entity_descriptions(PATH_TO_REPOSITORY, PATH_TO_KENSHO_JSONL):
     with open(os.path.join(PATH_TO_REPOSITORY, 'other', 'kensho_ids_to_titles_redirects_solved.pickle'), 'rb') as handle:
         kensho_dict_id_to_title = pickle.load(handle)
 
-    with open(PATH_TO_KENSHO_JSONL, mode='r', encoding='utf-8') as kensho_jsonl, open(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'entity_descriptions.jsonl'), mode='w', encoding='utf-8') as output_jsonl:
+    with open(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'entity_descriptions.jsonl'), mode='w', encoding='utf-8') as output_jsonl:
         set_of_entity_ids_in_zelda = set(zelda_ids_to_titles.keys())
         counter = 0
         no_introduction = 0
         number_of_entities = len(set_of_entity_ids_in_zelda)
-        for page_line in kensho_jsonl:
-            page_dict = json.loads(page_line)
-            page_id = page_dict['page_id']
-            if not page_id in kensho_dict_id_to_title:
-                continue
-            if type(kensho_dict_id_to_title[page_id]) == int:
-                page_id = kensho_dict_id_to_title[page_id]
-
-            if page_id in set_of_entity_ids_in_zelda:
+        # the introductions are split into sentences by the workers, the descriptions come in the order of the file
+        for descriptions in map_kensho_shards(PATH_TO_KENSHO_JSONL, get_descriptions_from_introductions,
+                                              shared_objects=(kensho_dict_id_to_title, zelda_ids_to_titles),
+                                              number_of_processes=number_of_processes):
+            for page_id, entity_description in descriptions:
+
+                # only the first page of each entity is used
+                if not page_id in set_of_entity_ids_in_zelda:
+                    continue
+
                 set_of_entity_ids_in_zelda.remove(page_id)
                 title = zelda_ids_to_titles[page_id]
                 # add description
-                section_names = [sec['name'] for sec in page_dict['sections']]
-                if 'Introduction' in section_names:
-                    text = page_dict['sections'][0]['text']
-                else:
+                if entity_description is None:
                     no_introduction+=1
                     page = wiki_wiki.page(title)
                     try:
@@ -56,13 +100,7 @@ def generate_entity_descriptions(PATH_TO_REPOSITORY, PATH_TO_KENSHO_JSONL):
                         print(f'Bad wikipedia call for title: {title}. Save empty entity description.')
                         text = ''
 
-                text = text[:1200]
-                sentences = sentence_splitter.split(text)
-                if len(sentences) > 0:
-                    entity_description = sentences[0].to_original_text()
-                else:
-                    print(f'Empty entity descripction to title: {title}')
-                    entity_description = ''
+                    entity_description = get_first_sentence(text, title)
 
                 outpt_dict = {'wikipedia_id': page_id, 'wikipedia_title': title, 'description': entity_description}
                 json.dump(outpt_dict, output_jsonl)
@@ -0,0 +1,100 @@
+# one-time conversion of the kensho file 'link_annotated_text.jsonl' into a compact columnar cache
+# every build of ZELDA reads the multi-GB kensho file several times, with the cache only this conversion decodes json
+# the cache is a folder of flat binary arrays (page ids, section names, texts and link offsets/lengths/target ids, see
+# KENSHO_CACHE_FILES in kensho_reader.py) that are memory-mapped when reading
+# pass the folder of the cache instead of the path to the jsonl file to create_train_jsonl, generate_entity_descriptions
+# or the kensho mention counter to use it
+# Note: the arrays are stored in the byte order of the machine, so the cache should be built on the machine that uses it
+
+import json
+import os
+from array import array
+
+from scripts_to_create_zelda.kensho_reader import KENSHO_CACHE_FILES, is_kensho_cache, map_kensho_shards
+
+
+def convert_pages(kensho_pages, _):
+    # worker for (a shard of) kensho, returns the arrays of the cache for the pages of the shard
+    # the 'starts' arrays are relative to the shard, the section name codes index into the shard's own name list
+    arrays = {name: array(typecode) for name, typecode in KENSHO_CACHE_FILES.items()}
+    for name in ['page_section_starts', 'section_text_starts', 'section_link_starts']:
+        arrays[name].append(0)
+    section_names = {}
+    texts = []
+    text_length = 0
+
+    for line_offset, jline in kensho_pages:
+        arrays['page_ids'].append(jline['page_id'])
+        arrays['page_line_offsets'].append(line_offset)
+
+        for section in jline['sections']:
+            arrays['section_name_codes'].append(section_names.setdefault(section['name'], len(section_names)))
+
+            text = section['text'].encode('utf-8')
+            texts.append(text)
+            text_length += len(text)
+            arrays['section_text_starts'].append(text_length)
+
+            arrays['link_offsets'].extend(section['link_offsets'])
+            arrays['link_lengths'].extend(section['link_lengths'])
+            arrays['target_page_ids'].extend(section['target_page_ids'])
+            arrays['section_link_starts'].append(len(arrays['target_page_ids']))
+
+        arrays['page_section_starts'].append(len(arrays['section_name_codes']))
+
+    arrays['texts'] = b''.join(texts)
+
+    return arrays, list(section_names)
+
+
+def build_kensho_cache(PATH_TO_KENSHO_JSONL, path_to_cache, number_of_processes=None):
+    print('Create kensho cache...')
+
+    if not os.path.exists(path_to_cache):
+        os.makedirs(path_to_cache)
+
+    # the section names (there are only a few distinct ones) are stored once and referred to by codes
+    section_names = {}
+
+    # number of sections, text bytes and links written so far, the 'starts' of each shard are shifted by these
+    shift = {'page_section_starts': 0, 'section_text_starts': 0, 'section_link_starts': 0}
+
+    files = {name: open(os.path.join(path_to_cache, name + '.bin'), mode='wb') for name in KENSHO_CACHE_FILES}
+    # the first entry of each 'starts' array
+    for name in shift:
+        array('q', [0]).tofile(files[name])
+
+    for arrays, shard_section_names in map_kensho_shards(PATH_TO_KENSHO_JSONL, convert_pages,
+                                                         number_of_processes=number_of_processes):
+        codes = [section_names.setdefault(name, len(section_names)) for name in shard_section_names]
+        arrays['section_name_codes'] = array('i', [codes[code] for code in arrays['section_name_codes']])
+
+        for name, starts_shift in shift.items():
+            arrays[name] = array('q', [start + starts_shift for start in arrays[name][1:]])
+        shift['page_section_starts'] += len(arrays['section_name_codes'])
+        shift['section_text_starts'] += len(arrays['texts'])
+        shift['section_link_starts'] += len(arrays['target_page_ids'])
+
+        for name in KENSHO_CACHE_FILES:
+            if name == 'texts':
+                files[name].write(arrays[name])
+            else:
+                arrays[name].tofile(files[name])
+
+    for f in files.values():
+        f.close()
+
+    # the names are written last, they mark the cache as complete (see is_kensho_cache)
+    with open(os.path.join(path_to_cache, 'section_names.json'), mode='w', encoding='utf-8') as names:
+        json.dump(list(section_names), names)
+
+    print('Done.')
+
+
+def get_kensho_source(PATH_TO_KENSHO_JSONL, path_to_cache, number_of_processes=None):
+    # returns the path the kensho data should be read from: the cache if a path is given (it is built if it does not exist yet)
+    if not path_to_cache:
+        return PATH_TO_KENSHO_JSONL
+    if not is_kensho_cache(path_to_cache):
+        build_kensho_cache(PATH_TO_KENSHO_JSONL, path_to_cache, number_of_processes=number_of_processes)
+    return path_to_cache
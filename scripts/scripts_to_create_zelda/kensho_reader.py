@@ -0,0 +1,242 @@
+# shared reader for the kensho file 'link_annotated_text.jsonl' (one wikipedia page per line)
+# reading all 5.3M lines with json.loads in a single process takes hours, so we split the file into byte ranges (shards)
+# that start and end at line boundaries and let a pool of processes work on the shards
+# each worker returns a partial result for its shard (e.g. section triples, mention counters, introductions) and the
+# partial results are handed back in the order of the shards, i.e. in the order of the file, so that merging is deterministic
+# instead of the jsonl file, all functions also accept the folder of a kensho cache (see kensho_cache.py), then the
+# shards are ranges of pages and the pages are read from memory-mapped arrays without any json decoding
+# if only some pages are needed (e.g. the pages of the selected sections), map_kensho_pages reads just these pages, given
+# the byte offsets of their lines that were recorded in an earlier pass
+
+import json
+import mmap
+import multiprocessing
+import os
+from array import array
+from bisect import bisect_left
+from functools import partial
+
+# objects that all workers need (e.g. large dictionaries) are handed to each process once, not once per shard
+_shared_objects = None
+
+# each process opens a kensho cache only once
+_open_caches = {}
+
+# the files of a kensho cache, name -> typecode of the stored array ('B' for raw bytes)
+# for pages and sections there is a 'starts' array with one more entry than there are pages/sections, the entries
+# i and i+1 delimit the sections of page i, the text bytes and the links of section i
+KENSHO_CACHE_FILES = {'page_ids': 'i',
+                      'page_line_offsets': 'q',  # byte offset of the page in the original jsonl file
+                      'page_section_starts': 'q',
+                      'section_name_codes': 'i',  # index into section_names.json
+                      'section_text_starts': 'q',
+                      'section_link_starts': 'q',
+                      'texts': 'B',  # all section texts, utf-8 encoded
+                      'link_offsets': 'i',
+                      'link_lengths': 'i',
+                      'target_page_ids': 'i'}
+
+
+def is_kensho_cache(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, 'section_names.json'))
+
+
+def map_array(path, typecode):
+    # memory-maps a file that contains a flat array (written with array.tofile) and returns it as a memoryview
+    with open(path, mode='rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:  # empty files can not be memory-mapped
+            return memoryview(array(typecode))
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast(typecode)
+
+
+class KenshoCacheSection:
+    # a section of the kensho cache that can be used like the section dictionaries of the jsonl file
+    # fields are only read from the arrays when accessed, e.g. the text is not decoded if only the links are needed
+
+    __slots__ = ('cache', 'index')
+
+    def __init__(self, cache, index):
+        self.cache = cache
+        self.index = index
+
+    def __getitem__(self, key):
+        cache = self.cache
+        i = self.index
+        if key == 'name':
+            return cache.section_names[cache.section_name_codes[i]]
+        if key == 'text':
+            return str(cache.texts[cache.section_text_starts[i]:cache.section_text_starts[i + 1]], 'utf-8')
+        if key in ('link_offsets', 'link_lengths', 'target_page_ids'):
+            return getattr(cache, key)[cache.section_link_starts[i]:cache.section_link_starts[i + 1]].tolist()
+        raise KeyError(key)
+
+
+class KenshoCache:
+    # read access to a kensho cache, all arrays are memory-mapped, so that the worker processes share them through the page cache
+
+    def __init__(self, path_to_cache):
+        for name, typecode in KENSHO_CACHE_FILES.items():
+            setattr(self, name, map_array(os.path.join(path_to_cache, name + '.bin'), typecode))
+        with open(os.path.join(path_to_cache, 'section_names.json'), mode='r', encoding='utf-8') as names:
+            self.section_names = json.load(names)
+
+    def __len__(self):
+        return len(self.page_ids)
+
+    def iterate_pages(self, start, end):
+        # yields (byte offset in the jsonl file, page dictionary) for the pages with index in [start, end)
+        for i in range(start, end):
+            sections = [KenshoCacheSection(self, j) for j in range(self.page_section_starts[i], self.page_section_starts[i + 1])]
+            yield self.page_line_offsets[i], {'page_id': self.page_ids[i], 'sections': sections}
+
+
+def open_kensho_cache(path_to_cache):
+    if path_to_cache not in _open_caches:
+        _open_caches[path_to_cache] = KenshoCache(path_to_cache)
+    return _open_caches[path_to_cache]
+
+
+def get_shards(path_to_kensho_jsonl, number_of_shards):
+    # split the file into (at most) number_of_shards byte ranges (start, end) of roughly equal size
+    # each boundary is moved to the beginning of the next line, so that no line is split between two shards
+    # for a kensho cache the shards are ranges of page indices
+    if is_kensho_cache(path_to_kensho_jsonl):
+        number_of_pages = len(open_kensho_cache(path_to_kensho_jsonl))
+        boundaries = sorted({number_of_pages * i // number_of_shards for i in range(number_of_shards + 1)})
+        return list(zip(boundaries, boundaries[1:]))
+
+    file_size = os.path.getsize(path_to_kensho_jsonl)
+    boundaries = [0]
+    with open(path_to_kensho_jsonl, mode='rb') as kensho:
+        for i in range(1, number_of_shards):
+            position = file_size * i // number_of_shards
+            if position <= boundaries[-1]:
+                continue
+            kensho.seek(position - 1)
+            kensho.readline()  # go to the beginning of the next line
+            position = kensho.tell()
+            if boundaries[-1] < position < file_size:
+                boundaries.append(position)
+    boundaries.append(file_size)
+
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def read_shard(path_to_kensho_jsonl, start, end):
+    # yields (byte offset of the line, page dictionary) for each line that starts in the byte range [start, end)
+    if is_kensho_cache(path_to_kensho_jsonl):
+        yield from open_kensho_cache(path_to_kensho_jsonl).iterate_pages(start, end)
+        return
+
+    with open(path_to_kensho_jsonl, mode='rb') as kensho:
+        kensho.seek(start)
+        offset = start
+        while offset < end:
+            line = kensho.readline()
+            if not line:
+                break
+            if line.strip():
+                yield offset, json.loads(line)
+            offset += len(line)
+
+
+def read_pages_at(path_to_kensho_jsonl, line_offsets):
+    # yields (byte offset of the line, page dictionary) for the lines that start at the given byte offsets (in this order)
+    if is_kensho_cache(path_to_kensho_jsonl):
+        cache = open_kensho_cache(path_to_kensho_jsonl)
+        for line_offset in line_offsets:
+            page_index = bisect_left(cache.page_line_offsets, line_offset)
+            yield from cache.iterate_pages(page_index, page_index + 1)
+        return
+
+    with open(path_to_kensho_jsonl, mode='rb') as kensho, \
+            mmap.mmap(kensho.fileno(), 0, access=mmap.ACCESS_READ) as kensho_map:
+        for line_offset in line_offsets:
+            line_end = kensho_map.find(b'\n', line_offset)
+            if line_end == -1:
+                line_end = len(kensho_map)
+            yield line_offset, json.loads(kensho_map[line_offset:line_end])
+
+
+def _initialize_worker(shared_objects):
+    global _shared_objects
+    _shared_objects = shared_objects
+
+
+def _process_shard(process_shard, read_pages, shard):
+    return process_shard(read_pages(*shard), _shared_objects)
+
+
+def _map_shards(read_pages, shards, shard_sizes, process_shard, shared_objects, number_of_processes, unit):
+    # apply process_shard to the pages of every shard (read with read_pages(*shard)) in a pool of processes and yield
+    # the partial results in the order of the shards
+    total_size = sum(shard_sizes)
+    processed_size = 0
+
+    process = partial(_process_shard, process_shard, read_pages)
+
+    if number_of_processes == 1:
+        _initialize_worker(shared_objects)
+        results = map(process, shards)
+    else:
+        pool = multiprocessing.Pool(number_of_processes, initializer=_initialize_worker, initargs=(shared_objects,))
+        results = pool.imap(process, shards)
+
+    try:
+        for shard_size, result in zip(shard_sizes, results):
+            processed_size += shard_size
+            print('processed {:10.4f} % of {}'.format((processed_size / max(total_size, 1)) * 100, unit))
+            yield result
+    finally:
+        if number_of_processes != 1:
+            pool.terminate()
+
+
+def map_kensho_shards(path_to_kensho_jsonl, process_shard, shared_objects=None, number_of_processes=None,
+                      shards_per_process=4):
+    # apply process_shard(pages, shared_objects) to every shard of the kensho file, where pages iterates over the
+    # (byte offset, page dictionary) pairs of the shard, and yield the partial results in the order of the file
+    # process_shard has to be a module level function, so that it can be sent to the worker processes
+    if not number_of_processes:
+        number_of_processes = multiprocessing.cpu_count()
+
+    shards = get_shards(path_to_kensho_jsonl, number_of_processes * shards_per_process)
+
+    yield from _map_shards(partial(read_shard, path_to_kensho_jsonl), shards, [end - start for start, end in shards],
+                           process_shard, shared_objects, number_of_processes, 'kensho')
+
+
+def map_kensho_pages(path_to_kensho_jsonl, line_offsets, process_shard, shared_objects=None, number_of_processes=None,
+                     shards_per_process=4):
+    # like map_kensho_shards, but only for the pages whose lines start at the given byte offsets (as yielded by
+    # map_kensho_shards), the pages are read in the order of the file, jumping from one page to the next
+    if not number_of_processes:
+        number_of_processes = multiprocessing.cpu_count()
+
+    line_offsets = array('q', sorted(set(line_offsets)))
+    number_of_shards = number_of_processes * shards_per_process
+    boundaries = sorted({len(line_offsets) * i // number_of_shards for i in range(number_of_shards + 1)})
+    shards = [(line_offsets[start:end],) for start, end in zip(boundaries, boundaries[1:])]
+
+    yield from _map_shards(partial(read_pages_at, path_to_kensho_jsonl), shards, [len(shard[0]) for shard in shards],
+                           process_shard, shared_objects, number_of_processes, 'the selected kensho pages')
+
+
+def streaming_pairwise_merge(partial_results, combine):
+    # merges the partial results (e.g. the counters of the shards) pairwise in this process while they come in, in the
+    # order of the results: two results of the same level are combined as soon as both are there, so only about
+    # log2(number of shards) results are kept in memory at the same time. This bounds the memory, it does not make the
+    # merging faster (the merges run one after the other, not in the pool of the shards)
+    levels_and_results = []
+    for result in partial_results:
+        level = 0
+        while levels_and_results and levels_and_results[-1][0] == level:
+            result = combine(levels_and_results.pop()[1], result)
+            level += 1
+        levels_and_results.append((level, result))
+
+    combined_result = None
+    while levels_and_results:
+        result = levels_and_results.pop()[1]
+        combined_result = result if combined_result is None else combine(result, combined_result)
+    return combined_result
@@ -1,32 +1,143 @@
 # script to combine the candidate lists created from Wikilinks, Kensho Wikipedia and Wikidata
+# loading all three mention entities counters and merging them as dictionaries needs the memory of all of them at once,
+# so instead each source is loaded alone (directly from its zip) and converted into sorted runs of
+# (key, mention, entity, count) records on disk, for each table of the candidate index (see KEY_TIERS in
+# candidate_index.py) the records are sorted in chunks of RUN_CHUNK_SIZE records, each chunk is a run. The runs of all
+# sources are then merged (k-way, streaming) and written straight into the index
+# the counts of a (mention, entity) pair in the sources are aggregated either by
+# - 'sum': the sum of the counts in the sources
+# - 'vote': the number of sources that contain the pair
 
+import heapq
+import itertools
+import multiprocessing
 import os
-import zipfile
 import pickle
+import tempfile
+import zipfile
+from functools import partial
 
-def merge_candidate_lists(PATH_TO_REPOSITORY):
+from scripts_to_create_zelda.candidate_counters import load_mention_entities_counter
+from scripts_to_create_zelda.candidate_index import KEY_TIERS, CandidateIndex, write_candidate_index
 
-    final_lists = {}
+CANDIDATE_SOURCES = ['wikidata', 'kensho', 'wikilinks']
+
+COUNT_AGGREGATIONS = ['sum', 'vote']
+
+# records are written to (and read from) the runs in blocks of this size
+RUN_BLOCK_SIZE = 100000
+
+# number of records that are sorted at once, i.e. the records of a run
+RUN_CHUNK_SIZE = 5000000
+
+
+class StreamedDict:
+    # pickles like a dictionary with the given (key, value) pairs, but the pairs are pickled one after the other as they
+    # are produced, so the dictionary is never built (it is a normal dictionary when it is loaded)
+
+    def __init__(self, items):
+        self.items = items
+
+    def __reduce__(self):
+        return dict, (), None, None, iter(self.items)
+
+
+def write_run(path_to_run, records):
+    records.sort()
+    with open(path_to_run, 'wb') as run:
+        for block_start in range(0, len(records), RUN_BLOCK_SIZE):
+            pickle.dump(records[block_start:block_start + RUN_BLOCK_SIZE], run, protocol=pickle.HIGHEST_PROTOCOL)
 
-    cg_folder = os.path.join(PATH_TO_REPOSITORY, 'other')
 
-    for source in ['wikidata', 'kensho', 'wikilinks']:
+def write_runs(cg_folder, runs_folder, ids_to_titles, source):
+    # loads the counter of a source and writes, for each table, its records in runs sorted by (key, mention, entity)
+    # returns a dictionary table -> list of the paths of the runs
+    # counters with wikipedia ids (see candidate_counters.py) are merged by the titles of the ids
+    with zipfile.ZipFile(os.path.join(cg_folder, 'mention_entities_counter_' + source + '.zip'), 'r') as zip_ref:
+        with zip_ref.open('mention_entities_counter_' + source + '.pickle') as handle:
+            mention_entities_counter = load_mention_entities_counter(handle, ids_to_titles)
 
-        with zipfile.ZipFile(os.path.join(cg_folder, 'mention_entities_counter_' + source + '.zip'), 'r') as zip_ref:
-            zip_ref.extractall(cg_folder)
-        with open(os.path.join(cg_folder, 'mention_entities_counter_' + source + '.pickle'), 'rb') as handle:
-            current_mention_entities_counter = pickle.load(handle)
+    paths_to_runs = {}
+    for table, simplify in KEY_TIERS.items():
+        paths_to_runs[table] = []
+        records = []
+        for mention, candidates in mention_entities_counter.items():
+            key = mention if simplify is None else simplify(mention)
+            # a mention without candidates still gets a record (with the empty entity), so that its key is in the table
+            for entity, count in (candidates.items() or [('', 0)]):
+                records.append((key, mention, entity, count))
+            if len(records) >= RUN_CHUNK_SIZE:
+                paths_to_runs[table].append(os.path.join(runs_folder, f'{source}_{table}_{len(paths_to_runs[table])}.run'))
+                write_run(paths_to_runs[table][-1], records)
+                records = []
+        if records or not paths_to_runs[table]:
+            paths_to_runs[table].append(os.path.join(runs_folder, f'{source}_{table}_{len(paths_to_runs[table])}.run'))
+            write_run(paths_to_runs[table][-1], records)
+        del records
 
-        for mention in current_mention_entities_counter:
-            if mention in final_lists:
-                for entity in current_mention_entities_counter[mention]:
-                    if entity in final_lists[mention]:
-                        final_lists[mention][entity] += 1
-                    else:
-                        final_lists[mention][entity] = 1
+    return paths_to_runs
+
+
+def read_run(path_to_run):
+    with open(path_to_run, 'rb') as run:
+        while True:
+            try:
+                yield from pickle.load(run)
+            except EOFError:
+                return
+
+
+def merge_runs(paths_to_runs, count_aggregation='sum'):
+    # k-way merge of the sorted runs of one table, yields (key, [(entity, count), ...]) sorted by key
+    # the counts of each (mention, entity) pair are aggregated over the sources and then summed over all mentions of the key
+    # (a pair is in one run of each source that contains it, so 'vote' counts the sources)
+    merged_records = heapq.merge(*[read_run(path_to_run) for path_to_run in paths_to_runs])
+    for key, key_records in itertools.groupby(merged_records, key=lambda record: record[0]):
+        candidates = {}
+        for (_, _, entity), pair_records in itertools.groupby(key_records, key=lambda record: record[:3]):
+            if not entity:
+                continue
+            if count_aggregation == 'sum':
+                count = sum(record[3] for record in pair_records)
             else:
-                final_lists[mention] = current_mention_entities_counter[mention]
+                count = sum(1 for _ in pair_records)
+            candidates[entity] = candidates.get(entity, 0) + count
+        yield key, candidates.items()
+
+
+def merge_candidate_lists(PATH_TO_REPOSITORY, count_aggregation='sum', number_of_processes=1, write_pickle=False):
+    # number_of_processes sources are loaded at the same time, with 1 the peak memory is that of the largest source
+    # with write_pickle the merged lists are also saved as the (pickled) mention entities counter, for scripts that use
+    # it instead of the index, the pickle is written from the index mention by mention
+    if count_aggregation not in COUNT_AGGREGATIONS:
+        raise ValueError(f'Unknown count aggregation {count_aggregation}, choose one of {COUNT_AGGREGATIONS}')
+
+    cg_folder = os.path.join(PATH_TO_REPOSITORY, 'other')
+    path_to_index = os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_candidate_index')
+
+    with open(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_ids_to_titles.pickle'), 'rb') as handle:
+        ids_to_titles = pickle.load(handle)
+
+    with tempfile.TemporaryDirectory(dir=cg_folder) as runs_folder:
+
+        print('Sort candidate lists...')
+        process = partial(write_runs, cg_folder, runs_folder, ids_to_titles)
+        if number_of_processes == 1:
+            paths_to_runs = list(map(process, CANDIDATE_SOURCES))
+        else:
+            with multiprocessing.Pool(number_of_processes) as pool:
+                paths_to_runs = pool.map(process, CANDIDATE_SOURCES)
+
+        # merge the runs of the sources and write the index, table by table
+        write_candidate_index(path_to_index,
+                              lambda table: merge_runs([path_to_run for source_runs in paths_to_runs
+                                                        for path_to_run in source_runs[table]],
+                                                       count_aggregation=count_aggregation))
 
     # save the final lists
-    with open(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_mention_entities_counter.pickle'), 'wb') as handle:
-        pickle.dump(final_lists, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    if write_pickle:
+        with open(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_mention_entities_counter.pickle'), 'wb') as handle:
+            pickler = pickle.Pickler(handle, protocol=pickle.HIGHEST_PROTOCOL)
+            # without the memo the pickler does not keep a reference to every object it wrote
+            pickler.fast = True
+            pickler.dump(StreamedDict(CandidateIndex(path_to_index).items('exact')))
@@ -0,0 +1,40 @@
+# cleaning of the section texts before tokenization (see write_sections_to_column_file.py), in its own module so that it
+# can be used without spaCy
+
+import re
+
+# There is still some html syntax in the files.
+# we remove some of it to increase the annotation quality after toknization
+# each pattern is replaced with a string of the same length (mostly blanks), so that the offset positions of the annotations remain correct
+HTML_REPLACEMENTS = {'&nbsp;': '      ',
+                     '&thinsp;': '        ',
+                     '<small>': '       ',
+                     '</small>': '        ',
+                     '&ndash;': '   -   ',
+                     '</center>': '         ',
+                     '<center>': '        ',
+                     '&mdash;': '   -   ',
+                     '</big>': '      ',
+                     '<big>': '     ',
+                     '<br>': '    ',
+                     '||': '  ',  # this one has big consequences
+                     }
+
+
+def make_text_cleaner(replacements):
+    # returns a function that replaces all patterns in a text in one pass (one compiled regex instead of one copy of the
+    # text per pattern), longer patterns are preferred if two patterns match at the same position
+    for pattern, replacement in replacements.items():
+        if len(pattern) != len(replacement):
+            raise ValueError(f"Replacement '{replacement}' for '{pattern}' would shift the offsets of the annotations, "
+                             f"it must have the same length as the pattern")
+
+    patterns = re.compile('|'.join(re.escape(pattern) for pattern in sorted(replacements, key=len, reverse=True)))
+
+    def clean_text(text):
+        return patterns.sub(lambda match: replacements[match.group()], text)
+
+    return clean_text
+
+
+clean_text = make_text_cleaner(HTML_REPLACEMENTS)
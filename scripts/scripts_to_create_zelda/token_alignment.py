@@ -0,0 +1,41 @@
+# alignment of tokens and mentions, shared by the conll writer for ZELDA train and the scripts for the test data
+# a token belongs to a mention if it starts inside the mention span, since the token start offsets are sorted, the tokens
+# of a mention are found with two binary searches instead of going through all tokens (or links) for each mention
+
+from bisect import bisect_left
+
+
+def get_token_range(token_starts, mention_start, mention_end):
+    # returns the range of indices of the tokens that start in [mention_start, mention_end), token_starts must be sorted
+    return range(bisect_left(token_starts, mention_start), bisect_left(token_starts, mention_end))
+
+
+def add_mention_starts(token_starts, mention_spans):
+    # returns the sorted offsets of all tokens and mention starts, i.e. tokens are split where a mention starts
+    # each offset is in the list once, also if several mentions start at the same offset
+    offsets = list(token_starts)
+    added_starts = set()
+    for mention_start, mention_end in mention_spans:
+        i = bisect_left(token_starts, mention_start)
+        if (i == len(token_starts) or token_starts[i] != mention_start) and mention_start not in added_starts:
+            added_starts.add(mention_start)
+            offsets.append(mention_start)
+    offsets.sort()  # two sorted runs, this is a linear merge
+    return offsets
+
+
+def align_mentions(token_starts, mention_spans, skip_overlapping=True):
+    # returns (mention index, token range) for each mention that covers at least one token
+    # if skip_overlapping is True, a mention that starts before the previous (aligned) mention ends is skipped, like
+    # links that are not in order in the kensho data
+    aligned = []
+    end_of_previous_mention = None
+    for mention_index, (mention_start, mention_end) in enumerate(mention_spans):
+        if skip_overlapping and end_of_previous_mention is not None and mention_start < end_of_previous_mention:
+            continue
+        token_range = get_token_range(token_starts, mention_start, mention_end)
+        if len(token_range) > 0:
+            aligned.append((mention_index, token_range))
+            end_of_previous_mention = mention_end
+    return aligned
+
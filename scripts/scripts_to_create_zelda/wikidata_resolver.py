@@ -0,0 +1,86 @@
+# shared resolver of wikidata items for the scripts that use wikidata (tweeki_final.py and the candidate lists of the
+# wikidata aliases), it works like WikipediaResolver (see wikipedia_resolver.py): concurrent, rate limited requests and
+# a sqlite cache of all results, but with the wikidata api
+# - resolve_enwiki_titles: q-id -> title of its english wikipedia page (the enwiki sitelink), 50 q-ids per request and
+#   only the sitelink is fetched, not the whole entity
+# - resolve_aliases: english wikipedia title -> english aliases ("also known as") of its wikidata item, 50 titles per
+#   request
+#
+#   resolver = WikidataResolver('wikidata_cache.sqlite')
+#   titles = resolver.resolve_enwiki_titles(['Q64', 'Q1'])   # {'Q64': 'Berlin', 'Q1': 'Universe'}
+#   aliases = resolver.resolve_aliases(['Berlin'])          # {'Berlin': ['Berlin, Germany', ...]}
+
+import asyncio
+import json
+import re
+
+from scripts_to_create_zelda.wikipedia_resolver import MAX_IDS_PER_REQUEST, WikipediaResolver, get_title_batches
+
+WIKIDATA_API_URL = 'https://www.wikidata.org/w/api.php'
+
+# the api answers an error for the whole request if one of the q-ids is not well-formed
+ITEM_ID = re.compile(r'Q[1-9][0-9]*')
+
+
+class WikidataResolver(WikipediaResolver):
+    cache_tables = {'enwiki_titles_of_items': ('item_id TEXT', ['enwiki_title TEXT']),
+                    'aliases_of_titles': ('title TEXT', ['item_id TEXT', 'aliases TEXT'])}
+
+    def __init__(self, path_to_cache=None, api_url=WIKIDATA_API_URL, **kwargs):
+        # the keyword arguments are those of WikipediaResolver
+        super().__init__(path_to_cache, api_url=api_url, **kwargs)
+
+    async def fetch_enwiki_titles(self, item_ids):
+        # the enwiki sitelinks of up to MAX_IDS_PER_REQUEST q-ids
+        response = await self.request({'action': 'wbgetentities', 'ids': '|'.join(item_ids), 'props': 'sitelinks',
+                                       'sitefilter': 'enwiki'})
+        titles = dict.fromkeys(item_ids)
+        for item_id, entity in response.get('entities', {}).items():
+            if item_id in titles and 'enwiki' in entity.get('sitelinks', {}):
+                titles[item_id] = (entity['sitelinks']['enwiki']['title'],)
+        return titles
+
+    async def fetch_aliases(self, titles):
+        # the english aliases of the items of up to MAX_IDS_PER_REQUEST english wikipedia titles, the items are mapped
+        # back to the titles by their enwiki sitelinks
+        response = await self.request({'action': 'wbgetentities', 'sites': 'enwiki', 'titles': '|'.join(titles),
+                                       'props': 'aliases|sitelinks', 'languages': 'en', 'sitefilter': 'enwiki'})
+        aliases = dict.fromkeys(titles)
+        for item_id, entity in response.get('entities', {}).items():
+            title = entity.get('sitelinks', {}).get('enwiki', {}).get('title')
+            if title in aliases:
+                aliases[title] = (item_id, json.dumps([alias['value'] for alias in entity.get('aliases', {}).get('en', [])]))
+        return aliases
+
+    async def resolve_enwiki_titles_async(self, item_ids):
+        item_ids = list(dict.fromkeys(item_ids))
+        titles = self.get_cached('enwiki_titles_of_items', item_ids)
+        # q-ids that are not well-formed have no item
+        titles.update({item_id: None for item_id in item_ids if not ITEM_ID.fullmatch(item_id)})
+        missing_ids = [item_id for item_id in item_ids if item_id not in titles]
+        await self.run_batches((missing_ids[start:start + MAX_IDS_PER_REQUEST]
+                                for start in range(0, len(missing_ids), MAX_IDS_PER_REQUEST)),
+                               self.fetch_enwiki_titles, 'enwiki_titles_of_items', show_progress=True)
+        titles.update(self.get_cached('enwiki_titles_of_items', missing_ids))
+        return {item_id: titles[item_id] and titles[item_id][0] for item_id in item_ids}
+
+    async def resolve_aliases_async(self, titles):
+        titles = list(dict.fromkeys(titles))
+        aliases = self.get_cached('aliases_of_titles', titles)
+        # '|' separates the titles of a request, titles that contain it are not valid anyway
+        aliases.update({title: None for title in titles if '|' in title})
+        missing_titles = [title for title in titles if title not in aliases]
+        await self.run_batches(get_title_batches(missing_titles), self.fetch_aliases, 'aliases_of_titles',
+                               show_progress=True)
+        aliases.update(self.get_cached('aliases_of_titles', missing_titles))
+        return {title: aliases[title] and json.loads(aliases[title][1]) for title in titles}
+
+    def resolve_enwiki_titles(self, item_ids):
+        # returns a dictionary q-id -> title of the english wikipedia page of the item, or None if the item does not
+        # exist or has no english wikipedia page
+        return asyncio.run(self.resolve_enwiki_titles_async(item_ids))
+
+    def resolve_aliases(self, titles):
+        # returns a dictionary title -> list of the english aliases of the wikidata item of the english wikipedia page,
+        # or None if there is no item for the page
+        return asyncio.run(self.resolve_aliases_async(titles))
@@ -0,0 +1,192 @@
+# offline resolution of wikipedia page ids and titles, instead of the wikimedia api (see wikipedia_resolver.py)
+# the resolver reads the page and redirect tables of a wikipedia dump once into an indexed sqlite file, e.g.
+#   https://dumps.wikimedia.org/enwiki/20221020/enwiki-20221020-page.sql.gz
+#   https://dumps.wikimedia.org/enwiki/20221020/enwiki-20221020-redirect.sql.gz
+# instead of the sql files, tsv exports of the tables can be used (a header line with the column names and one row per
+# line, e.g. the output of 'mysql --batch'). The files may be compressed (see compressed_files.py)
+# WikipediaDumpResolver answers resolve_ids and resolve_titles like WikipediaResolver, so the scripts can use either
+# (see get_wikipedia_resolver), with the difference that the results are those of the dump and thus reproducible
+# Note: only pages of the main namespace (the articles) are in the index
+
+import os
+import re
+import sqlite3
+
+from scripts_to_create_zelda.compressed_files import open_input
+from scripts_to_create_zelda.wikipedia_resolver import WikipediaResolver
+
+# the columns that are read from the tables
+PAGE_COLUMNS = ['page_id', 'page_namespace', 'page_title', 'page_is_redirect']
+REDIRECT_COLUMNS = ['rd_from', 'rd_namespace', 'rd_title', 'rd_interwiki']
+
+# a value in the INSERT statements of the sql dumps, either a quoted string or a number / NULL
+SQL_VALUE = r"('(?:[^'\\]|\\.)*'|[^,'()]*)"
+
+# escape sequences of mysql, in the sql dumps and in tsv exports
+ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+ESCAPE = re.compile(r'\\(.)', re.DOTALL)
+
+# rows are inserted into the index in chunks of this size
+CHUNK_SIZE = 100000
+
+
+def unescape(value):
+    if '\\' not in value:
+        return value
+    return ESCAPE.sub(lambda match: ESCAPES.get(match.group(1), match.group(1)), value)
+
+
+def normalize_title(title):
+    # the normalization of the api for titles of the main namespace: underscores are spaces, no repeated or surrounding
+    # spaces, the first letter is upper case and the fragment ('#...') is not part of the title
+    title = ' '.join(title.split('#')[0].replace('_', ' ').split())
+    if title and len(title[0].upper()) == 1:
+        title = title[0].upper() + title[1:]
+    return title
+
+
+def read_sql_table(path, columns):
+    # yields the values of the columns for each row of the INSERT statements of a sql dump of a table
+    # the order of the columns of the table is taken from its CREATE TABLE statement
+    table_columns = []
+    row = None
+    with open_input(path) as dump:
+        for line in dump:
+            if row is None:
+                if line.startswith('CREATE TABLE'):
+                    table_columns = []
+                elif line.startswith('  `'):
+                    table_columns.append(line.split('`')[1])
+                elif line.startswith('INSERT INTO'):
+                    missing_columns = [column for column in columns if column not in table_columns]
+                    if missing_columns:
+                        raise ValueError(f'The table in {path} has no columns {missing_columns}')
+                    row = re.compile(r'\(' + ','.join([SQL_VALUE] * len(table_columns)) + r'\)')
+                    positions = [table_columns.index(column) for column in columns]
+            if row is not None and line.startswith('INSERT INTO'):
+                for match in row.finditer(line, line.index(' VALUES ')):
+                    values = match.groups()
+                    yield [unescape(values[position][1:-1]) if values[position].startswith("'") else values[position]
+                           for position in positions]
+
+
+def read_tsv_table(path, columns):
+    # yields the values of the columns for each row of a tsv export of a table (with the column names in the first line)
+    with open_input(path) as tsv:
+        table_columns = tsv.readline().rstrip('\n').split('\t')
+        missing_columns = [column for column in columns if column not in table_columns]
+        if missing_columns:
+            raise ValueError(f'The table in {path} has no columns {missing_columns}')
+        positions = [table_columns.index(column) for column in columns]
+        for line in tsv:
+            values = line.rstrip('\n').split('\t')
+            yield [unescape(values[position]) for position in positions]
+
+
+def read_table(path, columns):
+    if '.tsv' in os.path.basename(path):
+        return read_tsv_table(path, columns)
+    return read_sql_table(path, columns)
+
+
+def insert_in_chunks(connection, statement, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            connection.executemany(statement, chunk)
+            chunk = []
+    connection.executemany(statement, chunk)
+
+
+def build_wikipedia_dump_index(path_to_page_table, path_to_redirect_table, path_to_index):
+    # reads the articles and redirects of the main namespace into the index, the index is written under a temporary
+    # name and renamed when it is complete
+    print(f'Build the index of the wikipedia dump tables {path_to_page_table} and {path_to_redirect_table}...')
+    temporary_path = path_to_index + '.tmp'
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    connection = sqlite3.connect(temporary_path)
+    connection.execute('PRAGMA journal_mode = OFF')
+    connection.execute('PRAGMA synchronous = OFF')
+    connection.execute('CREATE TABLE pages (page_id INTEGER PRIMARY KEY, title TEXT, is_redirect INTEGER)')
+    connection.execute('CREATE TABLE redirects (page_id INTEGER PRIMARY KEY, target_title TEXT)')
+
+    insert_in_chunks(connection, 'INSERT OR REPLACE INTO pages VALUES (?, ?, ?)',
+                     ((int(page_id), title.replace('_', ' '), int(is_redirect))
+                      for page_id, namespace, title, is_redirect in read_table(path_to_page_table, PAGE_COLUMNS)
+                      if namespace == '0'))
+    print(f'{connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0]} pages')
+
+    # redirects to other namespaces or other wikis are left out, as if the redirect page did not exist
+    insert_in_chunks(connection, 'INSERT OR REPLACE INTO redirects VALUES (?, ?)',
+                     ((int(page_id), title.replace('_', ' '))
+                      for page_id, namespace, title, interwiki in read_table(path_to_redirect_table, REDIRECT_COLUMNS)
+                      if namespace == '0' and interwiki in ('', 'NULL')))
+    print(f'{connection.execute("SELECT COUNT(*) FROM redirects").fetchone()[0]} redirects')
+
+    connection.execute('CREATE UNIQUE INDEX titles ON pages (title)')
+    connection.commit()
+    connection.close()
+    os.replace(temporary_path, path_to_index)
+    print('Done.')
+
+
+class WikipediaDumpResolver:
+
+    def __init__(self, path_to_index):
+        self.index = sqlite3.connect(f'file:{path_to_index}?mode=ro', uri=True)
+
+    def get_page_of_title(self, title):
+        row = self.index.execute('SELECT page_id, title, is_redirect FROM pages WHERE title = ?', (title,)).fetchone()
+        return row and (row[0], row[1], row[2])
+
+    def follow_redirect(self, page):
+        # like the api, a redirect is followed once, the redirects of pages that do not exist lead to no page
+        if page is None or not page[2]:
+            return page and (page[0], page[1])
+        row = self.index.execute('SELECT target_title FROM redirects WHERE page_id = ?', (page[0],)).fetchone()
+        target = row and self.get_page_of_title(normalize_title(row[0]))
+        return target and (target[0], target[1])
+
+    def resolve_titles(self, titles):
+        # returns a dictionary title -> (page id, title) of the page the title leads to, or None if there is no page
+        return {title: self.follow_redirect(self.get_page_of_title(normalize_title(title))) for title in titles}
+
+    def resolve_ids(self, page_ids):
+        # returns a dictionary page id -> (page id, title) of the page the id leads to (the ids of redirects lead to the
+        # page they redirect to), or None if there is no page
+        pages = {}
+        for page_id in page_ids:
+            if page_id not in pages:
+                row = self.index.execute('SELECT page_id, title, is_redirect FROM pages WHERE page_id = ?',
+                                         (int(page_id),)).fetchone()
+                pages[page_id] = self.follow_redirect(row)
+        return pages
+
+    def close(self):
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def get_wikipedia_resolver(path_to_cache, path_to_page_table=None, path_to_redirect_table=None, path_to_index=None):
+    # returns the resolver the scripts should use: the offline resolver if the tables of a dump are given (its index is
+    # built the first time, by default next to the page table), otherwise the api resolver with the cache
+    # the dump needs both tables, the redirects can not be resolved without the redirect table
+    if not path_to_page_table and not path_to_redirect_table:
+        return WikipediaResolver(path_to_cache)
+    if not path_to_redirect_table:
+        raise ValueError(f'The page table {path_to_page_table} is given without the redirect table of the dump '
+                         f'(enwiki-...-redirect.sql.gz), give both tables or none')
+    if not path_to_page_table:
+        raise ValueError(f'The redirect table {path_to_redirect_table} is given without the page table of the dump '
+                         f'(enwiki-...-page.sql.gz), give both tables or none')
+    path_to_index = str(path_to_index or str(path_to_page_table) + '.index.sqlite')
+    if not os.path.exists(path_to_index):
+        build_wikipedia_dump_index(str(path_to_page_table), str(path_to_redirect_table), path_to_index)
+    return WikipediaDumpResolver(path_to_index)
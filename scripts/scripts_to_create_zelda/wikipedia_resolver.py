@@ -0,0 +1,305 @@
+# shared resolver of wikipedia page ids and titles for the scripts that create ZELDA and the test data
+# instead of one blocking call to the wikimedia api per id or title (and "run the script again" if the api refuses calls),
+# the resolver
+# - sends the requests concurrently (asyncio, the blocking http calls run in threads) over keep-alive connections
+# - limits the rate of the requests with a token bucket and retries failed requests with exponential backoff (or as long
+#   as the api asks for with Retry-After)
+# - asks for up to 50 page ids or titles per request (the limit of the api)
+# - keeps all results, including the redirects and the pages that do not exist, in a sqlite cache, so a second run (or
+#   another script with the same cache) does not call the api again for them
+# the results are (page id, title) of the page that an id or title leads to after following redirects, or None if
+# there is no such page. api_url can point to any mediawiki api, e.g. a local stub server for tests
+#
+#   resolver = WikipediaResolver('wikipedia_cache.sqlite')
+#   pages = resolver.resolve_ids([9663, 3313915])   # {9663: (9663, 'Electronics'), 3313915: (35608495, ...)}
+#   pages = resolver.resolve_titles(['Berlin'])      # {'Berlin': (3354, 'Berlin')}
+
+import asyncio
+import http.client
+import json
+import random
+import sqlite3
+import threading
+import time
+import urllib.parse
+from functools import partial
+
+WIKIPEDIA_API_URL = 'https://en.wikipedia.org/w/api.php'
+
+# the wikimedia api asks clients to identify themselves
+USER_AGENT = 'ZELDA-scripts (https://github.com/flairNLP/zelda)'
+
+# maximal number of page ids or titles in one request of the api
+MAX_IDS_PER_REQUEST = 50
+
+# the titles of a request are also limited by their length in the url
+MAX_TITLES_LENGTH = 6000
+
+# errors of the api after which the request is repeated
+RETRY_ERROR_CODES = {'maxlag', 'ratelimited', 'readonly', 'internal_api_error_DBQueryError'}
+
+# the progress of long runs is printed every that many batches
+PROGRESS_INTERVAL = 1000
+
+
+class WikipediaApiError(Exception):
+
+    def __init__(self, message, retry=False, retry_after=None):
+        super().__init__(message)
+        self.retry = retry
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    # allows rate requests per second on average and bursts of up to capacity requests
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ApiConnections:
+    # keep-alive connections to the host of the api, a request takes a free connection or opens a new one
+
+    def __init__(self, api_url, timeout=60):
+        url = urllib.parse.urlsplit(api_url)
+        self.connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.host = url.netloc
+        self.path = url.path or '/'
+        self.timeout = timeout
+        self.free_connections = []
+        self.lock = threading.Lock()
+
+    def get_json(self, parameters):
+        with self.lock:
+            connection = self.free_connections.pop() if self.free_connections else None
+        if connection is None:
+            connection = self.connection_class(self.host, timeout=self.timeout)
+        try:
+            connection.request('GET', self.path + '?' + urllib.parse.urlencode(parameters),
+                               headers={'User-Agent': USER_AGENT})
+            response = connection.getresponse()
+            body = response.read()
+        except Exception:
+            connection.close()
+            raise
+        with self.lock:
+            self.free_connections.append(connection)
+
+        if response.status != 200:
+            retry_after = response.getheader('Retry-After')
+            raise WikipediaApiError(f'The api answered with status {response.status}',
+                                    retry=response.status == 429 or response.status >= 500,
+                                    retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+        return json.loads(body)
+
+    def close(self):
+        with self.lock:
+            for connection in self.free_connections:
+                connection.close()
+            self.free_connections = []
+
+
+def get_title_batches(titles):
+    # batches of up to MAX_IDS_PER_REQUEST titles that are not longer than MAX_TITLES_LENGTH in the url
+    batch = []
+    length = 0
+    for title in titles:
+        title_length = len(urllib.parse.quote(title)) + 3
+        if batch and (len(batch) == MAX_IDS_PER_REQUEST or length + title_length > MAX_TITLES_LENGTH):
+            yield batch
+            batch = []
+            length = 0
+        batch.append(title)
+        length += title_length
+    if batch:
+        yield batch
+
+
+class WikipediaResolver:
+    # the tables of the cache: key column and value columns, NULL values mean that there is no page
+    cache_tables = {'pages_of_ids': ('page_id INTEGER', ['resolved_id INTEGER', 'resolved_title TEXT']),
+                    'pages_of_titles': ('title TEXT', ['resolved_id INTEGER', 'resolved_title TEXT'])}
+
+    def __init__(self, path_to_cache=None, api_url=WIKIPEDIA_API_URL, requests_per_second=10., max_concurrent_requests=8,
+                 max_retries=8, backoff_seconds=1., max_backoff_seconds=120., timeout=60):
+        # without path_to_cache the results are only cached in memory
+        self.connections = ApiConnections(api_url, timeout=timeout)
+        self.rate_limiter = TokenBucket(requests_per_second, capacity=max_concurrent_requests)
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.number_of_requests = 0
+
+        self.cache = sqlite3.connect(path_to_cache or ':memory:')
+        for table, (key_column, value_columns) in self.cache_tables.items():
+            self.cache.execute(f'CREATE TABLE IF NOT EXISTS {table} ({key_column} PRIMARY KEY, {", ".join(value_columns)})')
+        self.cache.commit()
+
+    # the cache
+
+    def get_cached(self, table, keys):
+        # returns a dictionary key -> values (e.g. (page id, title)) or None for the keys that are in the cache
+        key_column = self.cache_tables[table][0].split()[0]
+        cached = {}
+        keys = list(keys)
+        # sqlite limits the number of parameters of a statement
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            for key, *values in self.cache.execute(
+                    f'SELECT * FROM {table} WHERE {key_column} IN ({",".join("?" * len(chunk))})', chunk):
+                cached[key] = None if values[0] is None else tuple(values)
+        return cached
+
+    def add_to_cache(self, table, results):
+        number_of_values = len(self.cache_tables[table][1])
+        self.cache.executemany(f'INSERT OR REPLACE INTO {table} VALUES ({", ".join("?" * (number_of_values + 1))})',
+                               [(key, *(values or (None,) * number_of_values)) for key, values in results.items()])
+        self.cache.commit()
+
+    # requests
+
+    async def query(self, parameters):
+        # one request of action=query
+        return await self.request(dict(parameters, action='query'))
+
+    async def request(self, parameters):
+        # one request of the api, repeated with exponential backoff if it fails for a temporary reason
+        parameters = dict(parameters, format='json', formatversion=2, maxlag=5)
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            retry_after = None
+            try:
+                response = await asyncio.to_thread(self.connections.get_json, parameters)
+            except WikipediaApiError as error:
+                if not error.retry:
+                    raise
+                last_error, retry_after = error, error.retry_after
+            except (OSError, http.client.HTTPException, ValueError) as error:
+                last_error = error
+            else:
+                self.number_of_requests += 1
+                if 'error' not in response:
+                    return response
+                if response['error'].get('code') not in RETRY_ERROR_CODES:
+                    raise WikipediaApiError(f'The api answered with an error: {response["error"]}')
+                last_error = response['error']
+            delay = retry_after or min(self.backoff_seconds * 2 ** attempt, self.max_backoff_seconds) * (0.5 + random.random())
+            print(f'Request to the wikipedia api failed ({last_error!r}), retry in {delay:.1f} seconds')
+            await asyncio.sleep(delay)
+        raise WikipediaApiError(f'The request to the wikipedia api failed {self.max_retries + 1} times: {last_error!r}')
+
+    async def run_batches(self, batches, fetch_batch, table, show_progress=False):
+        # fetches the batches with at most max_concurrent_requests in flight, the results of each batch go to the cache
+        # as soon as it is done, so an interrupted run loses only the batches in flight
+        batches = iter(batches)
+        pending = set()
+        number_of_done_batches = 0
+        while True:
+            while len(pending) < self.max_concurrent_requests:
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                pending.add(asyncio.ensure_future(fetch_batch(batch)))
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                self.add_to_cache(table, task.result())
+                number_of_done_batches += 1
+                if show_progress and number_of_done_batches % PROGRESS_INTERVAL == 0:
+                    print(f'{number_of_done_batches} batches resolved ({self.number_of_requests} requests)')
+
+    async def fetch_titles(self, titles):
+        # the pages of up to MAX_IDS_PER_REQUEST titles, redirects are followed
+        # the api answers with the normalized and redirected titles, they are mapped back to the titles of the request
+        response = await self.query({'prop': 'info', 'titles': '|'.join(titles), 'redirects': 1})
+        normalized = {entry['from']: entry['to'] for entry in response['query'].get('normalized', [])}
+        redirects = {entry['from']: entry['to'] for entry in response['query'].get('redirects', [])}
+        pages_of_titles = {page['title']: (page['pageid'], page['title']) for page in response['query'].get('pages', [])
+                           if 'pageid' in page and not page.get('missing') and not page.get('invalid')}
+        pages = {}
+        for title in titles:
+            target = normalized.get(title, title)
+            pages[title] = pages_of_titles.get(redirects.get(target, target))
+        return pages
+
+    async def fetch_ids(self, page_ids, redirect_titles):
+        # the pages of up to MAX_IDS_PER_REQUEST ids, the ids of redirect pages are left out and their titles are added
+        # to redirect_titles (page id -> title), they are resolved by their titles once all batches of ids are done
+        response = await self.query({'prop': 'info', 'pageids': '|'.join(str(page_id) for page_id in page_ids)})
+        pages = dict.fromkeys(page_ids)
+        for page in response['query'].get('pages', []):
+            if page.get('missing') or page.get('invalid') or page.get('pageid') not in pages:
+                continue
+            if page.get('redirect'):
+                redirect_titles[page['pageid']] = page['title']
+                del pages[page['pageid']]
+            else:
+                pages[page['pageid']] = (page['pageid'], page['title'])
+        return pages
+
+    # resolution
+
+    async def resolve_titles_async(self, titles):
+        titles = list(dict.fromkeys(titles))
+        pages = self.get_cached('pages_of_titles', titles)
+        # '|' separates the titles of a request, titles that contain it are not valid anyway
+        invalid_titles = {title: None for title in titles if title not in pages and '|' in title}
+        self.add_to_cache('pages_of_titles', invalid_titles)
+        pages.update(invalid_titles)
+        await self.run_batches(get_title_batches(title for title in titles if title not in pages),
+                               self.fetch_titles, 'pages_of_titles')
+        pages.update(self.get_cached('pages_of_titles', [title for title in titles if title not in pages]))
+        return {title: pages[title] for title in titles}
+
+    async def resolve_ids_async(self, page_ids):
+        page_ids = list(dict.fromkeys(page_ids))
+        pages = self.get_cached('pages_of_ids', page_ids)
+        missing_ids = [page_id for page_id in page_ids if page_id not in pages]
+        if len(missing_ids) > MAX_IDS_PER_REQUEST * PROGRESS_INTERVAL:
+            print(f'{len(pages)} of {len(page_ids)} ids are in the cache, resolve the other {len(missing_ids)} ids...')
+        # the titles of the redirects are resolved after the ids, so there are never more than max_concurrent_requests
+        # requests in flight (an interrupted run fetches the ids of the redirects again)
+        redirect_titles = {}
+        await self.run_batches((missing_ids[start:start + MAX_IDS_PER_REQUEST]
+                                for start in range(0, len(missing_ids), MAX_IDS_PER_REQUEST)),
+                               partial(self.fetch_ids, redirect_titles=redirect_titles), 'pages_of_ids', show_progress=True)
+        if redirect_titles:
+            pages_of_titles = await self.resolve_titles_async(redirect_titles.values())
+            self.add_to_cache('pages_of_ids', {page_id: pages_of_titles[title] for page_id, title in redirect_titles.items()})
+        pages.update(self.get_cached('pages_of_ids', missing_ids))
+        return {page_id: pages[page_id] for page_id in page_ids}
+
+    def resolve_titles(self, titles):
+        # returns a dictionary title -> (page id, title) of the page the title leads to, or None if there is no page
+        return asyncio.run(self.resolve_titles_async(titles))
+
+    def resolve_ids(self, page_ids):
+        # returns a dictionary page id -> (page id, title) of the page the id leads to (the ids of redirects lead to the
+        # page they redirect to), or None if there is no page
+        return asyncio.run(self.resolve_ids_async(page_ids))
+
+    def close(self):
+        self.connections.close()
+        self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
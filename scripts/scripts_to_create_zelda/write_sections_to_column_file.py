@@ -1,121 +1,152 @@
 # file to create a column corpus, given a list of wikipedia sections
+import multiprocessing
+import re
+
 import spacy
 import json
 import os
 
-
-def create_zelda_conll(PATH_TO_REPOSITORY):
+from scripts_to_create_zelda.compressed_files import decompress, find_input_file, get_output_path, open_output
+from scripts_to_create_zelda.text_cleaning import HTML_REPLACEMENTS, clean_text, make_text_cleaner
+from scripts_to_create_zelda.token_alignment import add_mention_starts, align_mentions
+
+# for the column file we only need token offsets and sentence starts, there are several backends to obtain them
+# 'spacy': the full en_core_web_sm pipeline, sentences come from the dependency parser (this is how ZELDA was created)
+# 'sentencizer': a blank english spaCy model (same tokenizer rules) with the rule-based sentencizer, much faster
+# 'regex': a pure regex tokenizer and sentence splitter, fastest but the tokens differ more from the spaCy tokens
+# see benchmark_tokenizer_backends.py for speed and agreement with the 'spacy' backend
+TOKENIZER_BACKENDS = ['spacy', 'sentencizer', 'regex']
+
+token_pattern = re.compile(r"\w+(?:['’-]\w+)*|[^\w\s]")
+
+
+def read_sections(path_to_sections_jsonl, clean_text=clean_text):
+    # yields (cleaned text, (section dictionary, number of bytes read so far)) for each section in the jsonl file
+    # the jsonl file may be compressed (see compressed_files.py), then the bytes are those read from the compressed file
+    with open(find_input_file(path_to_sections_jsonl), mode='rb') as raw_jsonl, decompress(raw_jsonl) as input_jsonl:
+        for line in input_jsonl:
+            line_dict = json.loads(line)
+            yield clean_text(line_dict['text']), (line_dict, raw_jsonl.tell())
+
+
+def regex_tokenize(text):
+    # returns the token start offsets and the set of sentence start offsets of the text
+    # a sentence ends with '.', '!' or '?' (or a line break) if the next token is separated by whitespace and not lower cased
+    token_starts = []
+    sentence_starts = set()
+    previous_end = 0
+    previous_token = ''
+    for match in token_pattern.finditer(text):
+        start = match.start()
+        token = match.group()
+        if not token_starts \
+                or '\n' in text[previous_end:start] \
+                or (previous_token in '.!?' and start > previous_end and not token[0].islower()):
+            sentence_starts.add(start)
+        token_starts.append(start)
+        previous_end = match.end()
+        previous_token = token
+    return token_starts, sentence_starts
+
+
+def tokenize_sections(sections, tokenizer_backend='spacy', batch_size=1000, number_of_processes=1):
+    # sections is an iterable of (text, context) pairs
+    # yields (text, token start offsets, sentence start offsets, context) in the order of the sections
+    if tokenizer_backend == 'regex':
+        for text, context in sections:
+            token_starts, sentence_starts = regex_tokenize(text)
+            yield text, token_starts, sentence_starts, context
+        return
+
+    if tokenizer_backend == 'spacy':
+        # the other components do not change tokens or sentences
+        nlp = spacy.load("en_core_web_sm", exclude=['ner', 'lemmatizer'])
+    elif tokenizer_backend == 'sentencizer':
+        nlp = spacy.blank('en')
+        nlp.add_pipe('sentencizer')
+    else:
+        raise ValueError(f'Unknown tokenizer backend {tokenizer_backend}, choose one of {TOKENIZER_BACKENDS}')
+
+    # the sections are processed in batches (and possibly several processes), the docs come back in the order of the sections
+    for doc, context in nlp.pipe(sections, as_tuples=True, batch_size=batch_size, n_process=number_of_processes):
+        yield doc.text, [token.idx for token in doc], {sentence.start_char for sentence in doc.sents}, context
+
+
+def section_to_conll(text, token_starts, sentence_starts, line_dict):
+    # returns the lines of the column file for one section, given the token and sentence start offsets of the text
+    conll_lines = []
+
+    # we write DOCSTART before each section
+    conll_lines.append('-DOCSTART-\n')
+
+    # remember entities as lists of spans and (id, title) labels
+    mention_spans = []
+    mention_labels = []
+    for (mention_start, mention_end), wikiname, wikiid in zip(line_dict['index'], line_dict['wikipedia_titles'], line_dict['wikipedia_ids']):
+        if mention_start == mention_end: continue # some anchor texts get removed due to formatting weirdness
+        mention_spans.append((mention_start, mention_end))
+        mention_labels.append((str(wikiid), wikiname.replace(' ', '_')))
+
+    # all token start indices and entity start indices (tokens are split where an entity starts) in order
+    offsets = add_mention_starts(token_starts, mention_spans)
+    offsets.append(len(text))
+
+    # a span is inside an entity if it starts inside the entity, entities that start inside a previous one are skipped
+    # the tags already contain the column separators
+    tags = ['\tO\tO\n'] * len(offsets)
+    aligned_mentions = align_mentions(offsets[:-1], mention_spans)
+    for mention_index, span_range in aligned_mentions:
+        wikiid, wikiname = mention_labels[mention_index]
+        tags[span_range.start] = '\tB-' + wikiid + '\tB-' + wikiname + '\n'
+        tags[span_range.start + 1:span_range.stop] = ['\tI-' + wikiid + '\tI-' + wikiname + '\n'] * (len(span_range) - 1)
+
+    if len(aligned_mentions) < len(mention_spans):
+        print("ERROR! Unmatched entities left!")
+
+    # go through all start positions
+    append = conll_lines.append
+    for start, end, tag in zip(offsets, offsets[1:], tags):
+
+        # a newline before each sentence
+        if start in sentence_starts:
+            append('\n')
+
+        # spans that only contain blanks are not written
+        span_token = text[start:end].rstrip()
+
+        if span_token:
+            append(span_token + tag)
+
+    # empty line after each section/document
+    conll_lines.append('\n')
+
+    return conll_lines
+
+
+def create_zelda_conll(PATH_TO_REPOSITORY, tokenizer_backend='spacy', batch_size=1000, number_of_processes=None,
+                       html_replacements=HTML_REPLACEMENTS, compression=None):
     print('Create conll file...')
 
-    conll_file_path = os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_train.conll')
-    write = open(conll_file_path, mode='w', encoding='utf-8')
+    if not number_of_processes:
+        number_of_processes = multiprocessing.cpu_count()
 
+    # the conll file is compressed with the given compression, the jsonl file is read in whatever compression it was written
+    conll_file_path = get_output_path(os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_train.conll'), compression)
     path_to_sections_jsonl = os.path.join(PATH_TO_REPOSITORY, 'train_data', 'zelda_train.jsonl')
-    with open(path_to_sections_jsonl, 'r', encoding='utf-8') as input_jsonl:
-        total_lines = sum(1 for line in input_jsonl)
+    total_bytes = os.path.getsize(find_input_file(path_to_sections_jsonl))
 
     lines_counter = 0
 
-    nlp = spacy.load("en_core_web_sm")
-
-    input_jsonl = open(path_to_sections_jsonl, 'r', encoding='utf-8')
     # given the filtered set of wikipedia pages, create a column file with which one can train
-    for line in input_jsonl:
-
-        # we write DOCSTART before each section
-        write.write('-DOCSTART-\n')
-
-        line_dict = json.loads(line)
-        text = line_dict['text']
-
-        # There is still some html syntax in the files.
-        # we remove some of it to increase the annotation quality after toknization
-        text = text.replace('&nbsp;',
-                            '      ')  # we replace it with as many blanks as letters so that the offset poitions of the annotations remain correct
-        text = text.replace('&thinsp;', '        ')
-        text = text.replace('<small>', '       ')
-        text = text.replace('</small>', '        ')
-        text = text.replace('&ndash;', '   -   ')
-        text = text.replace('</center>', '         ')
-        text = text.replace('<center>', '        ')
-        text = text.replace('&mdash;', '   -   ')
-        text = text.replace('</big>', '      ')
-        text = text.replace('<big>', '     ')
-        text = text.replace('<br>', '    ')
-        # the next one has big consequences
-        text = text.replace('||', '  ')
-
-        link_indices = line_dict['index']
-        target_page_ids = line_dict['wikipedia_ids']
-        wikinames = line_dict['wikipedia_titles']
-
-        # tokenize and sentence split the text
-        doc = nlp(text)
-
-        # get all token start indices
-        offsets = set()
-        sentence_starts = set()
-        for token in doc:
-            offsets.add(token.idx)
-            sentence_starts.add(token.sent[0].idx)
-        offsets.add(len(text))
-
-        # add all entity start indices and remember entities as list
-        links = []
-        for (mention_start, mention_end), wikiname, wikiid in zip(link_indices, wikinames, target_page_ids):
-            if mention_start == mention_end: continue # some anchor texts get removed due to formatting weirdness
-            offsets.add(mention_start)
-            links.append((mention_start, mention_end, wikiname.replace(' ', '_'), str(wikiid)))
-
-        # order all offsets
-        offsets_ordered = list(offsets)
-        offsets_ordered.sort()
-
-        # get the first link
-        next_link = links.pop(0)
-        entity_started = False
-
-        # go through all start positions
-        for start, end in zip(offsets_ordered, offsets_ordered[1:]):
-
-            # a newline before each sentence
-            if start in sentence_starts:
-                write.write('\n')
-
-            span_token = text[start:end].rstrip()
-
-            # if start position greater than current link, get next link
-            if next_link and start > next_link[1] - 1:
-
-                if not entity_started:
-                    print("ERROR! Next entity started before previous was written")
-
-                next_link = links.pop(0) if len(links) > 0 else None
-                entity_started = False
-
-            tag = 'O\tO'
-
-            # if we are inside an entity
-            if next_link and entity_started and start > next_link[0]:
-                tag = 'I-' + next_link[3] + '\t' + 'I-' + next_link[2]
-
-            # if start position is that of link, add annotation
-            if next_link and start == next_link[0]:
-                tag = 'B-' + next_link[3] + '\t' + 'B-' + next_link[2]
-                entity_started = True
-
-            if span_token.strip() != '':
-                write.write(span_token + '\t' + tag + '\n')
-
-        if len(links) > 0:
-            print("ERROR! Unmatched entities left!")
-
-        # empty line after each section/document
-        write.write('\n')
-
-        lines_counter += 1
-        if lines_counter % 1000 == 0:
-            print('processed {:10.4f} %'.format((lines_counter / total_lines) * 100))
-
-    write.close()
-    input_jsonl.close()
+    # the tokenized sections come back in the order of the jsonl file, together with the section dictionary and the
+    # number of bytes read up to the section
+    with open_output(conll_file_path, compression) as write:
+        for text, token_starts, sentence_starts, (line_dict, bytes_read) in tokenize_sections(
+                read_sections(path_to_sections_jsonl, make_text_cleaner(html_replacements)), tokenizer_backend=tokenizer_backend, batch_size=batch_size,
+                number_of_processes=number_of_processes):
+
+            write.writelines(section_to_conll(text, token_starts, sentence_starts, line_dict))
+
+            lines_counter += 1
+            if lines_counter % 1000 == 0:
+                print('processed {:10.4f} %'.format((bytes_read / total_bytes) * 100))
@@ -0,0 +1,49 @@
+# round trips to the candidate server (candidate_server.py) over a unix socket and over tcp, with a small in-memory index
+# run with: python -m pytest scripts/tests
+
+import os
+import sys
+import threading
+
+import pytest
+
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.candidate_server import CandidateClient, create_candidate_server
+
+
+class CandidateLists:
+    # answers get_candidates_and_mfs like CandidateIndex
+    info = {'tables': {'exact': 2}}
+    candidates = {'Paris': (['Paris', 'Paris Hilton'], 'Paris'), 'Rome': (['Rome'], 'Rome')}
+
+    def get_candidates_and_mfs(self, mention, fuzzy=False):
+        return self.candidates.get(mention, ([], ''))
+
+
+@pytest.fixture(params=['unix', 'tcp'])
+def server_address(request, tmp_path):
+    address = str(tmp_path / 'candidates.sock') if request.param == 'unix' else ('127.0.0.1', 0)
+    server = create_candidate_server(CandidateLists(), address)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def test_round_trip(server_address):
+    with CandidateClient(server_address) as client:
+        # several requests over the same connection
+        assert client.get_candidates_and_mfs_batch(['Paris', 'Nowhere', 'Rome']) == \
+            [(['Paris', 'Paris Hilton'], 'Paris'), ([], ''), (['Rome'], 'Rome')]
+        assert client.get_candidates_and_mfs('Rome') == (['Rome'], 'Rome')
+        assert client.get_info()['index'] == CandidateLists.info
+
+
+def test_bad_request(server_address):
+    with CandidateClient(server_address) as client:
+        with pytest.raises(ValueError, match='400'):
+            client.request('POST', '/candidates', {'mentions': 'Paris'})
+        # the connection is still usable after the error
+        assert client.get_candidates_and_mfs('Paris') == (['Paris', 'Paris Hilton'], 'Paris')
@@ -0,0 +1,89 @@
+# parity test of select_sections (filter_sections_from_kensho.py) with the original greedy selection of
+# create_train_jsonl on synthetic sections: with the same seed both have to select exactly the same sections
+# run with: python -m pytest scripts/tests
+
+import contextlib
+import io
+import os
+import random
+import sys
+from array import array
+from collections import defaultdict
+
+import pytest
+
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.filter_sections_from_kensho import SectionTriples, select_sections
+
+
+def select_sections_greedy(list_of_section_triples, set_of_all_ids_in_test, test_entities_and_count, threshold=10):
+    # the original selection: for each section in random order, check all entities that are not covered enough times yet
+    entities_and_how_often_already_covered = {idx: 0 for idx in set_of_all_ids_in_test}
+    entities_not_covered_enough_times_yet = set_of_all_ids_in_test.copy()
+    selected_sections = defaultdict(list)
+    random_order = random.sample(range(len(list_of_section_triples)), len(list_of_section_triples))
+    for index in random_order:
+        if not entities_not_covered_enough_times_yet:
+            break
+        section_triple = list_of_section_triples[index]
+        target_page_ids = section_triple[2]
+        for idx in entities_not_covered_enough_times_yet:
+            if idx in target_page_ids:
+                selected_sections[section_triple[0]].append(section_triple[1])
+                for wiki_id in target_page_ids:
+                    if wiki_id in entities_and_how_often_already_covered:
+                        entities_and_how_often_already_covered[wiki_id] += 1
+                for wiki_id in entities_and_how_often_already_covered:
+                    if wiki_id in entities_not_covered_enough_times_yet:
+                        count = entities_and_how_often_already_covered[wiki_id]
+                        if count >= threshold or count >= test_entities_and_count[wiki_id]:
+                            entities_not_covered_enough_times_yet.remove(wiki_id)
+                break
+    return selected_sections
+
+
+def make_sections(seed):
+    # synthetic pages with a few sections each, the sections link to random ids, some of them test ids
+    rng = random.Random(seed)
+    set_of_all_ids_in_test = set(rng.sample(range(1, 2000), 300))
+    test_entities_and_count = {idx: 0 for idx in set_of_all_ids_in_test}
+    list_of_section_triples = []
+    for page_id in range(rng.randint(50, 800)):
+        for section_number in range(rng.randint(1, 5)):
+            target_page_ids = [rng.randint(1, 3000) for _ in range(rng.randint(0, 30))]
+            if any(idx in set_of_all_ids_in_test for idx in target_page_ids):
+                for idx in target_page_ids:
+                    if idx in test_entities_and_count:
+                        test_entities_and_count[idx] += 1
+                list_of_section_triples.append((page_id, f'Section {section_number}', target_page_ids))
+    return list_of_section_triples, set_of_all_ids_in_test, test_entities_and_count
+
+
+def to_section_triples(list_of_section_triples, set_of_all_ids_in_test, test_entities_and_count):
+    # the same sections as in create_train_jsonl: test entities as codes and only the links to test entities
+    test_entity_codes = {idx: code for code, idx in enumerate(set_of_all_ids_in_test)}
+    section_triples = SectionTriples()
+    for page_id, section_name, target_page_ids in list_of_section_triples:
+        section_triples.append(page_id, 0, section_name,
+                               [test_entity_codes[idx] for idx in target_page_ids if idx in test_entity_codes])
+    counts = array('q', [0]) * len(test_entity_codes)
+    for idx, code in test_entity_codes.items():
+        counts[code] = test_entities_and_count[idx]
+    return section_triples, counts
+
+
+@pytest.mark.parametrize('seed', range(30))
+@pytest.mark.parametrize('threshold', [1, 3, 10])
+def test_select_sections_matches_greedy_selection(seed, threshold):
+    list_of_section_triples, set_of_all_ids_in_test, test_entities_and_count = make_sections(seed)
+    section_triples, counts = to_section_triples(list_of_section_triples, set_of_all_ids_in_test, test_entities_and_count)
+
+    random.seed(11)
+    expected = select_sections_greedy(list_of_section_triples, set(set_of_all_ids_in_test), test_entities_and_count,
+                                      threshold=threshold)
+    random.seed(11)
+    with contextlib.redirect_stdout(io.StringIO()):
+        selected = select_sections(section_triples, counts, threshold=threshold)
+
+    assert dict(selected) == dict(expected)
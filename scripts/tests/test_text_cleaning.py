@@ -0,0 +1,52 @@
+# tests of the cleaning of the section texts (text_cleaning.py): the replacements must not shift the offsets of the
+# mentions, so the cleaned text has the same length and the mentions still point to the same text
+# run with: python -m pytest scripts/tests
+
+import os
+import sys
+
+import pytest
+
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.text_cleaning import HTML_REPLACEMENTS, clean_text, make_text_cleaner
+
+
+def make_section():
+    # a text that contains every pattern, with a mention (start, end) after each of them, like the 'index' of a section
+    text = ''
+    mention_spans = []
+    for number, pattern in enumerate(HTML_REPLACEMENTS):
+        text += f'{pattern}text{pattern}'
+        mention = f'Mention {number}'
+        mention_spans.append((len(text), len(text) + len(mention)))
+        text += mention
+    return text, mention_spans
+
+
+def test_clean_text_keeps_length():
+    text, _ = make_section()
+    cleaned_text = clean_text(text)
+
+    assert len(cleaned_text) == len(text)
+    for pattern in HTML_REPLACEMENTS:
+        assert pattern not in cleaned_text
+
+
+def test_clean_text_keeps_mention_offsets():
+    text, mention_spans = make_section()
+    cleaned_text = clean_text(text)
+
+    for number, (start, end) in enumerate(mention_spans):
+        assert cleaned_text[start:end] == text[start:end] == f'Mention {number}'
+
+
+def test_clean_text_prefers_longer_patterns():
+    # '||' must not be cut out of a longer pattern and the longer pattern is replaced as a whole
+    text = '<b>|||</b>&nbsp;x'
+    assert make_text_cleaner({'||': '  ', '|||': ' - ', '&nbsp;': '      '})(text) == '<b> - </b>      x'
+
+
+def test_replacement_of_different_length_raises():
+    with pytest.raises(ValueError):
+        make_text_cleaner({**HTML_REPLACEMENTS, '&amp;': '&'})
@@ -0,0 +1,51 @@
+# tests of the alignment of tokens and mentions (token_alignment.py)
+# run with: python -m pytest scripts/tests
+
+import os
+import random
+import sys
+
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.token_alignment import add_mention_starts, align_mentions
+
+
+def test_mention_starts_split_tokens():
+    # 'New York-based' with a mention of 'York' in the middle of the token 'York-based'
+    assert add_mention_starts([0, 4], [(4, 8)]) == [0, 4]
+    assert add_mention_starts([0, 4], [(5, 8)]) == [0, 4, 5]
+
+
+def test_mention_starts_are_unique():
+    # several mentions that start at the same offset inside a token split it only once
+    offsets = add_mention_starts([0, 8], [(8, 9), (9, 10), (9, 10)])
+    assert offsets == [0, 8, 9]
+
+    aligned_mentions = align_mentions(offsets, [(8, 9), (9, 10), (9, 10)], skip_overlapping=False)
+    # each mention covers exactly one span, so there is no I- tag without its B- tag
+    assert aligned_mentions == [(0, range(1, 2)), (1, range(2, 3)), (2, range(2, 3))]
+
+
+def test_mention_starts_match_set_of_offsets():
+    # the offsets are the same as the sorted set of token and mention starts (the alignment before the binary search)
+    rng = random.Random(7)
+    for _ in range(200):
+        token_starts = sorted(rng.sample(range(200), rng.randint(0, 60)))
+        mention_spans = []
+        for _ in range(rng.randint(0, 20)):
+            mention_start = rng.randrange(200)
+            mention_spans.append((mention_start, mention_start + rng.randint(1, 10)))
+        assert add_mention_starts(token_starts, mention_spans) == \
+            sorted(set(token_starts) | {mention_start for mention_start, _ in mention_spans})
+
+
+def test_overlapping_mentions_are_skipped():
+    token_starts = [0, 4, 8, 12]
+    mention_spans = [(0, 8), (4, 12), (8, 12)]
+    assert align_mentions(token_starts, mention_spans) == [(0, range(0, 2)), (2, range(2, 3))]
+    assert align_mentions(token_starts, mention_spans, skip_overlapping=False) == \
+        [(0, range(0, 2)), (1, range(1, 3)), (2, range(2, 3))]
+
+
+def test_mentions_without_tokens_are_not_aligned():
+    assert align_mentions([0, 4], [(1, 3), (4, 6)]) == [(1, range(1, 2))]
@@ -0,0 +1,183 @@
+# tests of the api resolver (wikipedia_resolver.py) against a local stub of the mediawiki api: batches, redirects and
+# normalized titles, retries and the cache
+# run with: python -m pytest scripts/tests
+
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# the scripts folder has to be on the path to import from scripts_to_create_zelda
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts_to_create_zelda.wikipedia_resolver import MAX_IDS_PER_REQUEST, MAX_TITLES_LENGTH, WikipediaApiError, \
+    WikipediaResolver
+
+# the wiki of the stub: articles 'Page 1' to 'Page 300' and redirects 'Old page 1001' -> 'Page 1' and so on
+PAGES = {page_id: f'Page {page_id}' for page_id in range(1, 301)}
+PAGES.update({page_id: 'Page ' + 'x' * 200 + str(page_id) for page_id in range(301, 401)})
+REDIRECTS = {page_id: (f'Old page {page_id}', page_id - 1000) for page_id in range(1001, 1101)}
+IDS_OF_TITLES = {title: page_id for page_id, title in PAGES.items()}
+IDS_OF_TITLES.update({title: page_id for page_id, (title, _) in REDIRECTS.items()})
+
+
+def normalize(title):
+    title = title.replace('_', ' ').strip()
+    return title[:1].upper() + title[1:]
+
+
+class StubApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, status, content, headers=()):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        for header, value in headers:
+            self.send_header(header, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        api = self.server.api
+        parameters = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+        with api.lock:
+            api.requests.append(parameters)
+            failure = api.failures.pop(0) if api.failures else None
+        if failure is not None:
+            self.send_json(failure[0], {}, failure[1])
+        elif 'pageids' in parameters:
+            self.send_json(200, {'query': {'pages': [self.get_page_of_id(int(page_id))
+                                                     for page_id in parameters['pageids'].split('|')]}})
+        else:
+            self.send_json(200, self.get_pages_of_titles(parameters['titles'].split('|')))
+
+    def get_page_of_id(self, page_id):
+        if page_id in REDIRECTS:
+            return {'pageid': page_id, 'ns': 0, 'title': REDIRECTS[page_id][0], 'redirect': True}
+        if page_id in PAGES:
+            return {'pageid': page_id, 'ns': 0, 'title': PAGES[page_id]}
+        return {'pageid': page_id, 'missing': True}
+
+    def get_pages_of_titles(self, titles):
+        query = {'normalized': [], 'redirects': [], 'pages': []}
+        for title in titles:
+            normalized_title = normalize(title)
+            if normalized_title != title:
+                query['normalized'].append({'fromencoded': False, 'from': title, 'to': normalized_title})
+            page_id = IDS_OF_TITLES.get(normalized_title)
+            if page_id in REDIRECTS:
+                page_id = REDIRECTS[page_id][1]
+                query['redirects'].append({'from': normalized_title, 'to': PAGES[page_id]})
+            page = {'pageid': page_id, 'ns': 0, 'title': PAGES[page_id]} if page_id else \
+                {'ns': 0, 'title': normalized_title, 'missing': True}
+            if page not in query['pages']:
+                query['pages'].append(page)
+        return {'query': {name: entries for name, entries in query.items() if entries}}
+
+
+class StubApi:
+    # the stub server, it records the parameters of all requests and answers the next requests with the given failures,
+    # (status, headers) pairs
+
+    def __init__(self):
+        self.requests = []
+        self.failures = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubApiHandler)
+        self.server.daemon_threads = True
+        self.server.api = self
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/w/api.php'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def get_batch_sizes(self, parameter):
+        return sorted((len(request[parameter].split('|')) for request in self.requests if parameter in request),
+                      reverse=True)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def api():
+    stub_api = StubApi()
+    yield stub_api
+    stub_api.close()
+
+
+def get_resolver(api, path_to_cache=None):
+    return WikipediaResolver(path_to_cache, api_url=api.url, requests_per_second=1000., max_concurrent_requests=4,
+                             backoff_seconds=0.01)
+
+
+def test_batch_sizes(api):
+    with get_resolver(api) as resolver:
+        resolver.resolve_ids(range(1, 121))
+        assert api.get_batch_sizes('pageids') == [MAX_IDS_PER_REQUEST, MAX_IDS_PER_REQUEST, 20]
+
+        resolver.resolve_titles(f'Page {page_id}' for page_id in range(1, 121))
+        assert api.get_batch_sizes('titles') == [MAX_IDS_PER_REQUEST, MAX_IDS_PER_REQUEST, 20]
+
+        # long titles are also limited by their length in the url
+        api.requests.clear()
+        long_titles = [PAGES[page_id] for page_id in range(301, 401)]
+        pages = resolver.resolve_titles(long_titles)
+        assert all(pages[title] == (page_id, title) for page_id, title in zip(range(301, 401), long_titles))
+        for request in api.requests:
+            assert len(urllib.parse.quote(request['titles'])) <= MAX_TITLES_LENGTH
+        assert sum(api.get_batch_sizes('titles')) == 100
+
+
+def test_redirects_and_normalized_titles(api):
+    titles = ['Page 5', 'page_5', '  Page_6 ', 'Old page 1003', 'old_page_1004', 'Missing page', 'A|B']
+    with get_resolver(api) as resolver:
+        pages = resolver.resolve_titles(titles)
+        assert list(pages) == titles
+        assert pages == {'Page 5': (5, 'Page 5'), 'page_5': (5, 'Page 5'), '  Page_6 ': (6, 'Page 6'),
+                         'Old page 1003': (3, 'Page 3'), 'old_page_1004': (4, 'Page 4'), 'Missing page': None,
+                         'A|B': None}
+
+        # the ids of redirects lead to the page they redirect to
+        page_ids = [7, 1008, 1009, 99999]
+        pages = resolver.resolve_ids(page_ids)
+        assert list(pages) == page_ids
+        assert pages == {7: (7, 'Page 7'), 1008: (8, 'Page 8'), 1009: (9, 'Page 9'), 99999: None}
+
+
+def test_retry_after_503(api):
+    api.failures = [(503, [('Retry-After', '1')]), (429, [])]
+    with get_resolver(api) as resolver:
+        start = time.monotonic()
+        assert resolver.resolve_ids([1, 2]) == {1: (1, 'Page 1'), 2: (2, 'Page 2')}
+        # the request waits as long as Retry-After asks for
+        assert time.monotonic() - start >= 1
+    assert len(api.requests) == 3
+
+
+def test_request_fails_after_max_retries(api):
+    api.failures = [(503, [])] * 3
+    resolver = WikipediaResolver(api_url=api.url, requests_per_second=1000., max_retries=2, backoff_seconds=0.01)
+    with resolver, pytest.raises(WikipediaApiError, match='failed 3 times'):
+        resolver.resolve_ids([1])
+
+
+def test_rerun_is_served_from_cache(api, tmp_path):
+    path_to_cache = str(tmp_path / 'wikipedia_cache.sqlite')
+    page_ids = list(range(1, 200)) + list(range(1001, 1101)) + [99999]
+    titles = ['page_3', 'Old page 1010', 'Missing page']
+    with get_resolver(api, path_to_cache) as resolver:
+        pages_of_ids = resolver.resolve_ids(page_ids)
+        pages_of_titles = resolver.resolve_titles(titles)
+
+    number_of_requests = len(api.requests)
+    with get_resolver(api, path_to_cache) as resolver:
+        assert resolver.resolve_ids(page_ids) == pages_of_ids
+        assert resolver.resolve_titles(titles) == pages_of_titles
+        assert resolver.number_of_requests == 0
+    assert len(api.requests) == number_of_requests
@@ -10,18 +10,48 @@ create_conll_version_of_zelda_train = True
 # If you want to generate the entity descriptions, set this to true
 create_entity_descriptions = True
 
+# number of processes that read the kensho file (and tokenize the conll version) in parallel, None means one process per cpu
+NUMBER_OF_PROCESSES = None
+
+# to speed up repeated builds, set this to a folder where a columnar cache of the kensho file is stored
+# the cache is created once (if it does not exist yet) and then read instead of the jsonl file
+PATH_TO_KENSHO_CACHE = ''
+
+# tokenizer used for the conll version: 'spacy' (en_core_web_sm, as in the original ZELDA), 'sentencizer' or 'regex'
+# the latter two are much faster but their tokens/sentences differ slightly (see benchmark_tokenizer_backends.py)
+TOKENIZER_BACKEND = 'spacy'
+
+# compression of zelda_train.jsonl and zelda_train.conll: None (plain text), 'gzip' (.gz) or 'zstd' (.zst, needs the
+# 'zstandard' package), the scripts that read these files detect the compression themselves
+OUTPUT_COMPRESSION = None
+
+# how the counts of the three candidate list sources (wikidata, kensho, wikilinks) are combined: 'sum' adds the counts,
+# 'vote' counts the number of sources that link a mention to an entity
+CANDIDATE_COUNT_AGGREGATION = 'sum'
+
+# the merged candidate lists are written as an index (see scripts_to_create_zelda/candidate_index.py), set this to true to
+# also save them as the pickled dictionary zelda_mention_entities_counter.pickle
+WRITE_CANDIDATE_PICKLE = False
+
 # all files will be stored in repo/train_data
 
 from scripts_to_create_zelda.filter_sections_from_kensho import create_train_jsonl
 from scripts_to_create_zelda.merge_candidate_lists import merge_candidate_lists
 from scripts_to_create_zelda.write_sections_to_column_file import create_zelda_conll
 from scripts_to_create_zelda.generate_entity_descriptions import generate_entity_descriptions
+from scripts_to_create_zelda.kensho_cache import get_kensho_source
+
+if __name__ == '__main__':
+    kensho_source = get_kensho_source(PATH_TO_KENSHO_JSONL, PATH_TO_KENSHO_CACHE, number_of_processes=NUMBER_OF_PROCESSES)
 
-# create_train_jsonl(PATH_TO_REPOSITORY=PATH_TO_REPOSITORY, PATH_TO_KENSHO_JSONL=PATH_TO_KENSHO_JSONL)
-# merge_candidate_lists(PATH_TO_REPOSITORY=PATH_TO_REPOSITORY)
+    # create_train_jsonl(PATH_TO_REPOSITORY=PATH_TO_REPOSITORY, PATH_TO_KENSHO_JSONL=kensho_source, number_of_processes=NUMBER_OF_PROCESSES,
+    #                    compression=OUTPUT_COMPRESSION)
+    # merge_candidate_lists(PATH_TO_REPOSITORY=PATH_TO_REPOSITORY, count_aggregation=CANDIDATE_COUNT_AGGREGATION,
+    #                       write_pickle=WRITE_CANDIDATE_PICKLE)
 
-if create_conll_version_of_zelda_train:
-    create_zelda_conll(PATH_TO_REPOSITORY=PATH_TO_REPOSITORY)
+    if create_conll_version_of_zelda_train:
+        create_zelda_conll(PATH_TO_REPOSITORY=PATH_TO_REPOSITORY, tokenizer_backend=TOKENIZER_BACKEND,
+                           number_of_processes=NUMBER_OF_PROCESSES, compression=OUTPUT_COMPRESSION)
 
-# if create_entity_descriptions:
-#     generate_entity_descriptions(PATH_TO_REPOSITORY=PATH_TO_REPOSITORY, PATH_TO_KENSHO_JSONL=PATH_TO_KENSHO_JSONL)
\ No newline at end of file
+    # if create_entity_descriptions:
+    #     generate_entity_descriptions(PATH_TO_REPOSITORY=PATH_TO_REPOSITORY, PATH_TO_KENSHO_JSONL=kensho_source, number_of_processes=NUMBER_OF_PROCESSES)